@@ -1,25 +1,15 @@
 # Python
 import logging
-import math
 import optparse
 import os
 import socket
 import sys
 import textwrap
 import time
-import weakref
 
 # wxPython
 import wx
 
-# PyWin32
-try:
-    import win32api
-    import win32con
-    import win32gui
-except ImportError:
-    win32api, win32con, win32gui = None, None, None
-
 # PyO
 import pyo
 
@@ -27,6 +17,9 @@ import pyo
 from .constants import *  # noqa
 from .frames import *  # noqa
 from .engine import *  # noqa
+from .settings import SettingsStore
+from .state import StateModel
+from .utils import import_win32gui, midi_output_message
 
 
 class OptionParser(optparse.OptionParser):
@@ -71,11 +64,59 @@ class OptionParser(optparse.OptionParser):
 #             output_panel.LogRecord(level, msg, info.timestamp)
 
 
+class ConfigBackend(object):
+    """Settings store backend reading and writing wx.Config."""
+
+    def __init__(self, config=None):
+        self._config = config or wx.Config.Get()
+
+    def read(self, name, type_, default):
+        getter = {
+            bool: self._config.ReadBool,
+            int: self._config.ReadInt,
+            float: self._config.ReadFloat,
+        }.get(type_, self._config.Read)
+        return getter(name, default)
+
+    def write(self, name, type_, value):
+        setter = {
+            bool: self._config.WriteBool,
+            int: self._config.WriteInt,
+            float: self._config.WriteFloat,
+        }.get(type_, self._config.Write)
+        setter(name, value)
+
+    def flush(self):
+        self._config.Flush()
+
+
 class App(wx.App):
     """Main application instance."""
 
+    # Milliseconds between samples of the measurements shown as text
+    # (detected tempo, counts, latency), while anything is running.
+    STATUS_INTERVAL = 250
+
+    # Strength settings that map directly to an analyzer property.
+    STRENGTH_PROPERTIES = {
+        'strength_lpf': 'lpf',
+        'strength_attack': 'attack',
+        'strength_release': 'release',
+        'strength_min_spl': 'min_spl',
+        'strength_min_velocity': 'min_velocity',
+        'strength_max_spl': 'max_spl',
+        'strength_max_velocity': 'max_velocity',
+        'strength_curve': 'curve',
+        'strength_hysteresis': 'hysteresis',
+        'strength_max_rate': 'max_rate',
+        'strength_refresh': 'refresh',
+    }
+
     def OnInit(self):
-        parser = OptionParser(version='0.1.0')
+        self._startup_times = [('init', time.time())]
+        parser = OptionParser(version=VERSION)
+        parser.add_option('--startup-report', dest='startup_report', action='store_true', default=False,
+                          help=optparse.SUPPRESS_HELP)
         try:
             options, args = parser.parse_args()
         except optparse.OptParseError:
@@ -86,6 +127,7 @@ class App(wx.App):
         self.SetAppName(APP_NAME)
         self.sic = wx.SingleInstanceChecker(self.GetAppName())
         if self.sic.IsAnotherRunning():
+            win32con, win32gui = import_win32gui()
             if win32gui:
                 other_hwnds = []
 
@@ -103,31 +145,67 @@ class App(wx.App):
             self.ExitMainLoop()
             return True
 
-        self.RebootAudioServer()
-        self.RebootMidiListener()
-        self.RebootMidiDispatcher()
+        self._startup_report = options.startup_report
+        self._startup_pending = True
+        # Widgets are updated when the state or setting they show changes
+        # (see Subscribe), so no window asks for update UI events when idle.
+        wx.UpdateUIEvent.SetMode(wx.UPDATE_UI_PROCESS_SPECIFIED)
         # wx.Log.SetActiveTarget(Log())
         # wx.Log.SetVerbose()
         # self.SetLogLevel()
         frame = Frame(None, wx.ID_ANY, frame_title)
+        frame.Show()
+        self._startup_times.append(('show', time.time()))
+        # Tag the frame so a second instance can find it.
+        win32con, win32gui = import_win32gui()
         if win32gui:
             win32gui.SetWindowLong(frame.GetHandle(), win32con.GWL_USERDATA, frame_userdata)
-        frame.Show()
+        self.StartDisplayTimer()
+        # Devices are enumerated (and the audio server booted) once the frame
+        # has been painted; the first idle event comes after the first paint.
+        self.Bind(wx.EVT_IDLE, self.OnStartupIdle)
         # wx.LogError('error')
         # wx.LogWarning('warning')
         # wx.LogMessage('--- %s %s ---' % (APP_NAME, VERSION))
         # wx.LogStatus('status')
         # wx.LogVerbose('verbose')
         # wx.LogDebug('debug')
-        wx.UpdateUIEvent.SetUpdateInterval(50)
         self.Bind(EVT_AUDIO_SERVER_STARTED, self.OnAudioServerStarted)
         self.Bind(EVT_AUDIO_SERVER_STOPPED, self.OnAudioServerStopped)
+        self.Bind(EVT_DEVICES_CHANGED, self.OnDevicesChanged)
 
         return True
 
+    def OnStartupIdle(self, event):
+        self.Unbind(wx.EVT_IDLE, handler=self.OnStartupIdle)
+        self._startup_times.append(('first_frame', time.time()))
+        self.DiscoverDevices()
+
+    def OnStartupDevices(self):
+        self._startup_times.append(('devices', time.time()))
+        if self._startup_report:
+            init_time = self._startup_times[0][1]
+            for name, t in self._startup_times[1:]:
+                print('startup {} {:.6f}'.format(name, t - init_time))
+            sys.stdout.flush()
+            self.ExitMainLoop()
+            return
+        self.RebootAudioServer(1)
+        self.RebootMidiListener(1)
+        self.RebootMidiDispatcher(1)
+
+    def GetStartupTimes(self):
+        return list(self._startup_times)
+
     def OnExit(self):
         del self.sic
+        self.StopDisplayTimer()
+        self.StopBeatGenerator()
         self.ShutdownAudioServer()
+        if hasattr(self, '_device_registry'):
+            self._device_registry.stop()
+        if hasattr(self, '_settings'):
+            self._settings.close()
         return True
 
     def GetAppPath(self):
@@ -142,28 +220,43 @@ class App(wx.App):
     def GetTitle(self):
         return APP_NAME
 
+    def GetSettings(self):
+        if not hasattr(self, '_settings'):
+            self._settings = SettingsStore(ConfigBackend())
+            self._settings.subscribe(self.OnStrengthPropertyChanged, *self.STRENGTH_PROPERTIES)
+        return self._settings
+
     def GetSetting(self, name, type_=str, default=''):
-        if not hasattr(self, '_%s_' % name):
-            getter = {
-                bool: wx.Config.Get().ReadBool,
-                int: wx.Config.Get().ReadInt,
-                float: wx.Config.Get().ReadFloat,
-            }.get(type_, wx.Config.Get().Read)
-            setattr(self, '_%s_' % name, type_(getter(name, default)))
-        return getattr(self, '_%s_' % name)
+        return self.GetSettings().get(name, type_, default)
 
     def SetSetting(self, name, type_=str, value=''):
-        setattr(self, '_%s_' % name, type_(value))
-        setter = {
-            bool: wx.Config.Get().WriteBool,
-            int: wx.Config.Get().WriteInt,
-            float: wx.Config.Get().WriteFloat,
-        }.get(type_, wx.Config.Get().Write)
-        setter(name, type_(value))
-        win = self.GetTopWindow()
-        if win:
-            win.UpdateWindowUI()
-        wx.Config.Get().Flush()
+        # Returns whether the value changed. It is written to wx.Config
+        # behind; subscribed widgets are updated right away.
+        return self.GetSettings().set(name, type_, value)
+
+    def GetState(self):
+        if not hasattr(self, '_state'):
+            self._state = StateModel()
+        return self._state
+
+    def PublishState(self, name, value):
+        # Main thread only; returns whether the value changed.
+        return self.GetState().set(name, value)
+
+    def Subscribe(self, window, callback, *names):
+        # Call callback(name, value) on the main thread whenever one of the
+        # named settings or state values changes, for as long as the window
+        # exists. Settings and state names do not overlap.
+        settings, state = self.GetSettings(), self.GetState()
+
+        def notify(name, value):
+            if window:
+                callback(name, value)
+            else:
+                settings.unsubscribe(notify)
+                state.unsubscribe(notify)
+        settings.subscribe(notify, *names)
+        state.subscribe(notify, *names)
 
     GetMaximized = lambda s: s.GetSetting('maximized', bool, False)
     SetMaximized = lambda s, v: s.SetSetting('maximized', bool, v)
@@ -176,12 +269,12 @@ class App(wx.App):
     GetHeight = lambda s: s.GetSetting('height', int, -1)
     SetHeight = lambda s, v: s.SetSetting('height', int, v)
 
+    # Refresh rate of meters and displays fed from the audio and MIDI threads.
+    GetDisplayRate = lambda s: s.GetSetting('display_rate', int, 30)
+
     def SetAudioSetting(self, name, type_=str, value=''):
-        self.SetSetting(name, type_, value)
-        if name == 'audio_input_channels':
-            self.UpdateAudioStrengthAnalyzer()
-        else:
-            self.RebootAudioServer()
+        if self.SetSetting(name, type_, value):
+            self.ReconfigureAudioServer()
 
     # Device index as returned from pyo.pa_get_input_devices().
     GetAudioInput = lambda s: s.GetSetting('audio_input', int, -1)
@@ -191,17 +284,34 @@ class App(wx.App):
     GetAudioInputChannels = lambda s: s.GetSetting('audio_input_channels', int, -1)
     SetAudioInputChannels = lambda s, v: s.SetAudioSetting('audio_input_channels', int, v)
 
+    # Seconds to crossfade between the old and new mix when the channels change.
+    GetAudioChannelFade = lambda s: s.GetSetting('audio_channel_fade', float, 0.05)
+    SetAudioChannelFade = lambda s, v: s.SetAudioSetting('audio_channel_fade', float, v)
+
+    # Latency profile (see LATENCY_PROFILES), or 'custom' to use audio_buffer_size.
+    GetAudioLatencyProfile = lambda s: s.GetSetting('audio_latency_profile', str, 'balanced')
+    SetAudioLatencyProfile = lambda s, v: s.SetAudioSetting('audio_latency_profile', str, v)
+    GetAudioBufferSize = lambda s: s.GetSetting('audio_buffer_size', int, 256)
+    SetAudioBufferSize = lambda s, v: s.SetAudioSetting('audio_buffer_size', int, v)
+    GetAudioSamplingRate = lambda s: s.GetSetting('audio_sampling_rate', int, 44100)
+    SetAudioSamplingRate = lambda s, v: s.SetAudioSetting('audio_sampling_rate', int, v)
+    GetAudioInputOnly = lambda s: s.GetSetting('audio_input_only', bool, False)
+    SetAudioInputOnly = lambda s, v: s.SetAudioSetting('audio_input_only', bool, v)
+
+    def GetAudioServerBufferSize(self):
+        return LATENCY_PROFILES.get(self.GetAudioLatencyProfile(), self.GetAudioBufferSize())
+
     def SetMidiInputSetting(self, name, type_=str, value=''):
-        self.SetSetting(name, type_, value)
-        self.RebootMidiListener()
+        if self.SetSetting(name, type_, value):
+            self.RebootMidiListener()
 
     # Device index as returned from pyo.pm_get_input_devices().
     GetMidiInput = lambda s: s.GetSetting('midi_input', int, -1)
     SetMidiInput = lambda s, v: s.SetMidiInputSetting('midi_input', int, v)
 
     def SetMidiOutputSetting(self, name, type_=str, value=''):
-        self.SetSetting(name, type_, value)
-        self.RebootMidiDispatcher()
+        if self.SetSetting(name, type_, value):
+            self.RebootMidiDispatcher()
 
     # Device index as returned from pyo.pm_get_output_devices().
     GetMidiOutput = lambda s: s.GetSetting('midi_output', int, -1)
@@ -209,18 +319,30 @@ class App(wx.App):
 
     # "Speed" settings (beat clock based on attack and beat detection).
     def SetSpeedSetting(self, name, type_=str, value=''):
-        self.SetSetting(name, type_, value)
-        self.UpdateBeatGenerator()
+        if self.SetSetting(name, type_, value):
+            self.UpdateBeatGenerator()
+            self.UpdateTempoDetector()
 
     GetSpeedEnabled = lambda s: s.GetSetting('speed_enabled', bool, False)
     SetSpeedEnabled = lambda s, v: s.SetSpeedSetting('speed_enabled', bool, v)
     GetSpeedBPM = lambda s: s.GetSetting('speed_bpm', int, 120)
     SetSpeedBPM = lambda s, v: s.SetSpeedSetting('speed_bpm', int, v)
+    GetSpeedDetect = lambda s: s.GetSetting('speed_detect', bool, False)
+    SetSpeedDetect = lambda s, v: s.SetSpeedSetting('speed_detect', bool, v)
+    GetSpeedLock = lambda s: s.GetSetting('speed_lock', bool, False)
+    SetSpeedLock = lambda s, v: s.SetSpeedSetting('speed_lock', bool, v)
 
     # "Strength" settings (velocity output based on sound level).
     def SetStrengthSetting(self, name, type_=str, value=''):
-        self.SetSetting(name, type_, value)
-        self.UpdateAudioStrengthAnalyzer()
+        if self.SetSetting(name, type_, value) and name not in self.STRENGTH_PROPERTIES:
+            self.UpdateAudioStrengthAnalyzer()
+
+    def OnStrengthPropertyChanged(self, name, value):
+        # Push only the changed property to a running analyzer; the rest
+        # need UpdateAudioStrengthAnalyzer() to (re)build it.
+        analyzer = getattr(self, '_strength_analyzer', None)
+        if analyzer:
+            setattr(analyzer, self.STRENGTH_PROPERTIES[name], value)
 
     GetStrengthEnabled = lambda s: s.GetSetting('strength_enabled', bool, False)
     SetStrengthEnabled = lambda s, v: s.SetStrengthSetting('strength_enabled', bool, v)
@@ -238,95 +360,131 @@ class App(wx.App):
     SetStrengthMaxSPL = lambda s, v: s.SetStrengthSetting('strength_max_spl', int, v)
     GetStrengthMaxVelocity = lambda s: s.GetSetting('strength_max_velocity', int, 127)
     SetStrengthMaxVelocity = lambda s, v: s.SetStrengthSetting('strength_max_velocity', int, v)
+    GetStrengthCurve = lambda s: s.GetSetting('strength_curve', str, 'linear')
+    SetStrengthCurve = lambda s, v: s.SetStrengthSetting('strength_curve', str, v)
+    GetStrengthHysteresis = lambda s: s.GetSetting('strength_hysteresis', int, 1)
+    SetStrengthHysteresis = lambda s, v: s.SetStrengthSetting('strength_hysteresis', int, v)
+    GetStrengthMaxRate = lambda s: s.GetSetting('strength_max_rate', int, 30)
+    SetStrengthMaxRate = lambda s, v: s.SetStrengthSetting('strength_max_rate', int, v)
+    GetStrengthRefresh = lambda s: s.GetSetting('strength_refresh', float, 1.0)
+    SetStrengthRefresh = lambda s, v: s.SetStrengthSetting('strength_refresh', float, v)
     GetStrengthMidiOutput = lambda s: s.GetSetting('strength_midi_output', int, 0)
     SetStrengthMidiOutput = lambda s, v: s.SetStrengthSetting('strength_midi_output', int, v)
+    GetStrengthMultiBand = lambda s: s.GetSetting('strength_multiband', bool, False)
+    SetStrengthMultiBand = lambda s, v: s.SetStrengthSetting('strength_multiband', bool, v)
+    GetStrengthCrossovers = lambda s: s.GetSetting('strength_crossovers', str, '100,400,2000')
+    SetStrengthCrossovers = lambda s, v: s.SetStrengthSetting('strength_crossovers', str, v)
+    GetStrengthBackend = lambda s: s.GetSetting('strength_backend', str, 'filters')
+    SetStrengthBackend = lambda s, v: s.SetStrengthSetting('strength_backend', str, v)
+    GetStrengthBandMidiOutputs = lambda s: s.GetSetting('strength_band_midi_outputs', str, '')
+
+    def GetStrengthCrossoverList(self):
+        crossovers = []
+        for value in self.GetStrengthCrossovers().split(','):
+            try:
+                crossovers.append(int(value))
+            except ValueError:
+                pass
+        return crossovers
+
+    def GetStrengthBandMidiOutputList(self, bands=0):
+        outputs = []
+        for value in self.GetStrengthBandMidiOutputs().split(','):
+            try:
+                outputs.append(int(value))
+            except ValueError:
+                outputs.append(0)
+        return outputs + [0] * (bands - len(outputs))
+
+    def SetStrengthBandMidiOutput(self, band, value):
+        outputs = self.GetStrengthBandMidiOutputList(band + 1)
+        outputs[band] = int(value)
+        self.SetStrengthSetting('strength_band_midi_outputs', str, ','.join(str(v) for v in outputs))
 
     # "Style" settings (Note/control outputs based on pitch/frequency).
+    def SetStyleSetting(self, name, type_=str, value=''):
+        if self.SetSetting(name, type_, value):
+            self.UpdateStyleDetector()
+
     GetStyleEnabled = lambda s: s.GetSetting('style_enabled', bool, False)
-    SetStyleEnabled = lambda s, v: s.SetSetting('style_enabled', bool, v)
+    SetStyleEnabled = lambda s, v: s.SetStyleSetting('style_enabled', bool, v)
+    GetStyleChordMidiOutput = lambda s: s.GetSetting('style_chord_midi_output', int, 0)
+    SetStyleChordMidiOutput = lambda s, v: s.SetStyleSetting('style_chord_midi_output', int, v)
+    GetStyleKeyMidiOutput = lambda s: s.GetSetting('style_key_midi_output', int, 0)
+    SetStyleKeyMidiOutput = lambda s, v: s.SetStyleSetting('style_key_midi_output', int, v)
+
+    # Outputs for the spectral descriptors (see SPECTRAL_DESCRIPTORS).
+    def GetStyleDescriptorMidiOutput(self, name):
+        return self.GetSetting('style_{}_midi_output'.format(name), int, 0)
+
+    def SetStyleDescriptorMidiOutput(self, name, value):
+        self.SetStyleSetting('style_{}_midi_output'.format(name), int, value)
+
+    def GetDeviceRegistry(self):
+        if not hasattr(self, '_device_registry'):
+            self._device_registry = DeviceRegistry(self.OnDeviceRegistryChange)
+        return self._device_registry
+
+    def OnDeviceRegistryChange(self, changes):
+        # Called from the registry thread.
+        wx.PostEvent(self, DevicesChangedEvent(0, changes=changes))
 
     def GetAudioInputs(self):
-        if not hasattr(self, '_audio_inputs'):
-            input_device_names, input_device_indexes = pyo.pa_get_input_devices()
-            default_input_index = pyo.pa_get_default_input()
-            audio_inputs = {}
-            for input_index, input_name in zip(input_device_indexes, input_device_names):
-                input_max_channels = pyo.pa_get_input_max_channels(input_index)
-                if 'logmein' in input_name.lower():
-                    input_max_channels = 16
-                audio_inputs[input_index] = {
-                    'name': input_name,
-                    'default': bool(input_index == default_input_index),
-                    'channels': input_max_channels,
-                }
-            setattr(self, '_audio_inputs', audio_inputs)
-        return getattr(self, '_audio_inputs')
-
-    def RefreshAudioInputs(self):
-        if hasattr(self, '_audio_inputs'):
-            delattr(self, '_audio_inputs')
+        return self.GetDeviceRegistry().audio_inputs
 
     def GetAudioOutputs(self):
-        if not hasattr(self, '_audio_outputs'):
-            output_device_names, output_device_indexes = pyo.pa_get_output_devices()
-            default_output_index = pyo.pa_get_default_output()
-            audio_outputs = {}
-            for output_index, output_name in zip(output_device_indexes, output_device_names):
-                output_max_channels = pyo.pa_get_output_max_channels(output_index)
-                audio_outputs[output_index] = {
-                    'name': output_name,
-                    'default': bool(output_index == default_output_index),
-                    'channels': output_max_channels,
-                }
-            setattr(self, '_audio_outputs', audio_outputs)
-        return getattr(self, '_audio_outputs')
-
-    def RefreshAudioOutputs(self):
-        if hasattr(self, '_audio_outputs'):
-            delattr(self, '_audio_outputs')
+        return self.GetDeviceRegistry().audio_outputs
 
     def GetMidiInputs(self):
-        if not hasattr(self, '_midi_inputs'):
-            input_device_names, input_device_indexes = pyo.pm_get_input_devices()
-            default_input_index = pyo.pm_get_default_input()
-            midi_inputs = {}
-            for input_index, input_name in zip(input_device_indexes, input_device_names):
-                midi_inputs[input_index] = {
-                    'name': input_name,
-                    'default': bool(input_index == default_input_index),
-                }
-            setattr(self, '_midi_inputs', midi_inputs)
-        return getattr(self, '_midi_inputs')
-
-    def RefreshMidiInputs(self):
-        if hasattr(self, '_midi_inputs'):
-            delattr(self, '_midi_inputs')
+        return self.GetDeviceRegistry().midi_inputs
 
     def GetMidiOutputs(self):
-        if not hasattr(self, '_midi_outputs'):
-            output_device_names, output_device_indexes = pyo.pm_get_output_devices()
-            default_output_index = pyo.pm_get_default_output()
-            midi_outputs = {}
-            for output_index, output_name in zip(output_device_indexes, output_device_names):
-                midi_outputs[output_index] = {
-                    'name': output_name,
-                    'default': bool(output_index == default_output_index),
-                }
-            setattr(self, '_midi_outputs', midi_outputs)
-        return getattr(self, '_midi_outputs')
-
-    def RefreshMidiOutputs(self):
-        if hasattr(self, '_midi_outputs'):
-            delattr(self, '_midi_outputs')
+        return self.GetDeviceRegistry().midi_outputs
 
     def RefreshAudioMidiIO(self):
-        self.RefreshAudioInputs()
-        self.RefreshAudioOutputs()
-        self.RefreshMidiInputs()
-        self.RefreshMidiOutputs()
+        # Devices can only be rescanned with their streams closed: the audio
+        # server reboot and the MIDI restart each enumerate their own kinds.
+        self.RebootAudioServer(1)
+        self.RebootMidiDevices(1)
+
+    def DiscoverDevices(self):
+        # Nothing is open yet, so enumerate everything on the registry
+        # thread; EVT_DEVICES_CHANGED follows with the first snapshot.
+        self.GetDeviceRegistry().refresh()
+
+    def EnumerateDevices(self, kinds):
+        # On the main thread, with the streams of those kinds closed.
+        self.PublishDevices(self.GetDeviceRegistry().enumerate(kinds, notify=False))
+
+    def PublishDevices(self, changes):
+        registry = self.GetDeviceRegistry()
+        for kind in registry.KINDS:
+            self.PublishState(kind, registry.getDevices(kind))
+        for kind, action, index, name in changes:
+            logging.info('%s %s: %s (%d)', kind.replace('_', ' ')[:-1], action, name, index)
+
+    def OnDevicesChanged(self, event):
+        # Posted by the registry thread, which only enumerates at startup.
+        if self._startup_pending:
+            self._startup_pending = False
+            self.PublishDevices([])
+            self.OnStartupDevices()
+        else:
+            self.PublishDevices(event.changes)
 
     def OnAudioServerProcessCallback(self):
-        pass
+        block_timer = getattr(self, '_block_timer', None)
+        if block_timer:
+            block_timer.tick()
+        strength_analyzer = getattr(self, '_strength_analyzer', None)
+        if strength_analyzer:
+            strength_analyzer.process()
+        tempo_detector = getattr(self, '_tempo_detector', None)
+        if tempo_detector:
+            tempo_detector.process()
+        style_detector = getattr(self, '_style_detector', None)
+        if style_detector:
+            style_detector.process()
 
     def OnAudioServerMeterCallback(self, *args):
         pass
@@ -337,6 +495,7 @@ class App(wx.App):
             self._pyo_server.deactivateMidi()
             self._pyo_server.setCallback(self.OnAudioServerProcessCallback)
             self._pyo_server.setMeterCallable(self.OnAudioServerMeterCallback)
+            self.ConfigureAudioServer(self._pyo_server)
             self._pyo_server.boot()
             self._pyo_server.verbosity = 15
         return self._pyo_server
@@ -352,46 +511,124 @@ class App(wx.App):
         else:
             return 'enabled'
 
-    def RebootAudioServer(self):
+    def RebootAudioServer(self, delay=1000):
         if not hasattr(self, '_reboot_audio_server_call'):
             self._reboot_audio_server_call = wx.CallLater(1, self.OnRebootAudioServer)
-        self._reboot_audio_server_call.Start(1000)
+        self._reboot_audio_server_call.Start(delay)
 
     def OnRebootAudioServer(self):
-        server = self.GetAudioServer()
-        if server.getIsBooted():
-            if server.getIsStarted():
-                server.stop()
-                top_window = self.GetTopWindow()
-                if top_window:
-                    wx.PostEvent(top_window, AudioServerStoppedEvent(0))
-            server.shutdown()
-        self.RefreshAudioInputs()
+        previous = getattr(self, '_audio_server_config', None)
+        with self.GetDeviceRegistry().lock:
+            if not hasattr(self, '_pyo_server'):
+                # Configured and booted when created, no need to do it twice.
+                server = self.GetAudioServer()
+            else:
+                server = self._pyo_server
+                if server.getIsBooted():
+                    if server.getIsStarted():
+                        self._audio_gap_started = time.perf_counter()
+                        server.stop()
+                        top_window = self.GetTopWindow()
+                        if top_window:
+                            wx.PostEvent(top_window, AudioServerStoppedEvent(0))
+                    server.shutdown()
+                # PortAudio is only released between shutdown and boot, the
+                # one time hotplugged audio devices can be seen.
+                self.EnumerateDevices(DeviceRegistry.AUDIO_KINDS)
+                self.ConfigureAudioServer(server)
+                server.boot()
+            self._block_timer = BlockTimer(server.getBufferSize(), server.getSamplingRate())
+            server.start()
+        changed = plan_audio_reconfiguration(previous, self._audio_server_config)[1]
+        # The gap is filled in once the analyzers are running again.
+        self._audio_reconfiguration = ['restart', changed, None if hasattr(self, '_audio_gap_started') else 0.0]
+        self.PublishState('audio_reconfiguration', self.GetAudioReconfiguration())
+        self.PublishStatus()
+        wx.PostEvent(self.GetTopWindow(), AudioServerStartedEvent(0))
+
+    def GetAudioServerConfig(self):
+        # Configuration the server should run with, for the planner.
         audio_inputs = self.GetAudioInputs()
         audio_input = self.GetAudioInput()
         if audio_input in audio_inputs:
-            server.setInputDevice(audio_input)
-        server.boot()
-        server.start()
-        wx.PostEvent(self.GetTopWindow(), AudioServerStartedEvent(0))
+            channels = audio_inputs[audio_input]['channels']
+        else:
+            audio_input = -1
+            channels = max([d['channels'] for d in audio_inputs.values() if d['default']] or [2])
+        return {
+            'input': audio_input,
+            'sampling_rate': self.GetAudioSamplingRate(),
+            'buffer_size': self.GetAudioServerBufferSize(),
+            'input_channels': min(16, max(1, channels)),
+            # pyo always opens an output stream; input only keeps it to one channel.
+            'output_channels': 1 if self.GetAudioInputOnly() else 2,
+            'channels': self.GetAudioInputChannels(),
+            'channel_fade': self.GetAudioChannelFade(),
+        }
+
+    def ConfigureAudioServer(self, server):
+        # Only takes effect while the server is shut down.
+        config = self.GetAudioServerConfig()
+        if config['input'] >= 0:
+            server.setInputDevice(config['input'])
+        server.setSamplingRate(config['sampling_rate'])
+        server.setBufferSize(config['buffer_size'])
+        server.setIchnls(config['input_channels'])
+        server.setNchnls(config['output_channels'])
+        self._audio_server_config = config
+
+    def ReconfigureAudioServer(self):
+        # Apply audio settings with the smallest change that does it: re-patch
+        # the input bus on the running server, or restart the server.
+        current = getattr(self, '_audio_server_config', None)
+        if self.GetAudioServerStatus() != 'running':
+            current = None
+        wanted = self.GetAudioServerConfig()
+        path, changed = plan_audio_reconfiguration(current, wanted)
+        if path == 'restart':
+            self.RebootAudioServer()
+            return
+        if path == 'repatch':
+            self.UpdateAudioInputBus()
+            current.update((k, wanted[k]) for k in changed)
+        self.SetAudioReconfiguration(path, changed, 0.0)
+
+    def GetAudioReconfiguration(self):
+        # (path, changed keys, gap in seconds) of the last audio settings
+        # change; the gap is None while a restart is in progress.
+        return tuple(getattr(self, '_audio_reconfiguration', ('none', [], 0.0)))
+
+    def SetAudioReconfiguration(self, path, changed, gap):
+        self._audio_reconfiguration = [path, changed, gap]
+        self.PublishState('audio_reconfiguration', self.GetAudioReconfiguration())
+        logging.info('audio %s (%s): %.0f ms without audio', path, ', '.join(changed) or '-', gap * 1000.0)
+
+    def GetAudioLatency(self):
+        # (block period, callback jitter, estimated round trip) in seconds.
+        block_timer = getattr(self, '_block_timer', None)
+        if not block_timer or self.GetAudioServerStatus() != 'running':
+            return None
+        jitter = block_timer.jitter
+        return block_timer.period, jitter, 2.0 * block_timer.period + jitter
 
     def ShutdownAudioServer(self):
         if hasattr(self, '_pyo_server'):
-            if self._pyo_server and self._pyo_server.getIsBooted():
-                if self._pyo_server.getIsStarted():
-                    self._pyo_server.stop()
-                    top_window = self.GetTopWindow()
-                    if top_window:
-                        wx.PostEvent(top_window, AudioServerStoppedEvent(0))
-                self._pyo_server.shutdown()
-            delattr(self, '_pyo_server')
+            with self.GetDeviceRegistry().lock:
+                if self._pyo_server and self._pyo_server.getIsBooted():
+                    if self._pyo_server.getIsStarted():
+                        self._pyo_server.stop()
+                        top_window = self.GetTopWindow()
+                        if top_window:
+                            wx.PostEvent(top_window, AudioServerStoppedEvent(0))
+                    self._pyo_server.shutdown()
+                delattr(self, '_pyo_server')
+            self.PublishStatus()
 
     def OnMidiListenerCallback(self, status, data1, data2, device_id=None):
         pass
 
     def GetMidiListener(self):
         if not hasattr(self, '_midi_listener'):
-            self.RefreshMidiInputs()
             midi_inputs = self.GetMidiInputs()
             midi_input = self.GetMidiInput()
             if midi_input in midi_inputs:
@@ -409,22 +646,26 @@ class App(wx.App):
         else:
             return 'stopped'
 
-    def RebootMidiListener(self):
+    def RebootMidiListener(self, delay=1000):
         if not hasattr(self, '_reboot_midi_listener_call'):
             self._reboot_midi_listener_call = wx.CallLater(1, self.OnRebootMidiListener)
-        self._reboot_midi_listener_call.Start(1000)
+        self._reboot_midi_listener_call.Start(delay)
 
     def OnRebootMidiListener(self):
+        with self.GetDeviceRegistry().lock:
+            self.StopMidiListener()
+            self.GetMidiListener()
+        self.PublishStatus()
+
+    def StopMidiListener(self):
         if hasattr(self, '_midi_listener'):
             if self._midi_listener.is_alive():
                 self._midi_listener.stop()
                 self._midi_listener.join(1.0)
             del self._midi_listener
-        self.GetMidiListener()
 
     def GetMidiDispatcher(self):
         if not hasattr(self, '_midi_dispatcher'):
-            self.RefreshMidiOutputs()
             midi_outputs = self.GetMidiOutputs()
             midi_output = self.GetMidiOutput()
             print(midi_outputs, midi_output)
@@ -444,125 +685,443 @@ class App(wx.App):
         else:
             return 'stopped'
 
-    def RebootMidiDispatcher(self):
+    def RebootMidiDispatcher(self, delay=1000):
         if not hasattr(self, '_reboot_midi_dispatcher_call'):
             self._reboot_midi_dispatcher_call = wx.CallLater(1, self.OnRebootMidiDispatcher)
-        self._reboot_midi_dispatcher_call.Start(1000)
+        self._reboot_midi_dispatcher_call.Start(delay)
 
     def OnRebootMidiDispatcher(self):
+        with self.GetDeviceRegistry().lock:
+            self.StopMidiDispatcher()
+            self.GetMidiDispatcher()
+        self.PublishStatus()
+
+    def StopMidiDispatcher(self):
         if hasattr(self, '_midi_dispatcher'):
             if self._midi_dispatcher.is_alive():
                 self._midi_dispatcher.stop()
                 self._midi_dispatcher.join(1.0)
             del self._midi_dispatcher
-        self.GetMidiDispatcher()
 
+    def RebootMidiDevices(self, delay=1000):
+        if not hasattr(self, '_reboot_midi_devices_call'):
+            self._reboot_midi_devices_call = wx.CallLater(1, self.OnRebootMidiDevices)
+        self._reboot_midi_devices_call.Start(delay)
+
+    def OnRebootMidiDevices(self):
+        # pyo's pm_get_* terminate PortMidi, so MIDI devices are only
+        # enumerated with the listener and the dispatcher both closed.
+        with self.GetDeviceRegistry().lock:
+            self.StopMidiListener()
+            self.StopMidiDispatcher()
+            self.EnumerateDevices(DeviceRegistry.MIDI_KINDS)
+            self.GetMidiListener()
+            self.GetMidiDispatcher()
+        self.PublishStatus()
+
+    @TIMINGS.timed('App.SendMidiEvent', 0.001)
     def SendMidiEvent(self, status, data1, data2=0, timestamp=0, device=-1):
         if hasattr(self, '_midi_dispatcher') and self._midi_dispatcher.is_alive():
-            self._midi_dispatcher.send(status, data1, data2, timestamp, device)
+            self._midi_dispatcher.put(status, data1, data2, timestamp, device)
 
     def SendMidiSysEvent(self, msg, timestamp=0, device=-1):
         if hasattr(self, '_midi_dispatcher') and self._midi_dispatcher.is_alive():
-            self._midi_dispatcher.sendx(msg, timestamp, device)
+            self._midi_dispatcher.putx(msg, timestamp, device)
 
     def OnAudioServerStarted(self, event):
+        self.UpdateAudioInputBus()
         self.StartAudioInputMeter()
         self.StartAudioStrengthAnalyzer()
         self.StartBeatGenerator()
+        self.StartTempoDetector()
+        self.StartStyleDetector()
+        if hasattr(self, '_audio_gap_started'):
+            # Measured until the analyzers are running again.
+            path, changed, gap = self.GetAudioReconfiguration()
+            self.SetAudioReconfiguration(path, changed, time.perf_counter() - self._audio_gap_started)
+            del self._audio_gap_started
+        self.PublishStatus()
+        self.UpdateTimers()
 
     def OnAudioServerStopped(self, event):
+        # The beat generator runs on its own thread and keeps the MIDI clock
+        # going while the server restarts; stopping it would send 0xFC.
         self.StopAudioInputMeter()
         self.StopAudioStrengthAnalyzer()
-        self.StopBeatGenerator()
+        self.StopTempoDetector()
+        self.StopStyleDetector()
+        self.PublishStatus()
+        self.UpdateTimers()
 
     def StartAudioInputMeter(self):
-        input_meter = wx.FindWindowById(ID_INPUT_METER)
-        if not input_meter:
+        if not wx.FindWindowById(ID_INPUT_METER):
             self.StopAudioInputMeter()
             return
 
-        input_meter_ref = weakref.ref(input_meter)
+        # Meter shows -90 to +30 dB as 0 to 120 (the mixed input can exceed
+        # full scale).
+        if not hasattr(self, '_input_meter_table'):
+            self._input_meter_table = LevelTable(max_amp=10 ** 1.5)
+            self._input_meter_table.build(-90, 30, 0, 120)
+        meter_lookup = self._input_meter_table.lookup
+        meter_slot = self._display_slots['meter']
 
         def peak_amp_func(*args):
-            meter_data = [min(120, max(0, int(-120.0 if arg < 0.000001 else 20.0 * math.log10(arg)) + 90)) for arg in args]
-            # meter_data = [min(120, max(0, int(pyo.rescale(arg, 0, 1, 0, 120)))) for arg in args]
-            input_meter = input_meter_ref()
-            if input_meter:
-                input_meter.SetData(meter_data, 0, len(meter_data))
+            meter_slot.put([meter_lookup(arg) for arg in args])
 
-        aic = self.GetAudioInputChannels()
-        chans = [n for n in range(8) if (aic & (2 ** n))]
-        inp = pyo.Input(chans)
-        mix = pyo.Mix(inp, 2)
+        self.StopAudioInputMeter()
+        mix = self.GetAudioInputBus().acquire(2)
         self._input_peak_amp = pyo.PeakAmp(mix, peak_amp_func)
 
     def StopAudioInputMeter(self):
         if hasattr(self, '_input_peak_amp'):
             delattr(self, '_input_peak_amp')
+            self.GetAudioInputBus().release(2)
+
+    def GetAudioInputBus(self):
+        # Input and mixes shared by the meter and all analyzers.
+        if not hasattr(self, '_input_bus'):
+            self._input_bus = InputBus()
+        return self._input_bus
+
+    def UpdateAudioInputBus(self):
+        aic = self.GetAudioInputChannels()
+        self.GetAudioInputBus().fade = self.GetAudioChannelFade()
+        self.GetAudioInputBus().channels = [n for n in range(16) if aic & (2 ** n)]
 
     def OnAudioStrengthVelocity(self, velocity):
+        self._display_slots['strength'].put(velocity)
+        self.SendMidiOutputValue(self.GetStrengthMidiOutput(), velocity)
+
+    def OnAudioStrengthVelocities(self, velocities):
+        # Batched per-band velocities from the multi-band analyzer; bands whose
+        # value was suppressed by the change filter are None.
+        levels = getattr(self, '_strength_band_levels', [])
+        if len(levels) != len(velocities):
+            levels = [0] * len(velocities)
+            self._strength_band_levels = levels
+        outputs = self.GetStrengthBandMidiOutputList(len(velocities))
+        for band, velocity in enumerate(velocities):
+            if velocity is not None:
+                levels[band] = velocity
+                self.SendMidiOutputValue(outputs[band], velocity)
+        self._display_slots['strength'].put(max(levels))
+
+    def SendMidiOutputValue(self, midi_output, value):
+        # Send a 0-127 value as the last data byte of a configured output.
+        if midi_output:
+            self.SendMidiEvent(*midi_output_message(midi_output, value))
+
+    @TIMINGS.timed('App.OnBeatClock', 0.001)
+    def OnBeatClock(self, msg=None):
+        # Called from the beat generator thread after the message has been
+        # handed to the MIDI dispatcher; never block it on GUI work.
+        if msg:
+            self._display_slots['speed'].put(msg)
+
+    def StartDisplayTimer(self):
+        # Audio and MIDI threads only store their latest output in these
+        # slots; a single timer renders them at the display rate. A second,
+        # slower one samples the measurements into the state model.
+        if not hasattr(self, '_display_slots'):
+            self._display_slots = dict((name, ValueSlot()) for name in ('meter', 'strength', 'speed'))
+        if not hasattr(self, '_display_timer'):
+            self._display_timer = wx.Timer(self)
+            self.Bind(wx.EVT_TIMER, self.OnDisplayTimer, self._display_timer)
+            self._status_timer = wx.Timer(self)
+            self.Bind(wx.EVT_TIMER, self.OnStatusTimer, self._status_timer)
+        self.UpdateTimers()
+
+    def UpdateTimers(self):
+        # Nothing is produced while neither the audio server nor the beat
+        # clock runs; stop the timers then (after one last pass to show the
+        # final values) so an idle app does not wake up at all.
+        if not hasattr(self, '_display_timer'):
+            return
+        beat_generator = getattr(self, '_beat_generator', None)
+        active = self.GetAudioServerStatus() == 'running' or bool(beat_generator and beat_generator.enabled)
+        if active and not self._display_timer.IsRunning():
+            self._display_timer.Start(max(1, 1000 // max(1, self.GetDisplayRate())))
+            self._status_timer.Start(self.STATUS_INTERVAL)
+        elif not active and self._display_timer.IsRunning():
+            self._display_timer.Stop()
+            self._status_timer.Stop()
+        if not active:
+            self.OnDisplayTimer(None)
+            self.OnStatusTimer(None)
+
+    def StopDisplayTimer(self):
+        if hasattr(self, '_display_timer'):
+            self._display_timer.Stop()
+            self._status_timer.Stop()
+
+    def OnDisplayTimer(self, event):
+        self.UpdateInputMeter()
+        self.UpdateStrengthGauge()
+        self.UpdateSpeedDisplay()
+
+    def OnStatusTimer(self, event):
+        self.PublishStatus()
+        self.PublishMeasurements()
+
+    def PublishStatus(self):
+        self.PublishState('audio_server_status', self.GetAudioServerStatus())
+        self.PublishState('midi_listener_status', self.GetMidiListenerStatus())
+        self.PublishState('midi_dispatcher_status', self.GetMidiDispatcherStatus())
+
+    def PublishMeasurements(self):
+        # Values written from the audio and MIDI threads, sampled here.
+        histograms = TIMINGS.histograms
+        worst = max(histograms, key=lambda h: h.over_count) if histograms else None
+        self.PublishState('timings', (worst.name, worst.over_count) if worst and worst.over_count else None)
+        self.PublishState('display_counts', self.GetDisplayCounts())
+        self.PublishState('audio_latency', self.GetAudioLatency())
+        self.PublishState('speed_detected', (self.GetSpeedDetectedBPM(), self.GetSpeedDetectedConfidence()))
+        self.PublishState('speed_lock_status', self.GetSpeedLockStatus())
+        self.PublishState('strength_counts', self.GetStrengthCounts())
+        self.PublishState('style_chord', self.GetStyleChord())
+        self.PublishState('style_key', self.GetStyleKey())
+        self.PublishState('style_descriptors', self.GetStyleDescriptors())
+
+    def GetDisplayCounts(self):
+        if not hasattr(self, '_display_slots'):
+            return 0, 0
+        slots = self._display_slots.values()
+        return sum(slot.produced for slot in slots), sum(slot.rendered for slot in slots)
+
+    def UpdateInputMeter(self):
+        meter_data = self._display_slots['meter'].take()
+        if meter_data is None:
+            return
+        if not hasattr(self, '_input_meter'):
+            self._input_meter = wx.FindWindowById(ID_INPUT_METER)
+        if self._input_meter:
+            self._input_meter.SetData(meter_data, 0, len(meter_data))
+
+    def UpdateStrengthGauge(self):
+        velocity = self._display_slots['strength'].take()
+        if velocity is None:
+            return
         if not hasattr(self, '_strength_gauge'):
             self._strength_gauge = wx.FindWindowById(ID_STRENGTH_GAUGE)
-        if self._strength_gauge:
+        if self._strength_gauge and self._strength_gauge.GetValue() != velocity:
             self._strength_gauge.SetValue(velocity)
             self._strength_gauge.Refresh()
-        midi_output = self.GetStrengthMidiOutput()
-        if midi_output:
-            status = (midi_output & 0xff00) >> 8
-            data1 = midi_output & 0xff
-            data2 = velocity & 0x7f
-            self.SendMidiEvent(status, data1, data2)
 
-    def OnBeatClock(self, msg=None):
-        if not msg:
-            return
-        self.SendMidiSysEvent(msg)
+    def UpdateSpeedDisplay(self):
+        # Draw the position of the clock rather than counting ticks, so
+        # coalesced ticks are not lost.
+        self._display_slots['speed'].take()
         if not hasattr(self, '_speed_display'):
             self._speed_display = wx.FindWindowById(ID_SPEED_DISPLAY)
         if self._speed_display:
-            if msg == b'\xf8':
-                self._speed_display.NextClock()
-            else:
-                self._speed_display.SetValue(None)
-            self._speed_display.Refresh()
+            clock = self._beat_generator.getClock() if hasattr(self, '_beat_generator') else None
+            value = None if clock is None else clock % 96
+            if self._speed_display.GetValue() != value:
+                # Invalidates only the dots that change colour.
+                self._speed_display.SetValue(value)
 
     def StartBeatGenerator(self):
         self.UpdateBeatGenerator()
 
     def UpdateBeatGenerator(self):
         if not hasattr(self, '_beat_generator'):
-            self._beat_generator = BeatGenerator(self.OnBeatClock)
+            self._beat_generator = BeatGenerator(self.OnBeatClock, self.SendMidiSysEvent)
+            self._beat_tracker = BeatTracker(self._beat_generator)
+            self.GetState().subscribe(self.OnAudioLatency, 'audio_latency')
+            self.OnAudioLatency('audio_latency', self.GetAudioLatency())
 
         enabled = self.GetSpeedEnabled()
         if not enabled and self._beat_generator.enabled:
             self._beat_generator.enabled = enabled
 
-        self._beat_generator.bpm = self.GetSpeedBPM()
+        detected_bpm = self.GetSpeedDetectedBPM()
+        if self.GetSpeedDetect() and detected_bpm:
+            self._beat_tracker.setBPM(detected_bpm)
+        else:
+            self._beat_tracker.setBPM(self.GetSpeedBPM())
+        if not self.GetSpeedLock():
+            self._beat_tracker.reset()
+            self._beat_generator.adjust(scale=1.0)
 
         if enabled and not self._beat_generator.enabled:
             self._beat_generator.enabled = enabled
         if enabled:
             self._beat_generator.play()
+        self.UpdateTimers()
 
     def StopBeatGenerator(self):
         if hasattr(self, '_beat_generator'):
             self._beat_generator.stop()
 
+    def GetSpeedDetectedBPM(self):
+        return getattr(self, '_detected_bpm', 0.0)
+
+    def GetSpeedDetectedConfidence(self):
+        return getattr(self, '_detected_confidence', 0.0)
+
+    def OnSpeedTempo(self, bpm, confidence):
+        self._detected_bpm = bpm
+        self._detected_confidence = confidence
+        if self.GetSpeedDetect() and hasattr(self, '_beat_tracker'):
+            self._beat_tracker.setBPM(bpm)
+
+    def OnAudioLatency(self, name, latency):
+        # Onsets reach the tracker an input buffer (and the callback
+        # jitter) after they were played: the round trip less the output.
+        if latency:
+            period, jitter, round_trip = latency
+            self._beat_tracker.offset = round_trip - period
+
+    def OnSpeedOnset(self, now):
+        # Called from the audio thread for every detected onset.
+        if self.GetSpeedLock() and hasattr(self, '_beat_tracker'):
+            self._beat_tracker.onset(now)
+
+    def GetSpeedLockStatus(self):
+        # Returns (locked, phase error, mean absolute phase error) in seconds.
+        if not hasattr(self, '_beat_tracker') or not self._beat_tracker.matched_count:
+            return False, 0.0, 0.0
+        tracker = self._beat_tracker
+        return tracker.locked, tracker.phase_error, tracker.mean_error
+
+    def StartTempoDetector(self):
+        self.UpdateTempoDetector()
+
+    def UpdateTempoDetector(self):
+        if self.GetAudioServerStatus() != 'running':
+            return
+        if not hasattr(self, '_tempo_detector'):
+            server = self.GetAudioServer()
+            self._tempo_detector = TempoDetector(self.OnSpeedTempo, server.getBufferSize(), server.getSamplingRate(),
+                                                 bus=self.GetAudioInputBus(), onset_callback=self.OnSpeedOnset)
+
+        enabled = self.GetSpeedEnabled() and (self.GetSpeedDetect() or self.GetSpeedLock())
+        if not enabled and self._tempo_detector.enabled:
+            self._tempo_detector.enabled = enabled
+
+        if enabled and not self._tempo_detector.enabled:
+            self._tempo_detector.enabled = enabled
+
+    def StopTempoDetector(self):
+        if hasattr(self, '_tempo_detector'):
+            self._tempo_detector.stop()
+            del self._tempo_detector
+
+    def StartStyleDetector(self):
+        self.UpdateStyleDetector()
+
+    def UpdateStyleDetector(self):
+        if self.GetAudioServerStatus() != 'running':
+            return
+        if not hasattr(self, '_style_detector'):
+            server = self.GetAudioServer()
+            self._style_detector = StyleDetector(self.OnStyleChord, server.getBufferSize(), server.getSamplingRate(),
+                                                 bus=self.GetAudioInputBus(), key_callback=self.OnStyleKey,
+                                                 descriptors_callback=self.OnStyleDescriptors)
+
+        enabled = self.GetStyleEnabled()
+        if not enabled and self._style_detector.enabled:
+            self._style_detector.enabled = enabled
+            self.OnStyleChord(None, None)
+            self.OnStyleKey(None, None)
+
+        if enabled and not self._style_detector.enabled:
+            self._style_detector.enabled = enabled
+
+    def StopStyleDetector(self):
+        if hasattr(self, '_style_detector'):
+            self._style_detector.stop()
+            del self._style_detector
+            self.OnStyleChord(None, None)
+            self.OnStyleKey(None, None)
+
+    def GetStyleChord(self):
+        return getattr(self, '_style_chord', (None, None))
+
+    def OnStyleChord(self, root, quality):
+        self._style_chord = (root, quality)
+        chord = None if root is None else root + 12 * CHORD_QUALITIES.index(quality)
+        self.SendStyleEvent('chord', self.GetStyleChordMidiOutput(), chord)
+
+    def GetStyleKey(self):
+        # Returns (tonic, mode, confidence).
+        tonic, mode = getattr(self, '_style_key', (None, None))
+        style_detector = getattr(self, '_style_detector', None)
+        return tonic, mode, style_detector.key_confidence if style_detector else 0.0
+
+    def OnStyleKey(self, tonic, mode):
+        self._style_key = (tonic, mode)
+        key = None if tonic is None else tonic + 12 * CHORD_QUALITIES.index(mode)
+        self.SendStyleEvent('key', self.GetStyleKeyMidiOutput(), key)
+
+    def GetStyleDescriptors(self):
+        # Returns the latest raw descriptor values by name.
+        style_detector = getattr(self, '_style_detector', None)
+        if not style_detector or not style_detector.enabled:
+            return {}
+        return dict(zip(SPECTRAL_DESCRIPTORS, style_detector.descriptors))
+
+    def OnStyleDescriptors(self, values):
+        for name, value in zip(SPECTRAL_DESCRIPTORS, values):
+            if value is not None:
+                self.SendMidiOutputValue(self.GetStyleDescriptorMidiOutput(name), value)
+
+    def SendStyleEvent(self, name, midi_output, number):
+        # Chords and keys are numbered 0-11 (major) and 12-23 (minor) by root.
+        # Note output plays the base note plus the number (and releases the
+        # previous one), control changes send the number plus one (0 for
+        # none) and program changes select the base program plus the number.
+        command = midi_output & 0xf000
+        status = (midi_output & 0xff00) >> 8
+        data = midi_output & 0x7f
+        if not hasattr(self, '_style_notes'):
+            self._style_notes = {}
+        previous = self._style_notes.pop(name, None)
+        if previous:
+            self.SendMidiEvent(0x80 | (previous[0] & 0x0f), previous[1], 0)
+        if command == 0x9000:
+            if number is not None:
+                self._style_notes[name] = (status, min(127, data + number))
+                self.SendMidiEvent(status, self._style_notes[name][1], 127)
+        elif command == 0xb000:
+            # Same coalescing path as every other CC output, so a chord or key
+            # change cannot overtake an older value of the same controller.
+            self.SendMidiOutputValue(midi_output, 0 if number is None else number + 1)
+        elif command == 0xc000 and number is not None:
+            self.SendMidiEvent(status, min(127, data + number))
+
     def StartAudioStrengthAnalyzer(self):
         self.UpdateAudioStrengthAnalyzer()
 
     def UpdateAudioStrengthAnalyzer(self):
-        if not hasattr(self, '_strength_analyzer'):
-            self._strength_analyzer = StrengthAnalyzer(self.OnAudioStrengthVelocity)
+        multiband = self.GetStrengthMultiBand()
+        goertzel = self.GetStrengthBackend() == 'goertzel'
+        if goertzel:
+            analyzer_class = GoertzelAnalyzer
+        else:
+            analyzer_class = MultiBandAnalyzer if multiband else StrengthAnalyzer
+        analyzer = getattr(self, '_strength_analyzer', None)
+        if analyzer and (type(analyzer) is not analyzer_class or goertzel and analyzer.multiband != multiband):
+            self._strength_analyzer.stop()
+            del self._strength_analyzer
         if self.GetAudioServerStatus() != 'running':
             return
+        if not hasattr(self, '_strength_analyzer'):
+            callback = self.OnAudioStrengthVelocities if multiband else self.OnAudioStrengthVelocity
+            if goertzel:
+                server = self.GetAudioServer()
+                self._strength_analyzer = GoertzelAnalyzer(callback, bus=self.GetAudioInputBus(),
+                                                           buffer_size=server.getBufferSize(),
+                                                           sampling_rate=server.getSamplingRate(),
+                                                           multiband=multiband)
+            else:
+                self._strength_analyzer = analyzer_class(callback, bus=self.GetAudioInputBus())
 
         enabled = self.GetStrengthEnabled()
         if not enabled and self._strength_analyzer.enabled:
             self._strength_analyzer.enabled = enabled
 
-        aic = self.GetAudioInputChannels()
-        self._strength_analyzer.input_channels = [n for n in range(16) if aic & (2 ** n)]
         self._strength_analyzer.lpf = self.GetStrengthLPF()
         self._strength_analyzer.attack = self.GetStrengthAttack()
         self._strength_analyzer.release = self.GetStrengthRelease()
@@ -570,6 +1129,12 @@ class App(wx.App):
         self._strength_analyzer.min_velocity = self.GetStrengthMinVelocity()
         self._strength_analyzer.max_spl = self.GetStrengthMaxSPL()
         self._strength_analyzer.max_velocity = self.GetStrengthMaxVelocity()
+        self._strength_analyzer.curve = self.GetStrengthCurve()
+        self._strength_analyzer.hysteresis = self.GetStrengthHysteresis()
+        self._strength_analyzer.max_rate = self.GetStrengthMaxRate()
+        self._strength_analyzer.refresh = self.GetStrengthRefresh()
+        if multiband:
+            self._strength_analyzer.crossovers = self.GetStrengthCrossoverList()
 
         if enabled and not self._strength_analyzer.enabled:
             self._strength_analyzer.enabled = enabled
@@ -579,6 +1144,12 @@ class App(wx.App):
     def StopAudioStrengthAnalyzer(self):
         if hasattr(self, '_strength_analyzer'):
             self._strength_analyzer.stop()
+            del self._strength_analyzer
+
+    def GetStrengthCounts(self):
+        if not hasattr(self, '_strength_analyzer'):
+            return 0, 0
+        return self._strength_analyzer.sent_count, self._strength_analyzer.suppressed_count
 
     GetLogLevel = lambda s: s.GetSetting('log_level', str, 'normal')
 
@@ -622,6 +1193,7 @@ class App(wx.App):
 
     def GetResource(self, res_id):
         if hasattr(sys, 'frozen') and sys.frozen in ('windows_exe', 'console_exe'):
+            import win32api
             return win32api.LoadResource(0, 'beatdown', res_id)
         else:
             res_path = {
@@ -6,17 +6,16 @@ import sys
 import wx
 import wx.lib.newevent
 
-# PyWin32
-try:
-    import win32api
-except ImportError:
-    win32api = None
+# BeatDown
+from .version import __version__
 
 # Update path, icon and version based on whether running as a compiled EXE or
 # from the source.
 if hasattr(sys, 'frozen') and sys.frozen in ('windows_exe', 'console_exe'):
     APP_PATH = os.path.dirname(os.path.abspath(sys.executable))
     ICON_PATH = os.path.abspath(sys.executable)
+    # PyWin32 is always bundled with the EXE and not needed from the source.
+    import win32api
     VERSION = win32api.GetFileVersionInfo(os.path.abspath(sys.executable),
                                           u'\\\\StringFileInfo\\\\040904B0\\\\ProductVersion') or ''
 else:
@@ -24,14 +23,7 @@ else:
     ICON_PATH = os.path.join(APP_PATH, 'graphics', 'logo.ico')
     if not os.path.exists(ICON_PATH):
         ICON_PATH = None
-    try:
-        version = '?'
-        for line in open(os.path.join(APP_PATH, 'setup.py'), 'r').readlines():
-            if line.strip().startswith('version='):
-                version = line.split('=', 1)[1].replace('\'', '').replace(',', '').strip()
-    except IOError:
-        pass
-    VERSION = '{}.dev'.format(version)
+    VERSION = '{}.dev'.format(__version__)
 
 APP_NAME = 'BeatDown'
 VENDOR_NAME = 'Nine More Minutes, Inc.'
@@ -47,9 +39,12 @@ ID_SPEED_DISPLAY = wx.NewId()
 
 ID_AUDIO_INPUT_SELECT = wx.NewId()
 ID_STATUS_TEXT = wx.NewId()
+ID_SHOW_TIMINGS = wx.NewId()
+ID_REFRESH_DEVICES = wx.NewId()
 
 
 AudioServerStartedEvent, EVT_AUDIO_SERVER_STARTED = wx.lib.newevent.NewCommandEvent()
 AudioServerStoppedEvent, EVT_AUDIO_SERVER_STOPPED = wx.lib.newevent.NewCommandEvent()
+DevicesChangedEvent, EVT_DEVICES_CHANGED = wx.lib.newevent.NewCommandEvent()
 
 __all__ = [x for x in locals().keys() if x[0].isupper()]
@@ -4,6 +4,7 @@ import wx.lib.agw.floatspin
 
 # BeatDown
 from .constants import *  # noqa
+from .engine import TIMINGS
 from .utils import *  # noqa
 
 
@@ -72,7 +73,53 @@ class MidiNoteSpinCtrl(wx.lib.agw.floatspin.FloatSpin):
         return self.EnableNotes(False)
 
 
+def beat_display_dots():
+    # (clock, left, offset, radius) of the dots drawn for a bar of 96 clocks,
+    # in percent of the display width; clocks without a dot are left out.
+    dots = []
+    for clock in range(96):
+        offset = 0.0
+        if clock % 24 == 0:
+            radius = 4.0
+        elif clock % 12 == 0:
+            radius = 2.0
+        elif clock % 6 == 0:
+            radius = 1.0
+            if clock % 24 == 6:
+                offset = 1.0
+            elif clock % 24 == 18:
+                offset = -1.0
+        elif clock % 3 == 0:
+            radius = 0.5
+            if clock % 24 == 3:
+                offset = 2.0
+            elif clock % 24 == 21:
+                offset = -2.0
+        else:
+            continue
+        dots.append((clock, 4.0 + clock, offset, radius))
+    return dots
+
+
+# Default of BeatDisplay.GetShade for the current value, since None means
+# that no clock is running.
+_CURRENT_VALUE = object()
+
+
 class BeatDisplay(wx.Window):
+    """Bar of 96 clock dots with a fading trail behind the current clock.
+
+    The dots in their inactive colour are drawn once into a cached bitmap,
+    rebuilt when the size or a colour changes. A paint blits the damaged
+    part of that bitmap and draws the highlighted dots on top; changing the
+    value only invalidates the dots whose colour changes.
+    """
+
+    DOTS = beat_display_dots()
+
+    # Colour (0 active, 1 and 2 fading, 3 inactive) by how many clocks a dot
+    # is behind the current value.
+    SHADES = [0] * 3 + [1] * 9 + [2] * 12 + [3] * 72
 
     def __init__(self, parent, id=wx.ID_ANY, pos=wx.DefaultPosition,
                  size=(-1, 30), style=0):
@@ -81,14 +128,20 @@ class BeatDisplay(wx.Window):
         self._size = size
         self._value = None
         self._inactive_colour = None
+        self._layout = []
+        self._layout_size = None
+        self._bitmap = None
+        self._brushes = None
 
         self.Bind(wx.EVT_PAINT, self.OnPaint)
         self.Bind(wx.EVT_ERASE_BACKGROUND, self.OnEraseBackground)
+        self.Bind(wx.EVT_SIZE, self.OnSize)
 
     def GetValue(self):
         return self._value
 
     def SetValue(self, value):
+        previous = self._value
         if value is None:
             self._value = value
         else:
@@ -96,96 +149,140 @@ class BeatDisplay(wx.Window):
                 self._value = min(95, max(0, int(value)))
             except (TypeError, ValueError):
                 pass
+        if self._value != previous:
+            self.RefreshDots(previous, self._value)
 
     def NextClock(self):
         value = self.GetValue()
         self.SetValue(0 if value is None else (value + 1) % 96)
 
+    def GetShade(self, clock, value=_CURRENT_VALUE):
+        value = self._value if value is _CURRENT_VALUE else value
+        return 3 if value is None else self.SHADES[(value - clock) % 96]
+
+    def GetChangedRect(self, previous, value):
+        # Bounding box of the dots whose shade differs between two values,
+        # None if there are none.
+        rect = None
+        for clock, x, y, radius in self.GetLayout():
+            if self.GetShade(clock, previous) != self.GetShade(clock, value):
+                dot_rect = wx.Rect(x - radius - 1, y - radius - 1, 2 * radius + 3, 2 * radius + 3)
+                rect = dot_rect if rect is None else rect.Union(dot_rect)
+        return rect
+
+    def RefreshDots(self, previous, value):
+        rect = self.GetChangedRect(previous, value)
+        if rect is not None:
+            self.RefreshRect(rect, False)
+
     def GetInactiveColour(self):
+        # Derived from the foreground colour unless set explicitly.
         if self._inactive_colour is None:
-            self.SetInactiveColour(None)
+            colour = wx.Colour(self.GetForegroundColour())
+            colour.MakeDisabled(32)
+            return colour
         return self._inactive_colour
 
     def SetInactiveColour(self, colour):
-        if colour is None:
-            colour = wx.Colour(self.GetForegroundColour())
-            colour.MakeDisabled(32)
-            self._inactive_colour = colour
-        else:
-            self._inactive_colour = wx.Colour(colour)
+        self._inactive_colour = None if colour is None else wx.Colour(colour)
+        self.InvalidateCache()
 
     GetInactiveColor = GetInactiveColour
     SetInactiveColor = SetInactiveColour
 
+    def SetForegroundColour(self, colour):
+        result = super(BeatDisplay, self).SetForegroundColour(colour)
+        self.InvalidateCache()
+        return result
+
+    def SetBackgroundColour(self, colour):
+        result = super(BeatDisplay, self).SetBackgroundColour(colour)
+        self.InvalidateCache()
+        return result
+
+    def InvalidateCache(self):
+        self._bitmap = None
+        self._brushes = None
+        self.Refresh(False)
+
+    def GetLayout(self):
+        # (clock, x, y, radius) in pixels of the dots large enough to draw.
+        size = self.GetClientSize()
+        if self._layout_size != size:
+            self._layout = []
+            for clock, left, offset, radius in self.DOTS:
+                circle_radius = size.width * radius / 100
+                if circle_radius >= 1.2:
+                    self._layout.append((clock, int(size.width * (left + offset) / 100), int(size.height * 0.5),
+                                         int(circle_radius)))
+            self._layout_size = size
+            self._bitmap = None
+        return self._layout
+
+    def GetBrushes(self):
+        # Brush and pen per shade.
+        if self._brushes is None:
+            fg_color = self.GetForegroundColour()
+            in_color1 = wx.Colour(fg_color)
+            in_color1.MakeDisabled(128)
+            in_color2 = wx.Colour(fg_color)
+            in_color2.MakeDisabled(64)
+            colors = [fg_color, in_color1, in_color2, self.GetInactiveColour()]
+            self._brushes = [(wx.Brush(color), wx.Pen(color)) for color in colors]
+        return self._brushes
+
+    def GetBitmap(self):
+        # Background and every dot in the inactive colour.
+        layout = self.GetLayout()
+        if self._bitmap is None:
+            size = self.GetClientSize()
+            self._bitmap = wx.Bitmap(max(1, size.width), max(1, size.height))
+            dc = wx.MemoryDC(self._bitmap)
+            bg_color = self.GetBackgroundColour()
+            dc.SetBackground(wx.Brush(bg_color))
+            dc.Clear()
+            dc.SetBrush(wx.Brush(bg_color))
+            dc.SetPen(wx.Pen(bg_color))
+            dc.DrawRectangle(wx.Rect(size))
+            brush, pen = self.GetBrushes()[3]
+            dc.SetBrush(brush)
+            dc.SetPen(pen)
+            for clock, x, y, radius in layout:
+                dc.DrawCircle(x, y, radius)
+            dc.SelectObject(wx.NullBitmap)
+        return self._bitmap
+
     def DoGetBestSize(self):
         return wx.Size(self._size[0], self._size[1])
 
     def OnEraseBackground(self, event):
         pass
 
+    def OnSize(self, event):
+        self.Refresh(False)
+        event.Skip()
+
+    def Draw(self, dc, box=None):
+        # Draw the part of the display within box (all of it by default).
+        bitmap = self.GetBitmap()
+        if box is None or box.IsEmpty():
+            box = wx.Rect(self.GetClientSize())
+        bitmap_dc = wx.MemoryDC(bitmap)
+        dc.Blit(box.x, box.y, box.width, box.height, bitmap_dc, box.x, box.y)
+        bitmap_dc.SelectObject(wx.NullBitmap)
+        if self._value is None:
+            return
+        brushes = self.GetBrushes()
+        for clock, x, y, radius in self._layout:
+            shade = self.SHADES[(self._value - clock) % 96]
+            if shade == 3 or x + radius < box.x or x - radius > box.x + box.width:
+                continue
+            brush, pen = brushes[shade]
+            dc.SetBrush(brush)
+            dc.SetPen(pen)
+            dc.DrawCircle(x, y, radius)
+
+    @TIMINGS.timed('BeatDisplay.OnPaint', 1.0 / 60)
     def OnPaint(self, event):
         dc = wx.BufferedPaintDC(self)
-        rect = self.GetClientRect()
-
-        fg_color = self.GetForegroundColour()
-        bg_color = self.GetBackgroundColour()
-        in_color = self.GetInactiveColour()
-
-        in_color1 = wx.Colour(fg_color)
-        in_color1.MakeDisabled(128)
-        in_color2 = wx.Colour(fg_color)
-        in_color2.MakeDisabled(64)
-
-        dc.SetBackground(wx.Brush(bg_color))
-        dc.Clear()
-        dc.SetBrush(wx.Brush(bg_color))
-        dc.SetPen(wx.Pen(bg_color))
-        dc.DrawRectangle(rect)
-
-        left = 4.0
-        for clock in range(96):
-            offset = 0.0
-            if clock % 24 == 0:
-                radius = 4.0
-            elif clock % 12 == 0:
-                radius = 2.0
-            elif clock % 6 == 0:
-                radius = 1.0
-                if clock % 24 == 6:
-                    offset = 1.0
-                elif clock % 24 == 18:
-                    offset = -1.0
-            elif clock % 3 == 0:
-                radius = 0.5
-                if clock % 24 == 3:
-                    offset = 2.0
-                elif clock % 24 == 21:
-                    offset = -2.0
-            else:
-                radius = 0.0
-
-            circle_radius = rect.width * radius / 100
-            if circle_radius >= 1.2:
-
-                if self._value is not None:
-                    active = [x % 96 for x in range(self._value - 2, self._value + 1)]
-                    inactive1 = [x % 96 for x in range(self._value - 11, self._value - 2)]
-                    inactive2 = [x % 96 for x in range(self._value - 23, self._value - 11)]
-                    if clock in active:
-                        color = fg_color
-                    elif clock in inactive1:
-                        color = in_color1
-                    elif clock in inactive2:
-                        color = in_color2
-                    else:
-                        color = in_color
-                else:
-                    color = in_color
-                dc.SetBrush(wx.Brush(color))
-                dc.SetPen(wx.Pen(color))
-
-                circle_left = rect.width * (left + offset) / 100
-                circle_top = rect.height * 0.5
-                dc.DrawCircle(circle_left, circle_top, circle_radius)
-
-            left += 1.0
+        self.Draw(dc, self.GetUpdateRegion().GetBox())
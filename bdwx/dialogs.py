@@ -4,8 +4,10 @@ import wx
 # BeatDown
 from .constants import *  # noqa
 from .controls import *  # noqa
+from .engine import TIMINGS
+from .utils import duration_label
 
-__all__ = ['MidiCommandDialog']
+__all__ = ['MidiCommandDialog', 'TimingsDialog']
 
 
 class MidiCommandDialog(wx.Dialog):
@@ -51,18 +53,16 @@ class MidiCommandDialog(wx.Dialog):
         channel_value = ((self.GetValue() & 0x0f00) >> 16) + 1
         channel_spinner = wx.SpinCtrl(self, wx.ID_ANY, value=str(channel_value), min=1, max=16)
         self._channel_spinner = channel_spinner
-        self.Bind(wx.EVT_UPDATE_UI, self.OnChannelUpdate, channel_spinner)
         self.Bind(wx.EVT_TEXT, self.OnChannelSpinner, channel_spinner)
         gbsizer.Add(channel_spinner, (1, 1), (1, 1), wx.ALL, 0)
 
         data_label_text = self.DATA_LABELS.get(command_value, 'Data:')
         data_label = wx.StaticText(self, wx.ID_ANY, data_label_text, style=wx.ALIGN_RIGHT | wx.ST_NO_AUTORESIZE)
-        self.Bind(wx.EVT_UPDATE_UI, self.OnDataLabelUpdate, data_label)
+        self._data_label = data_label
         gbsizer.Add(data_label, (2, 0), (1, 1), wx.EXPAND | wx.ALL, 0)
         data_value = self.GetValue() & 0x7f
         data_spinner = MidiNoteSpinCtrl(self, wx.ID_ANY, value=data_value)
         self._data_spinner = data_spinner
-        self.Bind(wx.EVT_UPDATE_UI, self.OnDataUpdate, data_spinner)
         self.Bind(wx.EVT_SPINCTRL, self.OnDataSpinner, data_spinner)
         gbsizer.Add(data_spinner, (2, 1), (1, 1), wx.ALL, 0)
 
@@ -77,6 +77,7 @@ class MidiCommandDialog(wx.Dialog):
         btnsizer.Realize()
         sizer.Add(btnsizer, 0, wx.EXPAND | wx.ALIGN_CENTER_VERTICAL | wx.ALL, 4)
         self.SetSizerAndFit(sizer)
+        self.UpdateControls()
 
     def GetValue(self):
         return self._value if hasattr(self, '_value') else 0
@@ -92,7 +93,7 @@ class MidiCommandDialog(wx.Dialog):
         self._channel_spinner.SetValue(channel_value)
         data_value = self._value & 0x7f
         self._data_spinner.SetValue(data_value)
-        self.UpdateWindowUI()
+        self.UpdateControls()
 
     def OnCommandChoice(self, event):
         command_choice = event.GetEventObject()
@@ -100,26 +101,22 @@ class MidiCommandDialog(wx.Dialog):
         new_value = (self.GetValue() & 0x0fff) | self.COMMAND_CHOICES[command_selection][0]
         self.SetValue(new_value)
 
-    def OnChannelUpdate(self, event):
-        event.Enable(self.GetValue() & 0x8000)
-
     def OnChannelSpinner(self, event):
         channel_spinner = event.GetEventObject()
         channel_value = channel_spinner.GetValue()
         new_value = (self.GetValue() & 0xf0ff) | (channel_value - 1)
         self.SetValue(new_value)
 
-    def OnDataLabelUpdate(self, event):
+    def UpdateControls(self):
+        # Follows the command; called whenever the value changes.
+        enabled = bool(self.GetValue() & 0x8000)
         command_value = self.GetValue() & 0xf000
-        data_label = event.GetEventObject()
+        self._channel_spinner.Enable(enabled)
         data_label_text = self.DATA_LABELS.get(command_value, None)
-        if data_label_text is not None:
-            data_label.SetLabel(data_label_text)
-
-    def OnDataUpdate(self, event):
-        event.Enable(self.GetValue() & 0x8000)
-        data_spinner = event.GetEventObject()
-        command_value = self.GetValue() & 0xf000
+        if data_label_text is not None and self._data_label.GetLabel() != data_label_text:
+            self._data_label.SetLabel(data_label_text)
+        data_spinner = self._data_spinner
+        data_spinner.Enable(enabled)
         if command_value in (0x8000, 0x9000):
             data_spinner.SetRange(0, 127)
             data_spinner.EnableNotes()
@@ -135,3 +132,99 @@ class MidiCommandDialog(wx.Dialog):
         data_value = int(data_spinner.GetValue())
         new_value = (self.GetValue() & 0xff00) | (data_value & 0x7f)
         self.SetValue(new_value)
+
+
+class TimingsDialog(wx.Dialog):
+
+    COLUMNS = [
+        ('Function', 260),
+        ('Calls', 80),
+        ('Mean', 80),
+        ('p50', 80),
+        ('p99', 80),
+        ('Max', 80),
+        ('Budget', 80),
+        ('Over', 60),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('style', wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        super(TimingsDialog, self).__init__(*args, **kwargs)
+        self.SetBackgroundColour(COLOR_BACKGROUND)
+        self.SetForegroundColour(COLOR_FOREGROUND)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        timings_list = wx.ListCtrl(self, wx.ID_ANY, size=(sum(w for c, w in self.COLUMNS) + 8, 180),
+                                   style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for n, (label, width) in enumerate(self.COLUMNS):
+            timings_list.InsertColumn(n, label, wx.LIST_FORMAT_LEFT if n == 0 else wx.LIST_FORMAT_RIGHT, width)
+        self._timings_list = timings_list
+        sizer.Add(timings_list, 1, wx.EXPAND | wx.ALL, 8)
+
+        btnsizer = wx.BoxSizer(wx.HORIZONTAL)
+        reset_button = wx.Button(self, wx.ID_ANY, 'Reset')
+        self.Bind(wx.EVT_BUTTON, self.OnResetButton, reset_button)
+        btnsizer.Add(reset_button, 0, wx.ALL, 4)
+        dump_button = wx.Button(self, wx.ID_ANY, 'Dump...')
+        self.Bind(wx.EVT_BUTTON, self.OnDumpButton, dump_button)
+        btnsizer.Add(dump_button, 0, wx.ALL, 4)
+        btnsizer.AddStretchSpacer()
+        close_button = wx.Button(self, wx.ID_CLOSE)
+        self.Bind(wx.EVT_BUTTON, self.OnCloseButton, close_button)
+        btnsizer.Add(close_button, 0, wx.ALL, 4)
+        sizer.Add(btnsizer, 0, wx.EXPAND | wx.ALL, 4)
+        self.SetSizerAndFit(sizer)
+
+        # The histograms are written from the audio and MIDI threads; poll
+        # them at a low rate rather than on every UI update.
+        self._timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnTimer, self._timer)
+        self.Bind(wx.EVT_CLOSE, self.OnClose, self)
+        self._timer.Start(500)
+        self.UpdateTimings()
+
+    def UpdateTimings(self):
+        timings_list = self._timings_list
+        for n, histogram in enumerate(TIMINGS.histograms):
+            row = [
+                histogram.name,
+                str(histogram.count),
+                duration_label(histogram.mean),
+                '<' + duration_label(histogram.getPercentile(0.5)),
+                '<' + duration_label(histogram.getPercentile(0.99)),
+                duration_label(histogram.max),
+                duration_label(histogram.budget) if histogram.budget else '',
+                str(histogram.over_count),
+            ]
+            if n >= timings_list.GetItemCount():
+                timings_list.InsertItem(n, row[0])
+            for column, value in enumerate(row):
+                if timings_list.GetItemText(n, column) != value:
+                    timings_list.SetItem(n, column, value)
+
+    def OnTimer(self, event):
+        self.UpdateTimings()
+
+    def OnResetButton(self, event):
+        TIMINGS.reset()
+        self.UpdateTimings()
+
+    def OnDumpButton(self, event):
+        dialog = wx.FileDialog(self, 'Dump Timings', defaultFile='timings.txt',
+                               wildcard='Text files (*.txt)|*.txt|All files (*.*)|*.*',
+                               style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        if dialog.ShowModal() == wx.ID_OK:
+            path = dialog.GetPath()
+            try:
+                TIMINGS.dump(path)
+                wx.LogStatus('Timings written to {}'.format(path))
+            except IOError as e:
+                wx.LogError('Unable to write timings: {}'.format(e))
+        dialog.Destroy()
+
+    def OnCloseButton(self, event):
+        self.Close()
+
+    def OnClose(self, event):
+        self._timer.Stop()
+        self.Destroy()
@@ -1,11 +1,150 @@
 # Python
+import collections
+import functools
 import math
+import os
+import tempfile
 import threading
+import time
+
+# NumPy
+import numpy as np
 
 # PyO
 import pyo
 
 
+class TimingHistogram(object):
+    """Call count and log2 bucketed durations of one instrumented function.
+
+    Bucket 0 counts calls under 1 us and bucket n those from 2**(n-1) up to
+    2**n us; the last bucket takes everything slower. The buckets are
+    allocated once, so recording a call is a handful of integer operations.
+    Calls over `budget` seconds (if set) are counted separately.
+    """
+
+    BUCKETS = 24
+
+    def __init__(self, name, budget=0.0):
+        self._name = name
+        self._budget = budget
+        self._buckets = [0] * self.BUCKETS
+        self.reset()
+
+    def reset(self):
+        for bucket in range(self.BUCKETS):
+            self._buckets[bucket] = 0
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._over_count = 0
+
+    def record(self, seconds):
+        bucket = int(seconds * 1000000).bit_length()
+        self._buckets[bucket if bucket < self.BUCKETS else -1] += 1
+        self._count += 1
+        self._total += seconds
+        if seconds > self._max:
+            self._max = seconds
+        if self._budget and seconds > self._budget:
+            self._over_count += 1
+
+    def getName(self):
+        return self._name
+
+    def getBudget(self):
+        return self._budget
+
+    def getBuckets(self):
+        return list(self._buckets)
+
+    def getCount(self):
+        return self._count
+
+    def getMean(self):
+        return self._total / self._count if self._count else 0.0
+
+    def getMax(self):
+        return self._max
+
+    def getOverCount(self):
+        return self._over_count
+
+    def getPercentile(self, fraction):
+        # Upper bound (in seconds) of the bucket holding that fraction of calls.
+        target, seen = fraction * self._count, 0
+        for bucket, count in enumerate(self._buckets):
+            seen += count
+            if count and seen >= target:
+                return 2 ** bucket / 1000000.0
+        return 0.0
+
+    name = property(getName)
+    budget = property(getBudget)
+    buckets = property(getBuckets)
+    count = property(getCount)
+    mean = property(getMean)
+    max = property(getMax)
+    over_count = property(getOverCount)
+
+
+class Timings(object):
+    """Timing histograms of the hot paths, shared by the whole process."""
+
+    def __init__(self, timer=time.perf_counter):
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._histograms = collections.OrderedDict()
+
+    def get(self, name, budget=0.0):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = TimingHistogram(name, budget)
+            return self._histograms[name]
+
+    def timed(self, name, budget=0.0):
+        # Decorator recording every call of the function under `name`.
+        histogram = self.get(name, budget)
+        timer = self._timer
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = timer()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    histogram.record(timer() - started)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        for histogram in self.getHistograms():
+            histogram.reset()
+
+    def getHistograms(self):
+        with self._lock:
+            return list(self._histograms.values())
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write('# {}\n'.format(time.strftime('%Y-%m-%d %H:%M:%S')))
+            for histogram in self.getHistograms():
+                f.write('{} calls={} mean={:.1f}us p50={:.0f}us p99={:.0f}us max={:.1f}us budget={:.0f}us over={}\n'.format(
+                    histogram.name, histogram.count, histogram.mean * 1e6, histogram.getPercentile(0.5) * 1e6,
+                    histogram.getPercentile(0.99) * 1e6, histogram.max * 1e6, histogram.budget * 1e6,
+                    histogram.over_count))
+                last = TimingHistogram.BUCKETS - 1
+                f.write('  {}\n'.format(' '.join(
+                    '{}{}us:{}'.format('>=' if bucket == last else '<', 2 ** (bucket - (bucket == last)), count)
+                    for bucket, count in enumerate(histogram.buckets) if count)))
+
+    histograms = property(getHistograms)
+
+
+TIMINGS = Timings()
+
+
 class MidiListener(pyo.MidiListener):
 
     def __init__(self, *args, **kwargs):
@@ -23,67 +162,429 @@ class MidiListener(pyo.MidiListener):
         self._stop_event.set()
 
 
+class MidiOutputQueue(object):
+    """Pending MIDI output, flushed periodically by a sender thread.
+
+    Control changes are keyed by (status, data1, device) and only the newest
+    value is kept. Every other message (notes, program changes, real-time and
+    system messages) is kept in order and never dropped; its timestamp is
+    turned into an absolute due time so queueing does not delay it.
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._controls = collections.OrderedDict()
+        self._messages = collections.deque()
+        self._queued_count = 0
+        self._coalesced_count = 0
+        self._sent_count = 0
+
+    def put(self, status, data1, data2=0, timestamp=0, device=-1):
+        with self._lock:
+            self._queued_count += 1
+            if status & 0xf0 == 0xb0 and not timestamp:
+                key = (status, data1, device)
+                if key in self._controls:
+                    self._coalesced_count += 1
+                self._controls[key] = data2
+            else:
+                self._messages.append((status, data1, data2, self._timer() + timestamp / 1000.0, device))
+
+    def putx(self, msg, timestamp=0, device=-1):
+        with self._lock:
+            self._queued_count += 1
+            self._messages.append((msg, None, None, self._timer() + timestamp / 1000.0, device))
+
+    def flush(self, send, sendx):
+        with self._lock:
+            if not self._messages and not self._controls:
+                return 0
+            messages, self._messages = self._messages, collections.deque()
+            controls, self._controls = self._controls, collections.OrderedDict()
+        now = self._timer()
+        for status, data1, data2, due, device in messages:
+            timestamp = max(0, int(round((due - now) * 1000)))
+            if data1 is None:
+                sendx(status, timestamp, device)
+            else:
+                send(status, data1, data2, timestamp, device)
+        for (status, data1, device), data2 in controls.items():
+            send(status, data1, data2, 0, device)
+        sent = len(messages) + len(controls)
+        self._sent_count += sent
+        return sent
+
+    def getQueuedCount(self):
+        return self._queued_count
+
+    def getCoalescedCount(self):
+        return self._coalesced_count
+
+    def getSentCount(self):
+        return self._sent_count
+
+    queued_count = property(getQueuedCount)
+    coalesced_count = property(getCoalescedCount)
+    sent_count = property(getSentCount)
+
+
 class MidiDispatcher(pyo.MidiDispatcher):
 
     def __init__(self, *args, **kwargs):
+        self._interval = kwargs.pop('interval', 0.005)
         super(MidiDispatcher, self).__init__(*args, **kwargs)
         self._stop_event = threading.Event()
+        self._queue = MidiOutputQueue()
 
     def run(self):
         self._dispatcher.play()
-        while not self._stop_event.wait(0.1):
-            pass
+        while not self._stop_event.wait(self._interval):
+            self._queue.flush(self.send, self.sendx)
+        self._queue.flush(self.send, self.sendx)
         self._dispatcher.stop()
         self._stop_event.clear()
 
     def stop(self):
         self._stop_event.set()
 
+    def put(self, status, data1, data2=0, timestamp=0, device=-1):
+        # Queue a message for the dispatcher thread instead of sending it
+        # from the calling (audio or GUI) thread.
+        self._queue.put(status, data1, data2, timestamp, device)
 
-class BeatGenerator(object):
+    def putx(self, msg, timestamp=0, device=-1):
+        self._queue.putx(msg, timestamp, device)
+
+    def getQueue(self):
+        return self._queue
+
+    queue = property(getQueue)
+
+
+def diff_devices(previous, current):
+    # Changes between two device snapshots as (kind, action, index, name)
+    # tuples, matched by name since indexes shift when devices come and go.
+    # Removed devices carry their old index.
+    changes = []
+    for kind in DeviceRegistry.KINDS:
+        before = dict((d['name'], (i, d)) for i, d in (previous or {}).get(kind, {}).items())
+        after = dict((d['name'], (i, d)) for i, d in current.get(kind, {}).items())
+        for name in sorted(set(before) | set(after)):
+            if name not in after:
+                changes.append((kind, 'removed', before[name][0], name))
+            elif name not in before:
+                changes.append((kind, 'added', after[name][0], name))
+            elif before[name] != after[name]:
+                changes.append((kind, 'changed', after[name][0], name))
+    return changes
+
+
+class DeviceRegistry(object):
+    """Audio and MIDI devices, enumerated on demand.
+
+    Each kind maps device index to name, default flag and (for audio) the
+    maximum channel count. Channel counts are cached by device name, since
+    probing them is the slow part.
+
+    PortAudio and PortMidi are not thread-safe, PortAudio does not rescan
+    while a stream keeps it initialized and pyo's pm_get_* terminate
+    PortMidi underneath open streams. So nothing is polled: devices are
+    enumerated by enumerate() on the calling thread or by refresh() on a
+    worker thread, for the kinds whose streams the caller has closed. Both
+    hold `lock`, which callers also hold while they open or close streams.
+    `callback(changes)` is called with the result of diff_devices() after
+    the first enumeration and then only when something was added, removed
+    or changed.
+    """
+
+    KINDS = ('audio_inputs', 'audio_outputs', 'midi_inputs', 'midi_outputs')
+    AUDIO_KINDS = KINDS[:2]
+    MIDI_KINDS = KINDS[2:]
 
     def __init__(self, callback=None):
         self._callback = callback
+        self._snapshot = None
+        self._capabilities = {}
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._thread = None
+        self._count = 0
+        self._elapsed = 0.0
+
+    def _channels(self, kind, index, name, probe):
+        key = (kind, name)
+        if key not in self._capabilities:
+            channels = probe(index)
+            if kind == 'audio_inputs' and 'logmein' in name.lower():
+                channels = 16
+            self._capabilities[key] = channels
+        return self._capabilities[key]
+
+    def _devices(self, kind, names, indexes, default, probe=None):
+        devices = {}
+        for index, name in zip(indexes, names):
+            devices[index] = {
+                'name': name,
+                'default': bool(index == default),
+            }
+            if probe:
+                devices[index]['channels'] = self._channels(kind, index, name, probe)
+        return devices
+
+    def _enumerate(self, kind):
+        if kind == 'audio_inputs':
+            return self._devices(kind, *pyo.pa_get_input_devices(), default=pyo.pa_get_default_input(),
+                                 probe=pyo.pa_get_input_max_channels)
+        if kind == 'audio_outputs':
+            return self._devices(kind, *pyo.pa_get_output_devices(), default=pyo.pa_get_default_output(),
+                                 probe=pyo.pa_get_output_max_channels)
+        if kind == 'midi_inputs':
+            return self._devices(kind, *pyo.pm_get_input_devices(), default=pyo.pm_get_default_input())
+        return self._devices(kind, *pyo.pm_get_output_devices(), default=pyo.pm_get_default_output())
+
+    def enumerate(self, kinds=KINDS, notify=True):
+        # Enumerate the given kinds, keeping the last snapshot of the others;
+        # returns the changes. The streams of those kinds must be closed.
+        with self._lock:
+            started = time.perf_counter()
+            current = dict((kind, self._enumerate(kind)) for kind in kinds)
+            with self._snapshot_lock:
+                first = self._snapshot is None
+                snapshot = dict(self._snapshot or {})
+                snapshot.update(current)
+                changes = diff_devices(self._snapshot, snapshot)
+                self._snapshot = snapshot
+                self._count += 1
+                self._elapsed = time.perf_counter() - started
+        if notify and (changes or first) and self._callback:
+            self._callback(changes)
+        return changes
+
+    def refresh(self, kinds=KINDS):
+        # Enumerate on a worker thread; the callback reports the result.
+        self.stop()
+        self._thread = threading.Thread(target=self.enumerate, args=(kinds,), name='DeviceRegistry')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def getDevices(self, kind):
+        # Copy of the latest snapshot of one kind; empty until the first
+        # enumeration has finished.
+        with self._snapshot_lock:
+            return dict((self._snapshot or {}).get(kind, {}))
+
+    def getAudioInputs(self):
+        return self.getDevices('audio_inputs')
+
+    def getAudioOutputs(self):
+        return self.getDevices('audio_outputs')
+
+    def getMidiInputs(self):
+        return self.getDevices('midi_inputs')
+
+    def getMidiOutputs(self):
+        return self.getDevices('midi_outputs')
+
+    def getReady(self):
+        return self._snapshot is not None
+
+    def getLock(self):
+        return self._lock
+
+    def getCount(self):
+        return self._count
+
+    def getElapsed(self):
+        return self._elapsed
+
+    audio_inputs = property(getAudioInputs)
+    audio_outputs = property(getAudioOutputs)
+    midi_inputs = property(getMidiInputs)
+    midi_outputs = property(getMidiOutputs)
+    ready = property(getReady)
+    lock = property(getLock)
+    count = property(getCount)
+    elapsed = property(getElapsed)
+
+
+class ValueSlot(object):
+    """Latest value from an audio or MIDI thread, drained by a display timer.
+
+    The producer only assigns the value and bumps a counter, so it never
+    waits on the reader; intermediate values are overwritten.
+    """
+
+    def __init__(self, value=None):
+        self._value = value
+        self._produced = 0
+        self._taken = 0
+        self._rendered = 0
+
+    def put(self, value):
+        self._value = value
+        self._produced += 1
+
+    def take(self, default=None):
+        # Return the value if it was updated since the last take, otherwise
+        # the default.
+        produced = self._produced
+        if produced == self._taken:
+            return default
+        self._taken = produced
+        self._rendered += 1
+        return self._value
+
+    def getValue(self):
+        return self._value
+
+    def getProduced(self):
+        return self._produced
+
+    def getRendered(self):
+        return self._rendered
+
+    value = property(getValue)
+    produced = property(getProduced)
+    rendered = property(getRendered)
+
+
+class BeatGenerator(object):
+    """MIDI beat clock generator.
+
+    Tick times are computed ahead of time and handed to the sender together
+    with the delay (in milliseconds) until each tick is due, so the MIDI layer
+    can timestamp them instead of sending whenever a Python callback happens
+    to run. Ticks are scheduled by a background thread, or by calling
+    schedule() directly (e.g. from an offline server's process callback).
+    """
+
+    def __init__(self, callback=None, sender=None, timer=time.perf_counter,
+                 lookahead=0.05, interval=0.01, threaded=True):
+        self._callback = callback
+        self._sender = sender
+        self._timer = timer
+        self._lookahead = lookahead
+        self._interval = interval
+        self._threaded = threaded
         self._enabled = False
         self._bpm = 120
-        self._sig = None
-        self._met = None
-        self._trg = None
+        self._scale = 1.0
+        self._lock = threading.RLock()
+        self._started = False
+        self._playing = False
+        self._anchor_time = 0.0
+        self._anchor_tick = 0
+        self._next_tick = 0
+        self._thread = None
+        self._stop_event = threading.Event()
 
-    def _trig_callback(self):
+    def _send(self, msg, delay=0.0):
+        if self._sender:
+            self._sender(msg, int(round(delay * 1000)))
         if self._callback:
-            self._callback(b'\xf8')
+            self._callback(msg)
+
+    def _run(self):
+        self.schedule(self._timer())
+        while not self._stop_event.wait(self._interval):
+            self.schedule(self._timer())
+
+    def _reanchor(self):
+        # Re-anchor on the last tick handed off so timing changes only apply
+        # to ticks that have not been scheduled yet.
+        if self._playing and self._next_tick > self._anchor_tick:
+            self._anchor_time = self.getTickTime(self._next_tick - 1)
+            self._anchor_tick = self._next_tick - 1
+
+    def getPeriod(self):
+        return 2.5 / self._bpm * self._scale
+
+    def getTickTime(self, tick):
+        return self._anchor_time + (tick - self._anchor_tick) * self.getPeriod()
+
+    def getTickPosition(self, now):
+        # Fractional tick count at the given time.
+        with self._lock:
+            if not self._playing:
+                return None
+            return self._anchor_tick + (now - self._anchor_time) / self.getPeriod()
+
+    def adjust(self, phase=0.0, scale=None):
+        # Shift the following ticks by `phase` seconds (at most a quarter of a
+        # tick, so no tick is skipped or repeated) and/or scale the period.
+        with self._lock:
+            if self._playing:
+                self._reanchor()
+                limit = 0.25 * self.getPeriod()
+                self._anchor_time += max(-limit, min(limit, phase))
+            if scale is not None:
+                self._scale = max(0.5, min(2.0, float(scale)))
+
+    def getClock(self, now=None):
+        with self._lock:
+            if not self._playing:
+                return None
+            now = self._timer() if now is None else now
+            tick = self._anchor_tick + int(math.floor((now - self._anchor_time) / self.getPeriod()))
+            return max(0, min(tick, self._next_tick - 1))
+
+    @TIMINGS.timed('BeatGenerator.schedule', 0.001)
+    def schedule(self, now):
+        sent = 0
+        with self._lock:
+            if not self._playing:
+                return sent
+            # After a stall (e.g. the machine slept), resume from now instead
+            # of bursting out every missed tick.
+            if self.getTickTime(self._next_tick) < now - 1.0:
+                self._anchor_time = now
+                self._anchor_tick = self._next_tick
+            while self.getTickTime(self._next_tick) <= now + self._lookahead:
+                self._send(b'\xf8', max(0.0, self.getTickTime(self._next_tick) - now))
+                self._next_tick += 1
+                sent += 1
+        return sent
 
     def play(self):
-        if not self._sig:
-            self._sig = pyo.Sig(value=self._bpm)
-        if not self._met:
-            tpb = 2.5 / (pyo.Clip(pyo.Round(self._sig), 30, 360))
-            self._met = pyo.Metro(time=tpb)
-            self._met.play()
-            if self._callback:
-                self._callback(b'\xfa')
-        if not self._met.isPlaying():
-            self._met.play()
-            if self._callback:
-                self._callback(b'\xfb')
-        if not self._trg:
-            self._trg = pyo.TrigFunc(self._met, self._trig_callback)
+        with self._lock:
+            if not self._playing:
+                self._anchor_time = self._timer()
+                self._anchor_tick = self._next_tick
+                self._send(b'\xfb' if self._started else b'\xfa')
+                self._started = True
+                self._playing = True
+        if self._threaded and not self._thread:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='BeatGenerator')
+            self._thread.daemon = True
+            self._thread.start()
 
     def pause(self):
-        if self._met and self._met.isPlaying():
-            self._met.stop()
-            if self._callback:
-                self._callback(b'\xfc')
+        if self._thread:
+            self._stop_event.set()
+            if self._thread is not threading.current_thread():
+                self._thread.join(1.0)
+            self._thread = None
+        with self._lock:
+            if self._playing:
+                self._playing = False
+                self._send(b'\xfc')
 
     def isPaused(self):
-        return bool(not self._met or not self._met.isPlaying())
+        return not self._playing
 
     def stop(self):
         self.pause()
-        self._sig = None
-        self._met = None
-        self._trg = None
+        with self._lock:
+            self._started = False
+            self._anchor_tick = 0
+            self._next_tick = 0
 
     def getEnabled(self):
         return self._enabled
@@ -101,22 +602,474 @@ class BeatGenerator(object):
         return self._bpm
 
     def setBPM(self, value):
-        value = min(360, max(30, int(value)))
-        if self._bpm != value:
-            self._bpm = value
-            if self._sig:
-                self._sig.setValue(self._bpm)
+        value = min(360, max(30, int(round(value))))
+        with self._lock:
+            if self._bpm != value:
+                self._reanchor()
+                self._bpm = value
+                self._scale = 1.0
+
+    def getScale(self):
+        return self._scale
 
     enabled = property(getEnabled, setEnabled)
     bpm = property(getBPM, setBPM)
+    scale = property(getScale)
+    period = property(getPeriod)
+    clock = property(getClock)
+
+
+class BeatTracker(object):
+    """Phase-lock a BeatGenerator to detected onsets.
+
+    An onset close to a generated beat (every 24 ticks) gives a phase error.
+    A fraction of the error shifts the clock and its running sum trims the
+    period, as in a second order PLL. Onsets far from any beat (off-beats,
+    fills) are ignored. Corrections only move ticks that have not been handed
+    off, so no ticks are added or dropped. A tempo change within max_trim
+    keeps the trim, so a detected tempo moving by a BPM does not restart
+    the lock.
+    """
+
+    def __init__(self, generator, phase_gain=0.1, period_gain=0.01, window=0.2,
+                 max_trim=0.04, offset=0.0):
+        self._generator = generator
+        self._phase_gain = phase_gain
+        self._period_gain = period_gain
+        self._window = window
+        self._max_trim = max_trim
+        self._offset = offset
+        self.reset()
+
+    def reset(self):
+        self._bpm = self._generator.bpm
+        self._trim = 0.0
+        self._phase_error = 0.0
+        self._mean_error = 0.0
+        self._onset_count = 0
+        self._matched_count = 0
+
+    def _retune(self):
+        bpm = self._generator.bpm
+        if bpm == self._bpm:
+            return
+        if abs(float(bpm) / self._bpm - 1.0) <= self._max_trim:
+            self._bpm = bpm
+            self._generator.adjust(scale=1.0 + self._trim)
+        else:
+            self.reset()
+
+    def setBPM(self, value):
+        # Change the tempo of the generator, keeping the trim if it is close.
+        self._generator.bpm = value
+        self._retune()
+
+    def onset(self, now):
+        # `now` is the time of the onset on the generator's timer; `offset`
+        # compensates for input latency.
+        position = self._generator.getTickPosition(now - self._offset)
+        if position is None:
+            return None
+        self._retune()
+        self._onset_count += 1
+        beat_period = 24 * self._generator.period
+        error = (position - 24 * round(position / 24.0)) / 24.0 * beat_period
+        if abs(error) > self._window * beat_period:
+            return None
+        self._matched_count += 1
+        self._phase_error = error
+        self._mean_error += 0.1 * (abs(error) - self._mean_error)
+        self._trim = max(-self._max_trim, min(self._max_trim, self._trim + self._period_gain * error / beat_period))
+        self._generator.adjust(self._phase_gain * error, 1.0 + self._trim)
+        return error
+
+    def getOffset(self):
+        return self._offset
+
+    def setOffset(self, value):
+        self._offset = max(0.0, float(value))
+
+    def getPhaseError(self):
+        return self._phase_error
+
+    def getMeanError(self):
+        return self._mean_error
+
+    def getTrim(self):
+        return self._trim
+
+    def getLocked(self):
+        return self._matched_count >= 4 and self._mean_error < 0.05 * 24 * self._generator.period
+
+    def getOnsetCount(self):
+        return self._onset_count
+
+    def getMatchedCount(self):
+        return self._matched_count
+
+    offset = property(getOffset, setOffset)
+    phase_error = property(getPhaseError)
+    mean_error = property(getMeanError)
+    trim = property(getTrim)
+    locked = property(getLocked)
+    onset_count = property(getOnsetCount)
+    matched_count = property(getMatchedCount)
+
+
+RESPONSE_CURVES = ['linear', 'exponential', 's-curve']
+
+
+def spl_of(amp):
+    # dBFS of an array of amplitudes, -120 for anything quieter.
+    spl = np.full(len(amp), -120.0)
+    audible = amp >= 0.000001
+    spl[audible] = 20.0 * np.log10(amp[audible])
+    return spl
+
+
+class LevelTable(object):
+    """Lookup table from amplitudes to integer output values (0-254).
+
+    Values are computed once per configuration (SPL range, output range and
+    response curve), so mapping an amplitude is a frexp and an index
+    instead of a log10 and a rescale per block. Every octave of amplitude
+    (frexp exponent) is split into `steps` linear mantissa buckets, at most
+    0.07 dB wide with the default 256, from -120 dBFS up to `max_amp`: a
+    few thousand entries, so a rebuild is cheap enough to do on every
+    settings change. The few buckets that straddle a change of value are
+    marked and computed exactly, so lookups match the formula everywhere.
+    """
+
+    # Smallest exponent with its own buckets; 2 ** -20 is below -120 dBFS.
+    MIN_EXPONENT = -19
+    # Table entry of the buckets that are computed exactly.
+    SPLIT = 255
+
+    _spl_cache = {}
+
+    def __init__(self, steps=256, max_amp=1.0):
+        self.steps = steps
+        self.size = (math.frexp(max_amp)[1] - self.MIN_EXPONENT + 1) * steps
+        self.min_amp = 2.0 ** (self.MIN_EXPONENT - 1)
+        # index = (exponent - MIN_EXPONENT) * steps + int(mantissa * 2 * steps) - steps
+        self._offset = -(self.MIN_EXPONENT + 1) * steps
+        self._config = (-120, 0, 0, 0, 'linear')
+        self.table = bytes(self.size)
+
+    def getSPL(self):
+        # SPL at the edges of the buckets (size + 1 of them). It only depends
+        # on the table geometry, so it is shared between tables and rebuilds
+        # only redo the mapping.
+        key = (self.steps, self.size)
+        if key not in self._spl_cache:
+            index = np.arange(self.size + 1)
+            mantissa = 0.5 + (index % self.steps) / (2.0 * self.steps)
+            amp = np.ldexp(mantissa, index // self.steps + self.MIN_EXPONENT)
+            self._spl_cache[key] = spl_of(amp)
+        return self._spl_cache[key]
+
+    def map(self, spl):
+        # Values (as floats, truncated by the callers) of an array of SPLs.
+        min_spl, max_spl, min_value, max_value, curve = self._config
+        span = float(max_spl - min_spl) or 1.0
+        x = np.clip((spl - min_spl) / span, 0.0, 1.0)
+        x[spl <= min_spl] = 0.0
+        x[spl >= max_spl] = 1.0
+        if curve == 'exponential':
+            x = np.expm1(3.0 * x) / np.expm1(3.0)
+        elif curve == 's-curve':
+            x = x * x * (3.0 - 2.0 * x)
+        return min_value + x * (max_value - min_value)
+
+    def build(self, min_spl, max_spl, min_value, max_value, curve='linear'):
+        self._config = (min_spl, max_spl, min_value, max_value, curve)
+        # Every curve is monotonic, so a bucket whose edges map to the same
+        # value maps to it throughout.
+        edges = self.map(self.getSPL()).astype(np.uint8)
+        table = np.where(edges[:-1] == edges[1:], edges[:-1], self.SPLIT)
+        self.table = table.astype(np.uint8).tobytes()
+
+    def lookup(self, amp):
+        if amp < self.min_amp:
+            return self.table[0]
+        mantissa, exponent = math.frexp(amp)
+        index = exponent * self.steps + int(mantissa * 2 * self.steps) + self._offset
+        value = self.table[index if index < self.size else -1]
+        return self.value(amp) if value == self.SPLIT else value
+
+    def value(self, amp):
+        # The exact value of one amplitude, as map() computes it.
+        min_spl, max_spl, min_value, max_value, curve = self._config
+        spl = 20.0 * math.log10(amp) if amp >= 0.000001 else -120.0
+        if spl <= min_spl:
+            x = 0.0
+        elif spl >= max_spl:
+            x = 1.0
+        else:
+            x = (spl - min_spl) / float(max_spl - min_spl)
+        if curve == 'exponential':
+            x = math.expm1(3.0 * x) / math.expm1(3.0)
+        elif curve == 's-curve':
+            x = x * x * (3.0 - 2.0 * x)
+        return int(min_value + x * (max_value - min_value))
+
+
+class ChangeFilter(object):
+    """Decide which values of a continuous MIDI output are worth sending.
+
+    A value is sent when it moves more than `hysteresis` steps away from the
+    last value sent (or reaches either end of the range), no more often than
+    `max_rate` times per second. A change held back by the rate limit is not
+    dropped: the latest value is sent on the first check after the window
+    expires, even if it has since moved back within the hysteresis. The
+    current value is always re-sent after `refresh` seconds so receivers that
+    missed a message catch up.
+    """
+
+    def __init__(self, hysteresis=1, max_rate=30, refresh=1.0, minimum=0, maximum=127):
+        self.hysteresis = hysteresis
+        self.max_rate = max_rate
+        self.refresh = refresh
+        self.minimum = minimum
+        self.maximum = maximum
+        self._sent = 0
+        self._suppressed = 0
+        self.reset()
+
+    def reset(self):
+        self._last_value = None
+        self._last_time = 0.0
+        self._pending = False
+
+    def check(self, value, now):
+        elapsed = now - self._last_time
+        if self._last_value is None or (self.refresh > 0 and elapsed >= self.refresh):
+            send = True
+        elif value == self._last_value:
+            send = self._pending = False
+        else:
+            changed = abs(value - self._last_value) > self.hysteresis or value in (self.minimum, self.maximum)
+            if self.max_rate > 0 and elapsed < 1.0 / self.max_rate:
+                # Too soon; remember the change for when the window expires.
+                self._pending = self._pending or changed
+                send = False
+            else:
+                send = self._pending or changed
+        if send:
+            self._last_value = value
+            self._last_time = now
+            self._pending = False
+            self._sent += 1
+        else:
+            self._suppressed += 1
+        return send
+
+    def getSentCount(self):
+        return self._sent
+
+    def getSuppressedCount(self):
+        return self._suppressed
+
+    sent_count = property(getSentCount)
+    suppressed_count = property(getSuppressedCount)
+
+
+# Server buffer sizes (samples) for the audio latency profiles.
+LATENCY_PROFILES = collections.OrderedDict([
+    ('tight', 64),
+    ('balanced', 256),
+    ('safe', 1024),
+])
+
+
+class BlockTimer(object):
+    """Measure audio block timing from the server's process callback.
+
+    pyo does not expose the device latency, so the round trip is estimated
+    as one block each for the input and output buffers plus the late tail
+    (99th percentile) of the intervals between callbacks.
+    """
+
+    def __init__(self, buffer_size=256, sampling_rate=44100, size=1024, timer=time.perf_counter):
+        self._period = float(buffer_size) / sampling_rate
+        self._times = collections.deque(maxlen=size)
+        self._timer = timer
+
+    def tick(self):
+        self._times.append(self._timer())
+
+    def reset(self):
+        self._times.clear()
+
+    def getPeriod(self):
+        return self._period
+
+    def getCount(self):
+        return len(self._times)
+
+    def getJitter(self):
+        times = list(self._times)
+        intervals = sorted(b - a for a, b in zip(times, times[1:]))
+        if not intervals:
+            return 0.0
+        return max(0.0, intervals[int(0.99 * (len(intervals) - 1))] - self._period)
+
+    def getLatency(self):
+        return 2.0 * self._period + self.getJitter()
+
+    period = property(getPeriod)
+    count = property(getCount)
+    jitter = property(getJitter)
+    latency = property(getLatency)
+
+
+# Audio server settings that can be changed on the running graph; anything
+# else means shutting the server down and booting it again.
+AUDIO_REPATCH_KEYS = ('channels', 'channel_fade')
+
+
+def plan_audio_reconfiguration(current, wanted):
+    # Cheapest way from the running audio configuration to the wanted one,
+    # as ('none' | 'repatch' | 'restart', changed keys). Without a running
+    # configuration everything has to be started.
+    if current is None:
+        return 'restart', sorted(wanted)
+    changed = sorted(k for k in set(current) | set(wanted) if current.get(k) != wanted.get(k))
+    if not changed:
+        return 'none', changed
+    if all(k in AUDIO_REPATCH_KEYS for k in changed):
+        return 'repatch', changed
+    return 'restart', changed
+
+
+class InputBus(object):
+    """Shared input mixes handed out to every consumer of the audio input.
+
+    Consumers hold on to Sig outputs that stay in place when the channels
+    (or source) change, so their filters and followers keep their state.
+    The new mix is built alongside the old one and crossfaded over `fade`
+    seconds, so the level does not jump between them.
+    """
+
+    def __init__(self, channels=None, source=None, fade=0.05):
+        self._channels = list(channels or [0])
+        self._source = source
+        self._fade = fade
+        self._input = None
+        self._mixes = {}
+        self._outputs = {}
+        self._users = {}
+        self._blends = {}
+        self._fading = []
+        self._fade_call = None
+        self._generation = 0
+
+    def _create_input(self):
+        if self._source is not None:
+            # Selected channels of the source, the others muted.
+            gains = [float(n in self._channels) for n in range(len(self._source))]
+            return pyo.Sig(self._source, mul=gains)
+        return pyo.Input(self._channels)
+
+    def _rebuild(self, fade=None):
+        fade = self._fade if fade is None else fade
+        self._generation += 1
+        old_input, self._input = self._input, self._create_input()
+        if fade <= 0 or not self._outputs:
+            for voices, output in self._outputs.items():
+                self._mixes[voices] = pyo.Mix(self._input, voices)
+                output.setValue(self._mixes[voices])
+            self._finish_fade(self._generation)
+            return
+        # Fade from whatever each output plays now (possibly an earlier fade
+        # still in progress) to the new mix.
+        ramp = pyo.SigTo(1.0, time=fade, init=0.0)
+        previous = {}
+        for voices, output in self._outputs.items():
+            previous[voices] = self._blends.get(voices, self._mixes[voices])
+            self._mixes[voices] = pyo.Mix(self._input, voices)
+            self._blends[voices] = previous[voices] * (1.0 - ramp) + self._mixes[voices] * ramp
+            output.setValue(self._blends[voices])
+        # The old graph has to live until the fade is over.
+        self._fading.append((old_input, previous, ramp))
+        self._fade_call = pyo.CallAfter(self._finish_fade, fade + 0.01, self._generation)
+
+    def _finish_fade(self, generation):
+        # Called from the server's scheduler when the latest fade is done.
+        if generation != self._generation:
+            return
+        for voices, output in self._outputs.items():
+            output.setValue(self._mixes[voices])
+        self._blends = {}
+        self._fading = []
+        self._fade_call = None
+
+    def acquire(self, voices=1):
+        if voices not in self._users:
+            if self._input is None:
+                self._input = self._create_input()
+            self._mixes[voices] = pyo.Mix(self._input, voices)
+            self._outputs[voices] = pyo.Sig(self._mixes[voices])
+            self._users[voices] = 0
+        self._users[voices] += 1
+        return self._outputs[voices]
+
+    def release(self, voices=1):
+        if self._users.get(voices, 0) > 1:
+            self._users[voices] -= 1
+        elif voices in self._users:
+            del self._users[voices]
+            del self._mixes[voices]
+            del self._outputs[voices]
+            self._blends.pop(voices, None)
+            if not self._users:
+                self._input = None
+
+    def getUsers(self):
+        return sum(self._users.values())
+
+    def getChannels(self):
+        return self._channels
+
+    def setChannels(self, value):
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        value = list(value) or [0]
+        if self._channels != value:
+            self._channels = value
+            if self._users:
+                self._rebuild()
+
+    def getSource(self):
+        return self._source
+
+    def setSource(self, value):
+        # Mix the given PyoObject (e.g. an SfPlayer) instead of live input;
+        # switched without a fade, as there is nothing to fade between.
+        if self._source is not value:
+            self._source = value
+            if self._users:
+                self._rebuild(fade=0)
+
+    def getFade(self):
+        return self._fade
+
+    def setFade(self, value):
+        self._fade = max(0.0, float(value))
+
+    users = property(getUsers)
+    channels = property(getChannels, setChannels)
+    source = property(getSource, setSource)
+    fade = property(getFade, setFade)
 
 
 class StrengthAnalyzer(object):
 
-    def __init__(self, callback=None):
+    def __init__(self, callback=None, timer=time.perf_counter, bus=None):
         self._callback = callback
+        self._timer = timer
         self._enabled = False
-        self._input_channels = [0]
+        self._bus = bus if bus is not None else InputBus()
         self._lpf = 120
         self._attack = 0.1
         self._release = 0.1
@@ -125,36 +1078,46 @@ class StrengthAnalyzer(object):
         self._max_spl = 0
         self._max_velocity = 127
         self._midi_output = 0
-        self._but_lp = None
+        self._curve = 'linear'
+        self._filters = [ChangeFilter()]
+        self._table = LevelTable()
+        self._table.build(self._min_spl, self._max_spl, self._min_velocity, self._max_velocity, self._curve)
+        self._bands = None
         self._follower = None
         self._peak_amp = None
 
+    def _update_table(self):
+        self._table.build(self._min_spl, self._max_spl, self._min_velocity, self._max_velocity, self._curve)
+
+    @TIMINGS.timed('StrengthAnalyzer._peak_amp_callback', 0.001)
     def _peak_amp_callback(self, *args):
-        amp = args[0] if args else 0.0
-        spl = -120.0 if amp < 0.000001 else 20.0 * math.log10(amp)
-        if spl <= self._min_spl:
-            velocity = self._min_velocity
-        elif spl >= self._max_spl:
-            velocity = self._max_velocity
-        else:
-            velocity = int(pyo.rescale(spl, self._min_spl, self._max_spl, self._min_velocity, self._max_velocity))
-        if self._callback:
+        velocity = self._table.lookup(args[0] if args else 0.0)
+        if self._callback and self._filters[0].check(velocity, self._timer()):
             self._callback(velocity)
 
+    def _create_bands(self, input):
+        return pyo.ButLP(input, self._lpf)
+
+    def process(self):
+        # The filter chain runs in the server; block based backends override this.
+        pass
+
     def play(self):
-        if not self._but_lp:
-            inp = pyo.Input(self._input_channels)
-            mix = pyo.Mix(inp)
-            self._but_lp = pyo.ButLP(mix, self._lpf)
+        if not self._bands:
+            self._bands = self._create_bands(self._bus.acquire())
         if not self._follower:
-            self._follower = pyo.Follower2(self._but_lp, risetime=self._attack, falltime=self._release)
+            self._follower = pyo.Follower2(self._bands, risetime=self._attack, falltime=self._release)
         if not self._peak_amp:
             self._peak_amp = pyo.PeakAmp(self._follower, self._peak_amp_callback)
 
     def stop(self):
         self._peak_amp = None
         self._follower = None
-        self._but_lp = None
+        if self._bands:
+            self._bands = None
+            self._bus.release()
+        for change_filter in self._filters:
+            change_filter.reset()
 
     def getEnabled(self):
         return self._enabled
@@ -168,18 +1131,15 @@ class StrengthAnalyzer(object):
         else:
             self.stop()
 
-    def getInputChannels(self):
-        return self._input_channels
+    def getBus(self):
+        return self._bus
 
-    def setInputChannels(self, value):
-        if not isinstance(value, (list, tuple)):
-            value = [value]
-        if self._input_channels != value:
-            self._input_channels = value
-            if self._but_lp:
-                inp = pyo.Input(self._input_channels)
-                mix = pyo.Mix(inp)
-                self._but_lp.setInput(mix)
+    def setBus(self, value):
+        if self._bus is not value:
+            if self._bands:
+                self._bus.release()
+                self._bands.setInput(value.acquire())
+            self._bus = value
 
     def getLPF(self):
         return self._lpf
@@ -188,8 +1148,8 @@ class StrengthAnalyzer(object):
         value = min(20000, max(20, int(value)))
         if self._lpf != value:
             self._lpf = value
-            if self._but_lp:
-                self._but_lp.setFreq(self._lpf)
+            if self._bands:
+                self._bands.setFreq(self._lpf)
 
     def getAttack(self):
         return self._attack
@@ -215,28 +1175,80 @@ class StrengthAnalyzer(object):
         return self._min_spl
 
     def setMinSPL(self, value):
-        self._min_spl = max(-120, min(0, value))
+        value = max(-120, min(0, value))
+        if self._min_spl != value:
+            self._min_spl = value
+            self._update_table()
 
     def getMinVelocity(self):
         return self._min_velocity
 
     def setMinVelocity(self, value):
-        self._min_velocity = int(max(0, min(127, value)))
+        value = int(max(0, min(127, value)))
+        if self._min_velocity != value:
+            self._min_velocity = value
+            for change_filter in self._filters:
+                change_filter.minimum = value
+            self._update_table()
 
     def getMaxSPL(self):
         return self._max_spl
 
     def setMaxSPL(self, value):
-        self._max_spl = max(-120, min(0, value))
+        value = max(-120, min(0, value))
+        if self._max_spl != value:
+            self._max_spl = value
+            self._update_table()
 
     def getMaxVelocity(self):
         return self._max_velocity
 
     def setMaxVelocity(self, value):
-        self._max_velocity = int(max(0, min(127, value)))
+        value = int(max(0, min(127, value)))
+        if self._max_velocity != value:
+            self._max_velocity = value
+            for change_filter in self._filters:
+                change_filter.maximum = value
+            self._update_table()
+
+    def getCurve(self):
+        return self._curve
+
+    def setCurve(self, value):
+        value = value if value in RESPONSE_CURVES else 'linear'
+        if self._curve != value:
+            self._curve = value
+            self._update_table()
+
+    def getHysteresis(self):
+        return self._filters[0].hysteresis
+
+    def setHysteresis(self, value):
+        for change_filter in self._filters:
+            change_filter.hysteresis = int(max(0, min(127, value)))
+
+    def getMaxRate(self):
+        return self._filters[0].max_rate
+
+    def setMaxRate(self, value):
+        for change_filter in self._filters:
+            change_filter.max_rate = max(0, int(value))
+
+    def getRefresh(self):
+        return self._filters[0].refresh
+
+    def setRefresh(self, value):
+        for change_filter in self._filters:
+            change_filter.refresh = max(0.0, float(value))
+
+    def getSentCount(self):
+        return sum(f.sent_count for f in self._filters)
+
+    def getSuppressedCount(self):
+        return sum(f.suppressed_count for f in self._filters)
 
     enabled = property(getEnabled, setEnabled)
-    input_channels = property(getInputChannels, setInputChannels)
+    bus = property(getBus, setBus)
     lpf = property(getLPF, setLPF)
     attack = property(getAttack, setAttack)
     release = property(getRelease, setRelease)
@@ -244,3 +1256,1072 @@ class StrengthAnalyzer(object):
     min_velocity = property(getMinVelocity, setMinVelocity)
     max_spl = property(getMaxSPL, setMaxSPL)
     max_velocity = property(getMaxVelocity, setMaxVelocity)
+    curve = property(getCurve, setCurve)
+    hysteresis = property(getHysteresis, setHysteresis)
+    max_rate = property(getMaxRate, setMaxRate)
+    refresh = property(getRefresh, setRefresh)
+    sent_count = property(getSentCount)
+    suppressed_count = property(getSuppressedCount)
+
+
+class MultiBandAnalyzer(StrengthAnalyzer):
+
+    MAX_BANDS = 8
+
+    def __init__(self, callback=None, timer=time.perf_counter, bus=None):
+        super(MultiBandAnalyzer, self).__init__(callback, timer, bus)
+        self._crossovers = [100, 400, 2000]
+        self._filters = [self._create_filter() for n in range(len(self._crossovers) + 1)]
+
+    def _create_filter(self):
+        f = self._filters[0]
+        return ChangeFilter(f.hysteresis, f.max_rate, f.refresh, f.minimum, f.maximum)
+
+    def _create_bands(self, input):
+        # One crossover bank shared by all bands; each stream of the bank (and
+        # of the follower and PeakAmp built on it) is one band.
+        bands = pyo.MultiBand(input, num=len(self._crossovers) + 1)
+        bands.setFrequencies(self._crossovers)
+        return bands
+
+    @TIMINGS.timed('MultiBandAnalyzer._peak_amp_callback', 0.001)
+    def _peak_amp_callback(self, *args):
+        now = self._timer()
+        lookup = self._table.lookup
+        velocities = [None] * len(self._filters)
+        changed = False
+        for band, amp in enumerate(args[:len(velocities)]):
+            velocity = lookup(amp)
+            if self._filters[band].check(velocity, now):
+                velocities[band] = velocity
+                changed = True
+        if self._callback and changed:
+            self._callback(velocities)
+
+    def setLPF(self, value):
+        # The crossover bank replaces the low-pass filter; only keep the value.
+        self._lpf = min(20000, max(20, int(value)))
+
+    def getBands(self):
+        return len(self._crossovers) + 1
+
+    def getCrossovers(self):
+        return self._crossovers
+
+    def setCrossovers(self, value):
+        value = sorted(set(min(20000, max(20, int(v))) for v in value))[:self.MAX_BANDS - 1]
+        if value and self._crossovers != value:
+            rebuild = len(value) != len(self._crossovers)
+            self._crossovers = value
+            if rebuild:
+                self._filters = [self._create_filter() for n in range(len(value) + 1)]
+                if self._peak_amp:
+                    self.stop()
+                    self.play()
+            elif self._bands:
+                self._bands.setFrequencies(self._crossovers)
+
+    lpf = property(StrengthAnalyzer.getLPF, setLPF)
+    bands = property(getBands)
+    crossovers = property(getCrossovers, setCrossovers)
+
+
+class GoertzelBank(object):
+    """Band amplitudes from a bank of block-sliding DFT bins.
+
+    Bins are placed between the band edges no further apart than their
+    resolution (and at most a sixth of an octave). Each bin is a Hann
+    windowed DFT over the last `cycles` periods of its frequency (rounded
+    to whole blocks, at most `max_window` samples), made of three
+    rectangular bins one window resolution apart. Every rectangular
+    bin is kept current by adding the newest block's contribution and
+    subtracting the one that just left its window, so the cost per block is
+    one (block x bins) product whatever the window lengths, and the short
+    windows of the higher bins give them low latency.
+
+    Bins whose window is a single block (above about 460 Hz at 44.1 kHz and
+    256 samples) are the block's own DFT, so they are taken from one FFT of
+    the block instead: its bins, one resolution apart, cover those ranges
+    and the product only runs over the longer windows (28 bins for the
+    default bands, down from 146).
+    """
+
+    def __init__(self, edges, sampling_rate=44100, block_size=256, cycles=4.0, max_window=2048):
+        self._edges = list(edges)
+        self._sampling_rate = sampling_rate
+        self._block_size = block_size
+        max_blocks = max(1, max_window // block_size)
+        frequencies, lengths, steps, bands, block_ranges = [], [], [], [], []
+        for band, (low, high) in enumerate(zip(self._edges, self._edges[1:])):
+            frequency = float(low)
+            while frequency < high:
+                length = int(min(max_blocks, max(1, round(cycles * sampling_rate / frequency / block_size))))
+                if length == 1:
+                    # Windows only get shorter from here on.
+                    block_ranges.append((band, frequency, high))
+                    break
+                # Step by the window resolution (where neighbouring Hann bins
+                # cross at -6 dB), but at most a sixth of an octave.
+                step = min(frequency * (2 ** (1.0 / 6) - 1), float(sampling_rate) / (length * block_size))
+                frequencies.append(frequency + 0.5 * min(step, high - frequency))
+                lengths.append(length)
+                steps.append(min(step, high - frequency))
+                bands.append(band)
+                frequency += step
+        self._frequencies = np.array(frequencies)
+        self._bands = np.array(bands, dtype=int)
+        lengths = np.array(lengths, dtype=int)
+        # Columns are (lower neighbour, bin, upper neighbour) for every bin.
+        resolution = float(sampling_rate) / (lengths * block_size)
+        omega = 2.0 * math.pi * np.repeat(self._frequencies, 3) / sampling_rate
+        omega += 2.0 * math.pi * np.tile([-1.0, 0.0, 1.0], len(lengths)) * np.repeat(resolution, 3) / sampling_rate
+        self._lengths = np.repeat(lengths, 3)
+        self._basis = np.exp(-1j * np.outer(np.arange(block_size), omega))
+        self._step = np.exp(-1j * omega * block_size)
+        self._start = np.exp(-1j * omega * self._lengths * block_size)
+        # Weight each bin's energy by its share of the Hann window's noise
+        # bandwidth (1.5 bins), so overlapping bins sum to a sine's amplitude.
+        self._scale = 4.0 / (lengths * block_size)
+        self._weights = np.array(steps) / (1.5 * resolution)
+        self._columns = np.arange(len(omega))
+        self._ring = np.zeros((int(lengths.max()) if len(lengths) else 1, len(omega)), dtype=complex)
+        # Energy weights of the FFT bins (skipping DC and Nyquist, which have
+        # no neighbours to make a Hann window with) by their share of each
+        # band's single block range.
+        resolution = float(sampling_rate) / block_size
+        centres = np.arange(1, block_size // 2) * resolution
+        self._block_weights = np.zeros((len(self._edges) - 1, len(centres)))
+        for band, low, high in block_ranges:
+            share = np.minimum(centres + 0.5 * resolution, high) - np.maximum(centres - 0.5 * resolution, low)
+            self._block_weights[band] += np.maximum(0.0, share) / (1.5 * resolution) * (4.0 / block_size) ** 2
+        used = self._block_weights.any(axis=0)
+        self._block_weights = self._block_weights if used.any() else None
+        self._frequencies = np.concatenate([self._frequencies, centres[used]])
+        self._windows = [max([1] + [n for n, b in zip(lengths, bands) if b == band])
+                         for band in range(len(self._edges) - 1)]
+        self.reset()
+
+    def reset(self):
+        self._ring[:] = 0.0
+        self._position = 0
+        self._phase = np.ones(len(self._columns), dtype=complex)
+        self._sums = np.zeros(len(self._columns), dtype=complex)
+
+    def process(self, block):
+        size = len(self._ring)
+        contribution = self._phase * np.dot(block, self._basis)
+        self._sums += contribution - self._ring[(self._position - self._lengths) % size, self._columns]
+        self._ring[self._position] = contribution
+        self._position = (self._position + 1) % size
+        self._phase *= self._step
+        if not self._position:
+            # Once per ring cycle, drop accumulated rounding errors.
+            self._phase /= np.abs(self._phase)
+            ages = (self._position - 1 - np.arange(size)) % size
+            self._sums = (self._ring * (ages[:, np.newaxis] < self._lengths)).sum(axis=0)
+        # Refer each sum to the start of its window before combining the
+        # neighbours into the Hann window (-1/4, 1/2, -1/4).
+        spectrum = (self._sums * np.conj(self._phase) * self._start).reshape(-1, 3)
+        amplitudes = np.abs(0.5 * spectrum[:, 1] - 0.25 * (spectrum[:, 0] + spectrum[:, 2])) * self._scale
+        energies = np.bincount(self._bands, weights=amplitudes * amplitudes * self._weights,
+                               minlength=len(self._edges) - 1)
+        if self._block_weights is not None:
+            spectrum = np.fft.rfft(block)
+            amplitudes = np.abs(0.5 * spectrum[1:-1] - 0.25 * (spectrum[:-2] + spectrum[2:]))
+            energies = energies + self._block_weights.dot(amplitudes * amplitudes)
+        return np.sqrt(energies)
+
+    def getEdges(self):
+        return self._edges
+
+    def getFrequencies(self):
+        return self._frequencies
+
+    def getLatency(self):
+        # Window length (seconds) of the slowest bin of each band.
+        return [float(n * self._block_size) / self._sampling_rate for n in self._windows]
+
+    edges = property(getEdges)
+    frequencies = property(getFrequencies)
+    latency = property(getLatency)
+
+
+class GoertzelAnalyzer(MultiBandAnalyzer):
+    """Strength analyzer backend that tracks bands with a GoertzelBank.
+
+    Blocks are read from the input bus in the server's process callback and
+    follow the same attack/release and velocity mapping as the filter chain.
+    With `multiband` false the single band spans 20 Hz up to the LPF and the
+    callback gets a velocity rather than a list, as with StrengthAnalyzer.
+    """
+
+    def __init__(self, callback=None, timer=time.perf_counter, bus=None, buffer_size=256, sampling_rate=44100,
+                 multiband=True):
+        super(GoertzelAnalyzer, self).__init__(callback, timer, bus)
+        self._buffer_size = buffer_size
+        self._sampling_rate = sampling_rate
+        self._multiband = multiband
+        if not multiband:
+            self._filters = self._filters[:1]
+        self._bank = None
+        self._reader = None
+        self._levels = None
+
+    def _edges(self):
+        if self._multiband:
+            return [20] + self._crossovers + [20000]
+        return [20, max(21, self._lpf)]
+
+    def _rebuild(self):
+        if self._reader and self._bank.edges != self._edges():
+            self._bank = GoertzelBank(self._edges(), self._sampling_rate, self._buffer_size)
+            self._levels = np.zeros(len(self._bank.edges) - 1)
+
+    def _coefficient(self, seconds):
+        # One-pole smoothing at block rate, as Follower2 does per sample.
+        return 1.0 - math.exp(-self._buffer_size / (seconds * self._sampling_rate)) if seconds > 0 else 1.0
+
+    def process(self):
+        # Runs on the audio thread; settings may swap the bank meanwhile.
+        reader, bank, levels = self._reader, self._bank, self._levels
+        if not reader or len(levels) != len(bank.edges) - 1:
+            return
+        amplitudes = bank.process(reader.read())
+        delta = amplitudes - levels
+        levels += np.where(delta > 0, self._coefficient(self._attack), self._coefficient(self._release)) * delta
+        self._peak_amp_callback(*levels.tolist())
+
+    def _peak_amp_callback(self, *args):
+        if self._multiband:
+            MultiBandAnalyzer._peak_amp_callback(self, *args)
+        else:
+            StrengthAnalyzer._peak_amp_callback(self, *args)
+
+    def play(self):
+        if not self._reader:
+            self._bank = GoertzelBank(self._edges(), self._sampling_rate, self._buffer_size)
+            self._levels = np.zeros(len(self._bank.edges) - 1)
+            self._reader = BlockReader(self._bus.acquire(), self._buffer_size)
+
+    def stop(self):
+        if self._reader:
+            self._reader.stop()
+            self._reader = None
+            self._bus.release()
+        for change_filter in self._filters:
+            change_filter.reset()
+
+    def setBus(self, value):
+        if self._bus is not value:
+            if self._reader:
+                self._reader.stop()
+                self._bus.release()
+                self._reader = BlockReader(value.acquire(), self._buffer_size)
+            self._bus = value
+
+    def setLPF(self, value):
+        self._lpf = min(20000, max(20, int(value)))
+        if not self._multiband:
+            self._rebuild()
+
+    def getBands(self):
+        return len(self._filters)
+
+    def setCrossovers(self, value):
+        if self._multiband:
+            super(GoertzelAnalyzer, self).setCrossovers(value)
+            self._rebuild()
+
+    def getMultiband(self):
+        return self._multiband
+
+    def getLatency(self):
+        return self._bank.latency if self._bank else []
+
+    bus = property(StrengthAnalyzer.getBus, setBus)
+    lpf = property(StrengthAnalyzer.getLPF, setLPF)
+    bands = property(getBands)
+    crossovers = property(MultiBandAnalyzer.getCrossovers, setCrossovers)
+    multiband = property(getMultiband)
+    latency = property(getLatency)
+
+
+class BlockReader(object):
+    """Expose the most recent block of an audio stream as a NumPy array."""
+
+    def __init__(self, input, buffer_size=256):
+        self._table = pyo.DataTable(size=buffer_size)
+        self._fill = pyo.TableFill(input, self._table)
+        self._block = np.asarray(self._table.getBuffer())
+
+    def read(self):
+        return self._block
+
+    def stop(self):
+        self._fill.stop()
+
+
+class TempoEstimator(object):
+    """Estimate tempo from blocks of samples.
+
+    Each block is turned into onset strength frames (positive spectral flux
+    of one FFT per hop). A windowed autocorrelation of the onset envelope is
+    then scored with a comb filter and a tempo prior every few hundred
+    milliseconds, so the cost of any single block stays small and bounded.
+    The octave of the best candidate, and any 3:2 confusion, is then
+    settled from the autocorrelation itself (see _resolve_octave and
+    _resolve_three_two), not by the prior.
+    """
+
+    # Autocorrelation at the odd multiples of half the beat period, relative
+    # to the even ones, above which the beat is really twice as fast.
+    OCTAVE_RATIO = 0.5
+    # Comb score at 2/3 of the lag, relative to the lag's own, above which
+    # the beat is really at 2/3 of it (a 3:2 error, e.g. off-beat hats).
+    THREE_TWO_RATIO = 0.5
+
+    def __init__(self, callback=None, sampling_rate=44100, hop_size=256, window=6.0,
+                 interval=0.5, min_bpm=60, max_bpm=180, min_confidence=0.2, onset_callback=None):
+        self._callback = callback
+        self._onset_callback = onset_callback
+        self._sampling_rate = sampling_rate
+        self._hop_size = hop_size
+        self._window = window
+        self._interval = interval
+        self._min_bpm = min_bpm
+        self._max_bpm = max_bpm
+        self._min_confidence = min_confidence
+        self.reset()
+
+    def reset(self):
+        self._frame_rate = float(self._sampling_rate) / self._hop_size
+        self._frames = int(round(self._window * self._frame_rate))
+        self._update_frames = max(1, int(round(self._interval * self._frame_rate)))
+        self._envelope = np.zeros(self._frames)
+        self._position = 0
+        self._filled = 0
+        self._since_update = 0
+        self._pending = np.zeros(0)
+        self._hann = np.hanning(self._hop_size)
+        self._last_spectrum = np.zeros(self._hop_size // 2 + 1)
+        self._nfft = 1 << int(math.ceil(math.log(2 * self._frames, 2)))
+        # Candidate lags (in frames), padded by one on each side for peak
+        # interpolation, with up to four harmonics for the comb filter.
+        min_lag = int(math.floor(60.0 * self._frame_rate / self._max_bpm))
+        max_lag = int(math.ceil(60.0 * self._frame_rate / self._min_bpm))
+        self._lags = np.arange(max(1, min_lag - 1), max_lag + 2)
+        harmonics = np.arange(1, 5)
+        self._comb_index = self._lags[:, np.newaxis] * harmonics[np.newaxis, :]
+        self._comb_weights = np.ones(self._comb_index.shape) / harmonics
+        self._min_frames = min(self._frames, 2 * max_lag)
+        # Log-normal prior around 120 BPM (one octave deviation) to pick
+        # among candidates of similar score; the octave is checked after.
+        bpms = 60.0 * self._frame_rate / self._lags
+        self._prior = np.exp(-0.5 * np.log2(bpms / 120.0) ** 2)
+        self._bpm = 0.0
+        self._confidence = 0.0
+        self._candidate = 0.0
+        self._threshold = float('inf')
+        self._last_flux = 0.0
+        self._since_onset = 0
+        self._refractory = max(1, int(round(0.1 * self._frame_rate)))
+        # Prime NumPy's FFT caches here rather than in the first audio block.
+        np.fft.irfft(np.fft.rfft(np.zeros(self._nfft)))
+        np.fft.rfft(np.zeros((1, self._hop_size)), axis=1)
+
+    def process(self, block):
+        data = np.concatenate((self._pending, block))
+        count = len(data) // self._hop_size
+        self._pending = data[count * self._hop_size:]
+        if not count:
+            return
+        frames = data[:count * self._hop_size].reshape(count, self._hop_size)
+        spectra = np.log1p(np.abs(np.fft.rfft(frames * self._hann, axis=1)))
+        previous = np.vstack((self._last_spectrum[np.newaxis, :], spectra[:-1]))
+        flux = np.maximum(spectra - previous, 0.0).sum(axis=1)
+        self._last_spectrum = spectra[-1]
+        if self._onset_callback:
+            self._detect_onsets(flux, len(data))
+        index = (self._position + np.arange(count)) % self._frames
+        self._envelope[index] = flux
+        self._position = (self._position + count) % self._frames
+        self._filled = min(self._frames, self._filled + count)
+        self._since_update += count
+        if self._since_update >= self._update_frames and self._filled >= self._min_frames:
+            self._since_update = 0
+            self.estimate()
+
+    def _detect_onsets(self, flux, size):
+        # Report rising edges of the onset envelope above an adaptive
+        # threshold, at most one per refractory period, with their age in
+        # seconds relative to the end of the data processed so far.
+        for n, value in enumerate(flux.tolist()):
+            self._since_onset += 1
+            if value > self._threshold >= self._last_flux and self._since_onset >= self._refractory:
+                self._since_onset = 0
+                self._onset_callback(float(size - n * self._hop_size) / self._sampling_rate)
+            self._last_flux = value
+
+    def estimate(self):
+        envelope = np.roll(self._envelope, -self._position)[-self._filled:]
+        self._threshold = float(envelope.mean() + envelope.std())
+        envelope = envelope - envelope.mean()
+        size = len(envelope)
+        spectrum = np.fft.rfft(envelope, self._nfft)
+        acf = np.fft.irfft(spectrum * np.conj(spectrum), self._nfft)[:size]
+        if acf[0] <= 0:
+            return
+        acf /= acf[0]
+
+        valid = self._comb_index < size
+        values = np.where(valid, acf[np.minimum(self._comb_index, size - 1)], 0.0)
+        weights = self._comb_weights * valid
+        scores = (values * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        best = 1 + int(np.argmax((scores * self._prior)[1:-1]))
+
+        # Parabolic interpolation of the peak for sub-frame lag resolution.
+        left, center, right = scores[best - 1:best + 2]
+        denominator = left - 2.0 * center + right
+        shift = 0.5 * (left - right) / denominator if denominator < 0 else 0.0
+        lag = float(self._lags[best]) + max(-0.5, min(0.5, shift))
+        bpm = 60.0 * self._frame_rate / self._resolve_three_two(acf, self._resolve_octave(acf, lag))
+        confidence = max(0.0, min(1.0, float(center)))
+
+        # Fold anything the octave check left out of range back into it.
+        while bpm > self._max_bpm:
+            bpm /= 2.0
+        while bpm < self._min_bpm:
+            bpm *= 2.0
+
+        self._confidence = confidence
+        if confidence < self._min_confidence:
+            return
+        if not self._bpm or abs(bpm / self._bpm - 1.0) < 0.08:
+            self._bpm = bpm if not self._bpm else self._bpm + 0.5 * (bpm - self._bpm)
+            self._candidate = 0.0
+        elif self._candidate and abs(bpm / self._candidate - 1.0) < 0.04:
+            # Jump only after two consecutive estimates agree.
+            self._bpm = bpm
+            self._candidate = 0.0
+        else:
+            self._candidate = bpm
+            return
+        if self._callback:
+            self._callback(self._bpm, self._confidence)
+
+    def _resolve_octave(self, acf, lag):
+        # Octave error correction from the harmonic energy of the candidate
+        # against its double and half tempo. A beat at lag/2 puts as much
+        # correlation on the odd multiples of lag/2 as on the even ones
+        # (the comb at lag only sees the even ones); a beat at lag * 2
+        # leaves the odd multiples of lag weak. Returns the corrected lag.
+        size = len(acf)
+
+        def ratio(period):
+            # Correlation at period, 3 * period over 2 * period, 4 * period.
+            if 4 * period >= size - 1:
+                return None
+            at = np.interp([period, 3 * period, 2 * period, 4 * period], np.arange(size), acf)
+            even = at[2] + at[3]
+            return (at[0] + at[1]) / even if even > 0 else None
+
+        min_lag = 60.0 * self._frame_rate / self._max_bpm
+        max_lag = 60.0 * self._frame_rate / self._min_bpm
+        faster = lag
+        while faster / 2.0 >= min_lag and (ratio(faster / 2.0) or 0.0) >= self.OCTAVE_RATIO:
+            faster /= 2.0
+        if faster != lag:
+            return faster
+        while lag * 2.0 <= max_lag and ratio(lag) is not None and ratio(lag) < self.OCTAVE_RATIO:
+            lag *= 2.0
+        return lag
+
+    def _resolve_three_two(self, acf, lag):
+        # A 3:2 error sees only every third harmonic of the true beat (or
+        # every other one for 2:3), which the octave check cannot tell
+        # apart. Score the comb at 2/3 and 3/2 of the lag against the lag
+        # itself. Half of the teeth at 3/2 fall on the lag's own, so that
+        # candidate has to outscore the lag outright.
+        size = len(acf)
+
+        def score(period):
+            index = period * np.arange(1, 5)
+            index = index[index < size - 1]
+            if not len(index):
+                return 0.0
+            weights = period / index
+            return float((np.interp(index, np.arange(size), acf) * weights).sum() / weights.sum())
+
+        min_lag = 60.0 * self._frame_rate / self._max_bpm
+        max_lag = 60.0 * self._frame_rate / self._min_bpm
+        current = score(lag)
+        if current <= 0:
+            return lag
+        faster = lag * 2.0 / 3.0
+        if faster >= min_lag and score(faster) >= self.THREE_TWO_RATIO * current:
+            return faster
+        slower = lag * 1.5
+        if slower <= max_lag and score(slower) > current:
+            return slower
+        return lag
+
+    def getBPM(self):
+        return self._bpm
+
+    def getConfidence(self):
+        return self._confidence
+
+    bpm = property(getBPM)
+    confidence = property(getConfidence)
+
+
+class TempoDetector(object):
+
+    def __init__(self, callback=None, buffer_size=256, sampling_rate=44100, bus=None,
+                 onset_callback=None, timer=time.perf_counter):
+        self._callback = callback
+        self._onset_callback = onset_callback
+        self._timer = timer
+        self._enabled = False
+        self._bus = bus if bus is not None else InputBus()
+        self._buffer_size = buffer_size
+        self._estimator = TempoEstimator(self._estimator_callback, sampling_rate,
+                                         onset_callback=self._estimator_onset_callback if onset_callback else None)
+        self._reader = None
+
+    def _estimator_callback(self, bpm, confidence):
+        if self._callback:
+            self._callback(bpm, confidence)
+
+    def _estimator_onset_callback(self, age):
+        self._onset_callback(self._timer() - age)
+
+    def process(self):
+        if self._reader:
+            self._estimator.process(self._reader.read())
+
+    def play(self):
+        if not self._reader:
+            self._estimator.reset()
+            self._reader = BlockReader(self._bus.acquire(), self._buffer_size)
+
+    def stop(self):
+        if self._reader:
+            self._reader.stop()
+            self._bus.release()
+        self._reader = None
+
+    def getEnabled(self):
+        return self._enabled
+
+    def setEnabled(self, value):
+        value = bool(value)
+        if self.enabled != value:
+            self._enabled = value
+        if value:
+            self.play()
+        else:
+            self.stop()
+
+    def getBus(self):
+        return self._bus
+
+    def setBus(self, value):
+        if self._bus is not value:
+            playing = bool(self._reader)
+            self.stop()
+            self._bus = value
+            if playing:
+                self.play()
+
+    def getBPM(self):
+        return self._estimator.bpm
+
+    def getConfidence(self):
+        return self._estimator.confidence
+
+    enabled = property(getEnabled, setEnabled)
+    bus = property(getBus, setBus)
+    bpm = property(getBPM)
+    confidence = property(getConfidence)
+
+
+CHORD_QUALITIES = ['major', 'minor']
+
+
+class SpectrumFrames(object):
+    """Magnitude spectra of overlapping frames taken from a ring buffer.
+
+    Samples are written into a ring buffer of one frame; every `hop_size`
+    samples the frame is windowed and transformed once, so each sample is
+    only analyzed in the frames that actually overlap it.
+    """
+
+    def __init__(self, sampling_rate=44100, size=8192, hop_size=2048):
+        self._sampling_rate = sampling_rate
+        self._size = size
+        self._hop_size = hop_size
+        self.reset()
+
+    def reset(self):
+        self._ring = np.zeros(self._size)
+        self._position = 0
+        self._since_frame = 0
+        self._window = np.hanning(self._size)
+        self._frequencies = np.fft.rfftfreq(self._size, 1.0 / self._sampling_rate)
+        # Prime NumPy's FFT cache here rather than in the first audio block.
+        np.fft.rfft(np.zeros(self._size))
+
+    def process(self, block):
+        spectra = []
+        offset = 0
+        while offset < len(block):
+            count = min(len(block) - offset, self._hop_size - self._since_frame,
+                        self._size - self._position)
+            self._ring[self._position:self._position + count] = block[offset:offset + count]
+            self._position = (self._position + count) % self._size
+            self._since_frame += count
+            offset += count
+            if self._since_frame >= self._hop_size:
+                self._since_frame = 0
+                frame = np.concatenate((self._ring[self._position:], self._ring[:self._position]))
+                spectra.append(np.abs(np.fft.rfft(frame * self._window)))
+        return spectra
+
+    def getFrequencies(self):
+        return self._frequencies
+
+    def getFrameRate(self):
+        return float(self._sampling_rate) / self._hop_size
+
+    frequencies = property(getFrequencies)
+    frame_rate = property(getFrameRate)
+
+
+class ChromaFilter(object):
+    """Fold a magnitude spectrum into a 12 bin pitch class profile.
+
+    Bins below the frequency where a semitone is narrower than one bin are
+    left out, since they cannot be assigned to a single pitch class.
+    """
+
+    def __init__(self, frequencies, min_freq=55.0, max_freq=2000.0):
+        frequencies = np.asarray(frequencies, dtype=float)
+        min_freq = max(min_freq, (frequencies[1] - frequencies[0]) / (2 ** (1 / 12.0) - 1))
+        valid = (frequencies >= min_freq) & (frequencies <= max_freq)
+        pitches = 69.0 + 12.0 * np.log2(np.where(valid, frequencies, 440.0) / 440.0)
+        self._bins = np.nonzero(valid)[0]
+        self._classes = np.round(pitches[valid]).astype(int) % 12
+
+    def process(self, magnitudes):
+        chroma = np.bincount(self._classes, weights=magnitudes[self._bins], minlength=12)
+        total = chroma.sum()
+        return chroma / total if total > 0 else chroma
+
+
+class ChordEstimator(object):
+    """Match chroma profiles against major and minor triad templates.
+
+    A chord is reported once it has been the best match for `dwell` frames in
+    a row with a cosine similarity of at least `min_score`; a run of frames
+    without a good match reports no chord (None).
+    """
+
+    def __init__(self, callback=None, min_score=0.6, dwell=3, smoothing=0.5):
+        self._callback = callback
+        self._min_score = min_score
+        self._dwell = dwell
+        self._smoothing = smoothing
+        templates = []
+        for quality, intervals in enumerate([(0, 4, 7), (0, 3, 7)]):
+            for root in range(12):
+                template = np.zeros(12)
+                template[[(root + i) % 12 for i in intervals]] = 1.0
+                templates.append(template / np.linalg.norm(template))
+        self._templates = np.array(templates)
+        self.reset()
+
+    def reset(self):
+        self._chroma = np.zeros(12)
+        self._chord = None
+        self._candidate = None
+        self._count = 0
+        self._score = 0.0
+
+    def process(self, chroma):
+        self._chroma += (1.0 - self._smoothing) * (chroma - self._chroma)
+        norm = np.linalg.norm(self._chroma)
+        if norm <= 0:
+            return
+        scores = self._templates.dot(self._chroma / norm)
+        best = int(np.argmax(scores))
+        self._score = float(scores[best])
+        candidate = best if self._score >= self._min_score else None
+        if candidate == self._candidate:
+            self._count += 1
+        else:
+            self._candidate = candidate
+            self._count = 1
+        if self._count >= self._dwell and candidate != self._chord:
+            self._chord = candidate
+            if self._callback:
+                self._callback(*self.getChord())
+
+    def getChord(self):
+        # Returns (root, quality) with root as a pitch class, or (None, None).
+        if self._chord is None:
+            return None, None
+        return self._chord % 12, CHORD_QUALITIES[self._chord // 12]
+
+    def getScore(self):
+        return self._score
+
+    chord = property(getChord)
+    score = property(getScore)
+
+
+KEY_PROFILES = {
+    'major': [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88],
+    'minor': [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17],
+}
+
+
+class KeyEstimator(object):
+    """Estimate the musical key from a decaying sum of chroma profiles.
+
+    Each frame decays the accumulated chroma, adds the new one and correlates
+    the result with the 24 Krumhansl-Kessler key profiles, so the cost per
+    frame is fixed instead of growing with the analysis window. A new key
+    has to win for `dwell` seconds with a correlation of at least
+    `min_confidence` before it is reported.
+    """
+
+    def __init__(self, callback=None, frame_rate=44100.0 / 2048, half_life=8.0, min_confidence=0.5, dwell=4.0):
+        self._callback = callback
+        self._frame_rate = frame_rate
+        self._half_life = half_life
+        self._min_confidence = min_confidence
+        self._dwell = dwell
+        profiles = []
+        for mode in CHORD_QUALITIES:
+            for tonic in range(12):
+                profiles.append(np.roll(KEY_PROFILES[mode], tonic))
+        profiles = np.array(profiles)
+        profiles -= profiles.mean(axis=1)[:, np.newaxis]
+        self._profiles = profiles / profiles.std(axis=1)[:, np.newaxis]
+        self.reset()
+
+    def reset(self):
+        self._decay = 0.5 ** (1.0 / max(1e-3, self._half_life * self._frame_rate))
+        self._dwell_frames = max(1, int(round(self._dwell * self._frame_rate)))
+        self._chroma = np.zeros(12)
+        self._key = None
+        self._candidate = None
+        self._count = 0
+        self._confidence = 0.0
+
+    def process(self, chroma):
+        self._chroma *= self._decay
+        self._chroma += chroma
+        std = self._chroma.std()
+        if std <= 0:
+            return
+        scores = self._profiles.dot((self._chroma - self._chroma.mean()) / std) / 12.0
+        best = int(np.argmax(scores))
+        self._confidence = float(scores[best])
+        candidate = best if self._confidence >= self._min_confidence else self._key
+        if candidate == self._key:
+            self._candidate = None
+            self._count = 0
+        elif candidate == self._candidate:
+            self._count += 1
+        else:
+            self._candidate = candidate
+            self._count = 1
+        if self._candidate is not None and self._count >= self._dwell_frames:
+            self._key = self._candidate
+            self._candidate = None
+            self._count = 0
+            if self._callback:
+                self._callback(*self.getKey())
+
+    def getKey(self):
+        # Returns (tonic, mode) with tonic as a pitch class, or (None, None).
+        if self._key is None:
+            return None, None
+        return self._key % 12, CHORD_QUALITIES[self._key // 12]
+
+    def getConfidence(self):
+        return self._confidence
+
+    key = property(getKey)
+    confidence = property(getConfidence)
+
+
+SPECTRAL_DESCRIPTORS = ['centroid', 'flatness', 'rolloff']
+
+
+class SpectralDescriptors(object):
+    """Spectral centroid, flatness and rolloff of each frame.
+
+    All three come from the same magnitude spectrum in a few vectorized
+    passes over the bins. Each is mapped to a 0-127 value (frequencies on a
+    log scale between `min_freq` and `max_freq`) and passed through its own
+    change filter; the callback receives a list with None for suppressed
+    values.
+    """
+
+    def __init__(self, callback=None, frequencies=None, frame_rate=44100.0 / 2048,
+                 min_freq=50.0, max_freq=12000.0, rolloff=0.85, min_power=1e-6):
+        self._callback = callback
+        self._frequencies = np.asarray(frequencies, dtype=float)
+        self._frame_rate = frame_rate
+        self._min_freq = min_freq
+        self._max_freq = max_freq
+        self._rolloff = rolloff
+        self._min_power = min_power
+        self._filters = [ChangeFilter() for name in SPECTRAL_DESCRIPTORS]
+        self.reset()
+
+    def reset(self):
+        self._frame = 0
+        self._values = [0.0] * len(SPECTRAL_DESCRIPTORS)
+        for change_filter in self._filters:
+            change_filter.reset()
+
+    def _scale_frequency(self, value):
+        value = math.log(max(self._min_freq, min(self._max_freq, value)) / self._min_freq)
+        return int(round(127 * value / math.log(self._max_freq / self._min_freq)))
+
+    def process(self, magnitudes):
+        self._frame += 1
+        power = magnitudes * magnitudes
+        total = power.sum()
+        if total < self._min_power:
+            return
+        centroid = float(self._frequencies.dot(magnitudes) / magnitudes.sum())
+        flatness = float(np.exp(np.log(power + 1e-12).mean()) / (total / len(power)))
+        index = int(np.searchsorted(np.cumsum(power), self._rolloff * total))
+        rolloff = float(self._frequencies[min(index, len(self._frequencies) - 1)])
+        self._values = [centroid, flatness, rolloff]
+
+        now = self._frame / self._frame_rate
+        scaled = [self._scale_frequency(centroid), int(round(127 * min(1.0, flatness))), self._scale_frequency(rolloff)]
+        values = [None] * len(scaled)
+        changed = False
+        for n, value in enumerate(scaled):
+            if self._filters[n].check(value, now):
+                values[n] = value
+                changed = True
+        if self._callback and changed:
+            self._callback(values)
+
+    def getValues(self):
+        # Raw values: centroid (Hz), flatness (0-1), rolloff (Hz).
+        return self._values
+
+    values = property(getValues)
+
+
+class StyleDetector(object):
+    """Chord, key and spectral descriptor analysis sharing one FFT per hop."""
+
+    def __init__(self, chord_callback=None, buffer_size=256, sampling_rate=44100, bus=None,
+                 size=8192, hop_size=2048, key_callback=None, descriptors_callback=None):
+        self._enabled = False
+        self._bus = bus if bus is not None else InputBus()
+        self._buffer_size = buffer_size
+        self._spectrum = SpectrumFrames(sampling_rate, size, hop_size)
+        self._chroma = ChromaFilter(self._spectrum.frequencies)
+        self._chords = ChordEstimator(chord_callback)
+        self._keys = KeyEstimator(key_callback, self._spectrum.frame_rate)
+        self._descriptors = SpectralDescriptors(descriptors_callback, self._spectrum.frequencies,
+                                                self._spectrum.frame_rate)
+        self._reader = None
+
+    def process(self):
+        if self._reader:
+            for magnitudes in self._spectrum.process(self._reader.read()):
+                chroma = self._chroma.process(magnitudes)
+                self._chords.process(chroma)
+                self._keys.process(chroma)
+                self._descriptors.process(magnitudes)
+
+    def play(self):
+        if not self._reader:
+            self._spectrum.reset()
+            self._chords.reset()
+            self._keys.reset()
+            self._descriptors.reset()
+            self._reader = BlockReader(self._bus.acquire(), self._buffer_size)
+
+    def stop(self):
+        if self._reader:
+            self._reader.stop()
+            self._bus.release()
+        self._reader = None
+
+    def getEnabled(self):
+        return self._enabled
+
+    def setEnabled(self, value):
+        value = bool(value)
+        if self.enabled != value:
+            self._enabled = value
+        if value:
+            self.play()
+        else:
+            self.stop()
+
+    def getBus(self):
+        return self._bus
+
+    def setBus(self, value):
+        if self._bus is not value:
+            playing = bool(self._reader)
+            self.stop()
+            self._bus = value
+            if playing:
+                self.play()
+
+    def getChord(self):
+        return self._chords.chord
+
+    def getKey(self):
+        return self._keys.key
+
+    def getKeyConfidence(self):
+        return self._keys.confidence
+
+    def getDescriptors(self):
+        return self._descriptors.values
+
+    enabled = property(getEnabled, setEnabled)
+    bus = property(getBus, setBus)
+    chord = property(getChord)
+    key = property(getKey)
+    key_confidence = property(getKeyConfidence)
+    descriptors = property(getDescriptors)
+
+
+class OfflineEngine(object):
+    """Run the analysis chain over a sound file as fast as possible."""
+
+    def __init__(self, buffer_size=256):
+        self._buffer_size = buffer_size
+        self._sampling_rate = 44100
+        self._server = None
+        self._block = 0
+        self._events = []
+        self._elapsed = 0.0
+        self._duration = 0.0
+        self.strength_enabled = True
+        self.speed_enabled = False
+        self.tempo_enabled = False
+        self.lock_enabled = False
+        # Channels of the sound file to analyze, None for all of them.
+        self.channels = None
+        self.input_bus = InputBus()
+        self.strength_analyzer = StrengthAnalyzer(self._on_strength_velocity, timer=self.getTime, bus=self.input_bus)
+        self.beat_generator = BeatGenerator(sender=self._on_beat_clock, timer=self.getTime, threaded=False)
+        self.beat_tracker = BeatTracker(self.beat_generator)
+        self.tempo_detector = None
+        # Called with the block number at the start of every block.
+        self.block_callback = None
+
+    def _process_callback(self):
+        if self.block_callback:
+            self.block_callback(self._block)
+        self.strength_analyzer.process()
+        if self.tempo_detector:
+            self.tempo_detector.process()
+        self.beat_generator.schedule(self.getTime())
+        self._block += 1
+
+    def _on_tempo(self, bpm, confidence):
+        self._events.append((self.getTime(), 'tempo', round(bpm, 1)))
+        self.beat_generator.bpm = bpm
+
+    def _on_onset(self, now):
+        error = self.beat_tracker.onset(now)
+        self._events.append((now, 'onset', None if error is None else round(error * 1000.0, 1)))
+
+    def _on_strength_velocity(self, velocity):
+        self._events.append((self.getTime(), 'velocity', velocity))
+
+    def _on_beat_clock(self, msg, timestamp=0):
+        self._events.append((self.getTime() + timestamp / 1000.0, 'clock', msg))
+
+    def getServer(self, sampling_rate):
+        if not self._server:
+            self._server = pyo.Server(sr=sampling_rate, nchnls=1, buffersize=self._buffer_size,
+                                      duplex=0, audio='offline')
+            self._server.deactivateMidi()
+            self._server.setCallback(self._process_callback)
+        elif self._sampling_rate != sampling_rate:
+            self._server.setSamplingRate(sampling_rate)
+        self._sampling_rate = sampling_rate
+        return self._server
+
+    def getTime(self):
+        return float(self._block * self._buffer_size) / self._sampling_rate
+
+    def getEvents(self):
+        return self._events
+
+    def getElapsed(self):
+        return self._elapsed
+
+    def getDuration(self):
+        return self._duration
+
+    def getSpeedFactor(self):
+        return self._duration / self._elapsed if self._elapsed else 0.0
+
+    def run(self, path):
+        info = pyo.sndinfo(path)
+        if not info:
+            raise IOError('unable to read sound file: {}'.format(path))
+        self._duration, sampling_rate = info[1], info[2]
+        server = self.getServer(sampling_rate)
+        server.boot()
+        # The offline server always renders its output to a file; discard it.
+        rec_fd, rec_path = tempfile.mkstemp(suffix='.wav')
+        os.close(rec_fd)
+        try:
+            server.recordOptions(dur=self._duration, filename=rec_path)
+            self._block = 0
+            self._events = []
+            self.input_bus.channels = self.channels if self.channels is not None else list(range(info[3]))
+            self.input_bus.source = pyo.SfPlayer(path)
+            if self.strength_enabled:
+                self.strength_analyzer.play()
+            self.beat_tracker.reset()
+            if self.tempo_enabled or self.lock_enabled:
+                self.tempo_detector = TempoDetector(self._on_tempo if self.tempo_enabled else None,
+                                                    self._buffer_size, sampling_rate, bus=self.input_bus,
+                                                    onset_callback=self._on_onset if self.lock_enabled else None,
+                                                    timer=self.getTime)
+                self.tempo_detector.play()
+            if self.speed_enabled:
+                self.beat_generator.play()
+            started = time.time()
+            server.start()
+            self._elapsed = time.time() - started
+        finally:
+            if self.tempo_detector:
+                self.tempo_detector.stop()
+                self.tempo_detector = None
+            self.beat_generator.stop()
+            self.strength_analyzer.stop()
+            self.input_bus.source = None
+            server.shutdown()
+            os.remove(rec_path)
+        # Clock ticks are recorded when handed off, ahead of their due time.
+        self._events.sort(key=lambda event: event[0])
+        return self._events
+
+    events = property(getEvents)
+    elapsed = property(getElapsed)
+    duration = property(getDuration)
+    speed_factor = property(getSpeedFactor)
@@ -6,14 +6,7 @@ import wx.adv
 from .constants import *  # noqa
 from .dialogs import *  # noqa
 from .panels import *  # noqa
-
-# PyWin32
-try:
-    import win32api
-    import win32con
-    import win32gui
-except ImportError:
-    win32api, win32con, win32gui = None, None, None
+from .utils import import_win32gui
 
 __all__ = ['Frame']
 
@@ -23,6 +16,9 @@ class MenuBar(wx.MenuBar):
     def __init__(self, *args, **kwargs):
         super(MenuBar, self).__init__(*args, **kwargs)
         file_menu = wx.Menu()
+        file_menu.Append(ID_REFRESH_DEVICES, '&Refresh Devices\tF5')
+        file_menu.Append(ID_SHOW_TIMINGS, '&Timings...\tCtrl+T')
+        file_menu.AppendSeparator()
         file_menu.Append(wx.ID_EXIT, 'E&xit\tCtrl+Q')
         self.Append(file_menu, '&File')
         help_menu = wx.Menu()
@@ -66,11 +62,15 @@ class Frame(wx.Frame):
         if wx.GetApp().GetMaximized():
             self.Maximize()
         self.Bind(wx.EVT_MENU, self.OnMenuExit, id=wx.ID_EXIT)
+        self.Bind(wx.EVT_MENU, self.OnMenuRefreshDevices, id=ID_REFRESH_DEVICES)
+        self.Bind(wx.EVT_MENU, self.OnMenuTimings, id=ID_SHOW_TIMINGS)
         self.Bind(wx.EVT_MENU, self.OnHelpAbout, id=wx.ID_ABOUT)
         self.Bind(wx.EVT_CLOSE, self.OnClose, self)
         self.Bind(wx.EVT_SIZE, self.OnSize, self)
         self.Bind(wx.EVT_MOVE, self.OnMove, self)
+        win32con, win32gui = import_win32gui()
         if win32gui:
+            self._win32 = win32con, win32gui
             self.oldWndProc = win32gui.SetWindowLong(self.GetHandle(),
                                                      win32con.GWL_WNDPROC,
                                                      self.WndProc)
@@ -78,6 +78,21 @@ class Frame(wx.Frame):
     def OnMenuExit(self, event):
         self.Close(True)
 
+    def OnMenuRefreshDevices(self, event):
+        wx.GetApp().RefreshAudioMidiIO()
+
+    def OnMenuTimings(self, event):
+        self.ShowTimingsDialog()
+
+    def ShowTimingsDialog(self):
+        # A single modeless dialog; it destroys itself when closed.
+        dialog = getattr(self, '_timings_dialog', None)
+        if not dialog:
+            dialog = TimingsDialog(self, wx.ID_ANY, 'Timings')
+            self._timings_dialog = dialog
+        dialog.Show()
+        dialog.Raise()
+
     def OnHelpAbout(self, event):
         info = wx.adv.AboutDialogInfo()
         if wx.GetApp().GetIconPath():
@@ -108,11 +123,12 @@ class Frame(wx.Frame):
         event.Skip()
 
     def WndProc(self, hWnd, msg, wParam, lParam):
+        win32con, win32gui = self._win32
         if msg == win32con.WM_USER:
             if wParam == 0 and lParam == 1:
                 self.Show()
                 self.Raise()
         elif msg == win32con.WM_DESTROY:
-            win32api.SetWindowLong(self.GetHandle(), win32con.GWL_WNDPROC,
+            win32gui.SetWindowLong(self.GetHandle(), win32con.GWL_WNDPROC,
                                    self.oldWndProc)
         return win32gui.CallWindowProc(self.oldWndProc, hWnd, msg, wParam, lParam)
@@ -0,0 +1,299 @@
+"""Run the BeatDown engine without wxPython, configured from an INI file.
+
+Settings have the names used by the GUI, split at the first underscore
+into section and option (``strength_lpf`` is ``lpf`` in ``[strength]``):
+
+    [audio]
+    input = 2
+    input_channels = 3
+    latency_profile = tight
+
+    [midi]
+    output = 1
+
+    [strength]
+    enabled = true
+    lpf = 120
+    midi_output = 45825
+
+    [speed]
+    enabled = true
+    bpm = 120
+    detect = true
+
+Audio and MIDI devices may also be given by (part of) their name. SIGINT
+and SIGTERM stop the engine cleanly; SIGHUP reloads the config file.
+"""
+
+# Python
+import configparser
+import logging
+import optparse
+import os
+import signal
+import threading
+
+# PyO
+import pyo
+
+# BeatDown
+from .engine import (BeatGenerator, BeatTracker, BlockTimer, GoertzelAnalyzer, InputBus, LATENCY_PROFILES,
+                     MidiDispatcher, MultiBandAnalyzer, StrengthAnalyzer, TempoDetector)
+from .utils import midi_output_message
+
+DEFAULT_CONFIG = os.path.expanduser('~/.beatdown.ini')
+
+logger = logging.getLogger(__name__)
+
+
+def find_device(value, names, indexes):
+    # Device index from an index or (part of) a device name; None if absent.
+    value = value.strip()
+    try:
+        index = int(value)
+        return index if index in indexes else None
+    except ValueError:
+        for name, index in zip(names, indexes):
+            if value.lower() in name.lower():
+                return index
+    return None
+
+
+class Daemon(object):
+    """Audio server, analyzers and MIDI output driven by a config file."""
+
+    def __init__(self, path=DEFAULT_CONFIG):
+        self._path = path
+        self._config = configparser.ConfigParser()
+        self._stop_event = threading.Event()
+        self._reload = False
+        self._server = None
+        self._input_bus = None
+        self._block_timer = None
+        self._midi_dispatcher = None
+        self._strength_analyzer = None
+        self._beat_generator = None
+        self._beat_tracker = None
+        self._tempo_detector = None
+        self._strength_midi_output = 0
+        self._band_midi_outputs = []
+        self._speed_detect = False
+        self._speed_lock = False
+        self.load()
+
+    def load(self):
+        self._config = configparser.ConfigParser()
+        if not self._config.read(self._path):
+            logger.warning('unable to read %s, using default settings', self._path)
+
+    def getSetting(self, name, type_=str, default=''):
+        section, option = name.split('_', 1)
+        getter = {
+            bool: self._config.getboolean,
+            int: self._config.getint,
+            float: self._config.getfloat,
+        }.get(type_, self._config.get)
+        try:
+            return type_(getter(section, option, fallback=default))
+        except ValueError:
+            logger.warning('invalid value for %s in [%s], using %r', option, section, default)
+            return type_(default)
+
+    def _process_callback(self):
+        # Runs on the audio thread; read each attribute once in case stop()
+        # clears it meanwhile.
+        block_timer, analyzer, detector = self._block_timer, self._strength_analyzer, self._tempo_detector
+        if block_timer:
+            block_timer.tick()
+        if analyzer:
+            analyzer.process()
+        if detector:
+            detector.process()
+
+    def _send(self, midi_output, value):
+        if midi_output and self._midi_dispatcher.is_alive():
+            self._midi_dispatcher.put(*midi_output_message(midi_output, value))
+
+    def _send_sys(self, msg, timestamp=0):
+        if self._midi_dispatcher.is_alive():
+            self._midi_dispatcher.putx(msg, timestamp)
+
+    def _on_velocity(self, velocity):
+        self._send(self._strength_midi_output, velocity)
+
+    def _on_velocities(self, velocities):
+        for band, velocity in enumerate(velocities):
+            if velocity is not None and band < len(self._band_midi_outputs):
+                self._send(self._band_midi_outputs[band], velocity)
+
+    def _on_tempo(self, bpm, confidence):
+        logger.debug('tempo %.1f bpm (confidence %.2f)', bpm, confidence)
+        if self._speed_detect:
+            self._beat_tracker.setBPM(bpm)
+
+    def _on_onset(self, now):
+        if self._speed_lock:
+            self._beat_tracker.onset(now)
+
+    def _start_audio(self):
+        input_names, input_indexes = pyo.pa_get_input_devices()
+        audio_input = find_device(self.getSetting('audio_input', str, '-1'), input_names, input_indexes)
+        if audio_input is None:
+            audio_input = pyo.pa_get_default_input()
+        channels = self.getSetting('audio_input_channels', int, -1)
+        channels = [n for n in range(16) if channels & (2 ** n)]
+        max_channels = pyo.pa_get_input_max_channels(audio_input) if audio_input >= 0 else 2
+        profile = self.getSetting('audio_latency_profile', str, 'balanced')
+        buffer_size = LATENCY_PROFILES.get(profile, self.getSetting('audio_buffer_size', int, 256))
+        sampling_rate = self.getSetting('audio_sampling_rate', int, 44100)
+        nchnls = 1 if self.getSetting('audio_input_only', bool, False) else 2
+        self._server = pyo.Server(sr=sampling_rate, nchnls=nchnls, buffersize=buffer_size, duplex=1,
+                                  ichnls=min(16, max(1, max_channels)))
+        self._server.deactivateMidi()
+        self._server.setCallback(self._process_callback)
+        if audio_input >= 0:
+            self._server.setInputDevice(audio_input)
+        self._server.boot()
+        self._block_timer = BlockTimer(buffer_size, sampling_rate)
+        self._input_bus = InputBus([n for n in channels if n < max_channels] or [0])
+        logger.info('audio input %d, channels %s, %d Hz, %d samples per block (%.1f ms)', audio_input,
+                    ','.join(str(n + 1) for n in self._input_bus.channels), sampling_rate, buffer_size,
+                    1000.0 * buffer_size / sampling_rate)
+
+    def _start_midi(self):
+        output_names, output_indexes = pyo.pm_get_output_devices()
+        midi_output = find_device(self.getSetting('midi_output', str, '-1'), output_names, output_indexes)
+        if midi_output is None:
+            logger.warning('no MIDI output configured or found; not sending MIDI')
+            self._midi_dispatcher = MidiDispatcher()
+        else:
+            self._midi_dispatcher = MidiDispatcher(midi_output)
+            self._midi_dispatcher.start()
+            logger.info('MIDI output %d (%s)', midi_output, output_names[output_indexes.index(midi_output)])
+
+    def _start_strength(self):
+        multiband = self.getSetting('strength_multiband', bool, False)
+        callback = self._on_velocities if multiband else self._on_velocity
+        if self.getSetting('strength_backend', str, 'filters') == 'goertzel':
+            analyzer = GoertzelAnalyzer(callback, bus=self._input_bus, buffer_size=self._server.getBufferSize(),
+                                        sampling_rate=self._server.getSamplingRate(), multiband=multiband)
+        elif multiband:
+            analyzer = MultiBandAnalyzer(callback, bus=self._input_bus)
+        else:
+            analyzer = StrengthAnalyzer(callback, bus=self._input_bus)
+        analyzer.lpf = self.getSetting('strength_lpf', int, 120)
+        analyzer.attack = self.getSetting('strength_attack', float, 0.1)
+        analyzer.release = self.getSetting('strength_release', float, 0.1)
+        analyzer.min_spl = self.getSetting('strength_min_spl', int, -120)
+        analyzer.min_velocity = self.getSetting('strength_min_velocity', int, 0)
+        analyzer.max_spl = self.getSetting('strength_max_spl', int, 0)
+        analyzer.max_velocity = self.getSetting('strength_max_velocity', int, 127)
+        analyzer.curve = self.getSetting('strength_curve', str, 'linear')
+        analyzer.hysteresis = self.getSetting('strength_hysteresis', int, 1)
+        analyzer.max_rate = self.getSetting('strength_max_rate', int, 30)
+        analyzer.refresh = self.getSetting('strength_refresh', float, 1.0)
+        if multiband:
+            crossovers = self.getSetting('strength_crossovers', str, '100,400,2000')
+            analyzer.crossovers = [int(v) for v in crossovers.split(',') if v.strip().isdigit()]
+        self._strength_midi_output = self.getSetting('strength_midi_output', int, 0)
+        outputs = self.getSetting('strength_band_midi_outputs', str, '')
+        self._band_midi_outputs = [int(v) if v.strip().isdigit() else 0 for v in outputs.split(',')]
+        self._strength_analyzer = analyzer
+        if self.getSetting('strength_enabled', bool, False):
+            analyzer.enabled = True
+
+    def _start_speed(self):
+        self._speed_detect = self.getSetting('speed_detect', bool, False)
+        self._speed_lock = self.getSetting('speed_lock', bool, False)
+        self._beat_generator = BeatGenerator(sender=self._send_sys)
+        self._beat_generator.bpm = self.getSetting('speed_bpm', int, 120)
+        self._beat_tracker = BeatTracker(self._beat_generator)
+        self._update_latency()
+        if not self.getSetting('speed_enabled', bool, False):
+            return
+        if self._speed_detect or self._speed_lock:
+            self._tempo_detector = TempoDetector(self._on_tempo, self._server.getBufferSize(),
+                                                 self._server.getSamplingRate(), bus=self._input_bus,
+                                                 onset_callback=self._on_onset)
+            self._tempo_detector.enabled = True
+        self._beat_generator.enabled = True
+
+    def start(self):
+        self._start_audio()
+        self._start_midi()
+        self._start_strength()
+        self._start_speed()
+        self._server.start()
+        logger.info('started')
+
+    def stop(self):
+        # Stop the server first so its callback no longer runs while the
+        # analyzers are torn down.
+        if self._server and self._server.getIsStarted():
+            self._server.stop()
+        if self._beat_generator:
+            self._beat_generator.stop()
+            self._beat_generator = None
+        if self._tempo_detector:
+            self._tempo_detector.stop()
+            self._tempo_detector = None
+        if self._strength_analyzer:
+            self._strength_analyzer.stop()
+            self._strength_analyzer = None
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+        if self._midi_dispatcher:
+            if self._midi_dispatcher.is_alive():
+                self._midi_dispatcher.stop()
+                self._midi_dispatcher.join(1.0)
+            self._midi_dispatcher = None
+        logger.info('stopped')
+
+    def _update_latency(self):
+        # Onsets are detected an input buffer (and the callback jitter)
+        # after they were played.
+        if self._beat_tracker and self._block_timer:
+            self._beat_tracker.offset = self._block_timer.latency - self._block_timer.period
+
+    def _on_signal(self, signum, frame):
+        if signum == getattr(signal, 'SIGHUP', None):
+            self._reload = True
+        self._stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._on_signal)
+        self.start()
+        try:
+            while True:
+                # Wake up now and then so signals are handled promptly.
+                while not self._stop_event.wait(0.5):
+                    self._update_latency()
+                self._stop_event.clear()
+                if not self._reload:
+                    break
+                self._reload = False
+                logger.info('reloading %s', self._path)
+                self.stop()
+                self.load()
+                self.start()
+        finally:
+            self.stop()
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog --headless [options]')
+    parser.add_option('--headless', action='store_true', default=True, help='run without the GUI')
+    parser.add_option('-c', '--config', default=DEFAULT_CONFIG, help='settings file (default %default)')
+    parser.add_option('--log-level', dest='log_level', default='info', help='debug, info, warning or error')
+    options, args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, options.log_level.upper(), logging.INFO),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    Daemon(options.config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,6 @@ import io
 
 # wxPython
 import wx
-import wx.html
 import wx.lib.agw.pygauge
 import wx.lib.agw.peakmeter
 
@@ -11,6 +10,7 @@ import wx.lib.agw.peakmeter
 from .constants import *  # noqa
 from .controls import *  # noqa
 from .dialogs import *  # noqa
+from .engine import LATENCY_PROFILES, MultiBandAnalyzer, RESPONSE_CURVES, SPECTRAL_DESCRIPTORS
 from .utils import *  # noqa
 
 
@@ -54,6 +54,14 @@ class HeaderPanel(wx.Panel):
 
 class StatusPanel(wx.Panel):
 
+    # Tooltip suffix and icon for each component status.
+    STATUS_ICONS = {
+        'running': ('Running', wx.ART_INFORMATION),
+        'stopped': ('Stopped', wx.ART_TIP),
+        'enabled': ('Enabled', wx.ART_WARNING),
+        'disabled': ('Disabled', wx.ART_ERROR),
+    }
+
     def __init__(self, *args, **kwargs):
         super(StatusPanel, self).__init__(*args, **kwargs)
         self.SetBackgroundColour(COLOR_BACKGROUND)
@@ -61,18 +69,38 @@ class StatusPanel(wx.Panel):
         sizer = wx.BoxSizer(wx.HORIZONTAL)
         status_text = wx.StaticText(self, wx.ID_ANY, '(status)', style=wx.ALIGN_LEFT | wx.ST_NO_AUTORESIZE | wx.ST_ELLIPSIZE_END)
         sizer.Add(status_text, 1, wx.ALL, 4)
-        midi_listener_status = wx.StaticBitmap(self, wx.ID_ANY, self.GetStatusBitmap())
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateMidiListenerStatus, midi_listener_status)
-        sizer.Add(midi_listener_status, 0, wx.ALL, 4)
-        midi_dispatcher_status = wx.StaticBitmap(self, wx.ID_ANY, self.GetStatusBitmap())
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateMidiDispatcherStatus, midi_dispatcher_status)
-        sizer.Add(midi_dispatcher_status, 0, wx.ALL, 4)
-        audio_server_status = wx.StaticBitmap(self, wx.ID_ANY, self.GetStatusBitmap())
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateAudioServerStatus, audio_server_status)
-        sizer.Add(audio_server_status, 0, wx.ALL, 4)
+        display_counts_text = wx.StaticText(self, wx.ID_ANY, '', style=wx.ALIGN_RIGHT | wx.ST_NO_AUTORESIZE)
+        display_counts_text.SetMinSize((140, -1))
+        display_counts_text.SetToolTip('Display updates rendered / produced')
+        self._display_counts_text = display_counts_text
+        sizer.Add(display_counts_text, 0, wx.ALL, 4)
+        timings_text = wx.StaticText(self, wx.ID_ANY, '', style=wx.ALIGN_RIGHT | wx.ST_NO_AUTORESIZE)
+        timings_text.SetMinSize((220, -1))
+        timings_text.SetToolTip('Instrumented function with the most calls over its time budget')
+        self._timings_text = timings_text
+        sizer.Add(timings_text, 0, wx.ALL, 4)
+        timings_button = wx.Button(self, wx.ID_ANY, 'Timings', style=wx.BU_EXACTFIT)
+        self.Bind(wx.EVT_BUTTON, self.OnTimingsButton, timings_button)
+        sizer.Add(timings_button, 0, wx.ALIGN_CENTER_VERTICAL, 0)
+        self._status_bitmaps = {}
+        for name, label in [('midi_listener_status', 'MIDI Listener'),
+                            ('midi_dispatcher_status', 'MIDI Dispatcher'),
+                            ('audio_server_status', 'Audio Server')]:
+            status_bitmap = wx.StaticBitmap(self, wx.ID_ANY, self.GetStatusBitmap())
+            self._status_bitmaps[name] = (label, status_bitmap)
+            sizer.Add(status_bitmap, 0, wx.ALL, 4)
         sizer.Add((8, 16))
         self.SetSizerAndFit(sizer)
 
+        app = wx.GetApp()
+        app.Subscribe(self, self.UpdateDisplayCounts, 'display_counts')
+        app.Subscribe(self, self.UpdateTimings, 'timings')
+        app.Subscribe(self, self.UpdateStatus, *self._status_bitmaps)
+        self.UpdateDisplayCounts()
+        self.UpdateTimings()
+        for name in self._status_bitmaps:
+            self.UpdateStatus(name)
+
     def GetStatusBitmap(self, art_id='', size=(16, 16)):
         bmp = wx.ArtProvider.GetBitmap(art_id, size=size)
         if not bmp.IsOk():
@@ -83,51 +111,30 @@ class StatusPanel(wx.Panel):
             dc.Clear()
         return bmp
 
-    def OnUpdateMidiListenerStatus(self, event):
-        if not hasattr(self, '_last_midi_listener_status'):
-            self._last_midi_listener_status = ''
-        new_midi_listener_status = wx.GetApp().GetMidiListenerStatus()
-        if new_midi_listener_status != self._last_midi_listener_status:
-            tooltip, art_id = {
-                'running': ('MIDI Listener Running', wx.ART_INFORMATION),
-                'stopped': ('MIDI Listener Stopped', wx.ART_TIP),
-                'disabled': ('MIDI Listener Disabled', wx.ART_ERROR),
-            }.get(new_midi_listener_status, ('', ''))
-            midi_listener_status = event.GetEventObject()
-            midi_listener_status.SetToolTip(tooltip)
-            midi_listener_status.SetBitmap(self.GetStatusBitmap(art_id))
-            self._last_midi_listener_status = new_midi_listener_status
-
-    def OnUpdateMidiDispatcherStatus(self, event):
-        if not hasattr(self, '_last_midi_dispatcher_status'):
-            self._last_midi_dispatcher_status = ''
-        new_midi_dispatcher_status = wx.GetApp().GetMidiDispatcherStatus()
-        if new_midi_dispatcher_status != self._last_midi_dispatcher_status:
-            tooltip, art_id = {
-                'running': ('MIDI Dispatcher Running', wx.ART_INFORMATION),
-                'stopped': ('MIDI Dispatcher Stopped', wx.ART_TIP),
-                'disabled': ('MIDI Dispatcher Disabled', wx.ART_ERROR),
-            }.get(new_midi_dispatcher_status, ('', ''))
-            midi_dispatcher_status = event.GetEventObject()
-            midi_dispatcher_status.SetToolTip(tooltip)
-            midi_dispatcher_status.SetBitmap(self.GetStatusBitmap(art_id))
-            self._last_midi_dispatcher_status = new_midi_dispatcher_status
-
-    def OnUpdateAudioServerStatus(self, event):
-        if not hasattr(self, '_last_audio_server_status'):
-            self._last_audio_server_status = ''
-        new_audio_server_status = wx.GetApp().GetAudioServerStatus()
-        if new_audio_server_status != self._last_audio_server_status:
-            tooltip, art_id = {
-                'running': ('Audio Server Running', wx.ART_INFORMATION),
-                'stopped': ('Audio Server Stopped', wx.ART_TIP),
-                'enabled': ('Audio Server Enabled', wx.ART_WARNING),
-                'disabled': ('Audio Server Disabled', wx.ART_ERROR),
-            }.get(new_audio_server_status, ('', ''))
-            audio_server_status = event.GetEventObject()
-            audio_server_status.SetToolTip(tooltip)
-            audio_server_status.SetBitmap(self.GetStatusBitmap(art_id))
-            self._last_audio_server_status = new_audio_server_status
+    def UpdateDisplayCounts(self, name=None, value=None):
+        produced, rendered = wx.GetApp().GetState().get('display_counts', (0, 0))
+        value = '{} / {}'.format(rendered, produced)
+        if self._display_counts_text.GetLabel() != value:
+            self._display_counts_text.SetLabel(value)
+
+    def UpdateTimings(self, name=None, value=None):
+        worst = wx.GetApp().GetState().get('timings')
+        value = '{} {} over budget'.format(*worst) if worst else ''
+        if self._timings_text.GetLabel() != value:
+            self._timings_text.SetLabel(value)
+
+    def OnTimingsButton(self, event):
+        wx.GetTopLevelParent(self).ShowTimingsDialog()
+
+    def UpdateStatus(self, name, value=None):
+        # Only called when the status changed (or once when created).
+        label, status_bitmap = self._status_bitmaps[name]
+        status = wx.GetApp().GetState().get(name)
+        if status not in self.STATUS_ICONS:
+            return
+        suffix, art_id = self.STATUS_ICONS[status]
+        status_bitmap.SetToolTip('{} {}'.format(label, suffix))
+        status_bitmap.SetBitmap(self.GetStatusBitmap(art_id))
 
 
 class SpeedPanel(wx.Panel):
@@ -170,19 +177,54 @@ class SpeedPanel(wx.Panel):
         bpm_value = str(wx.GetApp().GetSpeedBPM())
         bpm_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(80, -1), value=bpm_value, min=40, max=480)
         self.Bind(wx.EVT_TEXT, self.OnBPMSpinner, bpm_spinner)
+        self._bpm_spinner = bpm_spinner
         bpm_sizer.Add(bpm_spinner, 0, wx.ALL, 0)
         gbsizer.Add(bpm_sizer, (0, 1), (1, 1), wx.ALL, 0)
 
+        # Tempo detection settings.
+        detect_label = wx.StaticText(self, wx.ID_ANY, 'Detect:')
+        gbsizer.Add(detect_label, (1, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        detect_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        detect_checkbox = wx.CheckBox(self, wx.ID_ANY, '')
+        detect_checkbox.SetValue(wx.GetApp().GetSpeedDetect())
+        self.Bind(wx.EVT_CHECKBOX, self.OnDetectCheck, detect_checkbox)
+        detect_sizer.Add(detect_checkbox, 0, wx.ALL, 0)
+        detect_text = wx.StaticText(self, wx.ID_ANY, '', size=(120, -1), style=wx.ST_NO_AUTORESIZE)
+        self._detect_text = detect_text
+        detect_sizer.Add(detect_text, 0, wx.LEFT, 4)
+        gbsizer.Add(detect_sizer, (1, 1), (1, 1), wx.ALL, 0)
+
+        # Phase lock of the clock to detected beats.
+        lock_label = wx.StaticText(self, wx.ID_ANY, 'Lock:')
+        gbsizer.Add(lock_label, (2, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        lock_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        lock_checkbox = wx.CheckBox(self, wx.ID_ANY, '')
+        lock_checkbox.SetValue(wx.GetApp().GetSpeedLock())
+        self.Bind(wx.EVT_CHECKBOX, self.OnLockCheck, lock_checkbox)
+        lock_sizer.Add(lock_checkbox, 0, wx.ALL, 0)
+        lock_text = wx.StaticText(self, wx.ID_ANY, '', size=(120, -1), style=wx.ST_NO_AUTORESIZE)
+        self._lock_text = lock_text
+        lock_sizer.Add(lock_text, 0, wx.LEFT, 4)
+        gbsizer.Add(lock_sizer, (2, 1), (1, 1), wx.ALL, 0)
+
         # Beat Indicator.
         beat_display = BeatDisplay(self, ID_SPEED_DISPLAY, size=(-1, 30))
         beat_display.SetValue(50)
         beat_display.SetForegroundColour(wx.GREEN)
         beat_display.SetBackgroundColour(wx.Colour(0, 0, 0, 0))
-        gbsizer.Add(beat_display, (1, 1), (1, 1), wx.EXPAND | wx.ALL, 1)
+        gbsizer.Add(beat_display, (3, 1), (1, 1), wx.EXPAND | wx.ALL, 1)
 
         sizer.Add(gbsizer, 1, wx.EXPAND | wx.ALL, 8)
         self.SetSizerAndFit(sizer)
 
+        app = wx.GetApp()
+        app.Subscribe(self, self.UpdateBPM, 'speed_detect')
+        app.Subscribe(self, self.UpdateDetectText, 'speed_detect', 'speed_detected')
+        app.Subscribe(self, self.UpdateLockText, 'speed_lock', 'speed_lock_status')
+        self.UpdateBPM()
+        self.UpdateDetectText()
+        self.UpdateLockText()
+
     def OnEnabledCheck(self, event):
         wx.GetApp().SetSpeedEnabled(event.IsChecked())
 
@@ -192,6 +234,33 @@ class SpeedPanel(wx.Panel):
     def OnBPMSpinner(self, event):
         wx.GetApp().SetSpeedBPM(event.GetEventObject().GetValue())
 
+    def UpdateBPM(self, name=None, value=None):
+        self._bpm_spinner.Enable(not wx.GetApp().GetSpeedDetect())
+
+    def OnDetectCheck(self, event):
+        wx.GetApp().SetSpeedDetect(event.IsChecked())
+
+    def UpdateDetectText(self, name=None, value=None):
+        bpm, confidence = wx.GetApp().GetState().get('speed_detected', (0.0, 0.0))
+        if wx.GetApp().GetSpeedDetect() and bpm:
+            value = '{:.1f} BPM ({:.0%})'.format(bpm, confidence)
+        else:
+            value = ''
+        if self._detect_text.GetLabel() != value:
+            self._detect_text.SetLabel(value)
+
+    def OnLockCheck(self, event):
+        wx.GetApp().SetSpeedLock(event.IsChecked())
+
+    def UpdateLockText(self, name=None, value=None):
+        locked, phase_error, mean_error = wx.GetApp().GetState().get('speed_lock_status', (False, 0.0, 0.0))
+        if wx.GetApp().GetSpeedLock() and mean_error:
+            value = '{:+.0f} ms ({})'.format(phase_error * 1000, 'locked' if locked else 'searching')
+        else:
+            value = ''
+        if self._lock_text.GetLabel() != value:
+            self._lock_text.SetLabel(value)
+
 
 class StrengthPanel(wx.Panel):
 
@@ -236,11 +305,39 @@ class StrengthPanel(wx.Panel):
         lpf_sizer.Add(lpf_spinner, 0, wx.ALL, 0)
         lpf_hz_label = wx.StaticText(self, wx.ID_ANY, 'Hz')
         lpf_sizer.Add(lpf_hz_label, 0, wx.LEFT, 4)
+        self._lpf_spinner = lpf_spinner
         gbsizer.Add(lpf_sizer, (0, 1), (1, 1), wx.ALL, 0)
 
+        # Single low-pass band or multi-band crossover bank.
+        bands_label = wx.StaticText(self, wx.ID_ANY, 'Bands:')
+        gbsizer.Add(bands_label, (1, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        bands_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        bands_choice = wx.Choice(self, wx.ID_ANY, choices=['Single', 'Multi-Band'])
+        bands_choice.SetSelection(1 if wx.GetApp().GetStrengthMultiBand() else 0)
+        self.Bind(wx.EVT_CHOICE, self.OnBandsChoice, bands_choice)
+        bands_sizer.Add(bands_choice, 0, wx.ALL, 0)
+        crossovers_value = wx.GetApp().GetStrengthCrossovers()
+        crossovers_text = wx.TextCtrl(self, wx.ID_ANY, size=(110, -1), value=crossovers_value)
+        crossovers_text.SetToolTip('Crossover frequencies in Hz (comma separated)')
+        self.Bind(wx.EVT_TEXT, self.OnCrossoversText, crossovers_text)
+        self._crossovers_text = crossovers_text
+        bands_sizer.Add(crossovers_text, 0, wx.LEFT, 4)
+        crossovers_hz_label = wx.StaticText(self, wx.ID_ANY, 'Hz')
+        bands_sizer.Add(crossovers_hz_label, 0, wx.LEFT, 4)
+        gbsizer.Add(bands_sizer, (1, 1), (1, 1), wx.ALL, 0)
+
+        # Band detector: pyo filter chain or Goertzel (sliding DFT) bank.
+        backend_label = wx.StaticText(self, wx.ID_ANY, 'Detector:')
+        gbsizer.Add(backend_label, (2, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        backend_choice = wx.Choice(self, wx.ID_ANY, choices=['Filters', 'Goertzel'])
+        backend_choice.SetSelection(1 if wx.GetApp().GetStrengthBackend() == 'goertzel' else 0)
+        backend_choice.SetToolTip('Goertzel tracks bands with lower latency on the higher frequencies')
+        self.Bind(wx.EVT_CHOICE, self.OnBackendChoice, backend_choice)
+        gbsizer.Add(backend_choice, (2, 1), (1, 1), wx.ALL, 0)
+
         # Attack settings (rise time of follower).
         attack_label = wx.StaticText(self, wx.ID_ANY, 'Attack:')
-        gbsizer.Add(attack_label, (1, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        gbsizer.Add(attack_label, (3, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
         attack_sizer = wx.BoxSizer(wx.HORIZONTAL)
         attack_value = wx.GetApp().GetStrengthAttack()
         attack_spinner = wx.SpinCtrlDouble(self, wx.ID_ANY, size=(80, -1), value=str(attack_value), min=0.0, max=10.0, inc=0.1)
@@ -251,11 +348,11 @@ class StrengthPanel(wx.Panel):
         attack_sizer.Add(attack_spinner, 0, wx.ALL, 0)
         attack_seconds_label = wx.StaticText(self, wx.ID_ANY, 'sec')
         attack_sizer.Add(attack_seconds_label, 0, wx.LEFT, 4)
-        gbsizer.Add(attack_sizer, (1, 1), (1, 1), wx.ALL, 0)
+        gbsizer.Add(attack_sizer, (3, 1), (1, 1), wx.ALL, 0)
 
         # Release settings (fall time of follower).
         release_label = wx.StaticText(self, wx.ID_ANY, 'Release:')
-        gbsizer.Add(release_label, (2, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        gbsizer.Add(release_label, (4, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
         release_sizer = wx.BoxSizer(wx.HORIZONTAL)
         release_value = str(wx.GetApp().GetStrengthRelease())
         release_spinner = wx.SpinCtrlDouble(self, wx.ID_ANY, size=(80, -1), value=release_value, min=0.0, max=10.0, inc=0.1)
@@ -264,11 +361,11 @@ class StrengthPanel(wx.Panel):
         release_sizer.Add(release_spinner, 0, wx.ALL, 0)
         release_seconds_label = wx.StaticText(self, wx.ID_ANY, 'sec')
         release_sizer.Add(release_seconds_label, 0, wx.LEFT, 4)
-        gbsizer.Add(release_sizer, (2, 1), (1, 1), wx.ALL, 0)
+        gbsizer.Add(release_sizer, (4, 1), (1, 1), wx.ALL, 0)
 
         # Min SPL to velocity association.
         min_label = wx.StaticText(self, wx.ID_ANY, 'Minimum:')
-        gbsizer.Add(min_label, (3, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        gbsizer.Add(min_label, (5, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
         min_sizer = wx.BoxSizer(wx.HORIZONTAL)
         min_spl_value = str(wx.GetApp().GetStrengthMinSPL())
         min_spl_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(70, -1), value=min_spl_value, min=-120, max=0)
@@ -280,11 +377,11 @@ class StrengthPanel(wx.Panel):
         min_velo_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(60, -1), value=min_velo_value, min=0, max=127)
         self.Bind(wx.EVT_TEXT, self.OnMinVelocitySpinner, min_velo_spinner)
         min_sizer.Add(min_velo_spinner, 0, wx.ALL, 0)
-        gbsizer.Add(min_sizer, (3, 1), (1, 1), wx.ALL, 0)
+        gbsizer.Add(min_sizer, (5, 1), (1, 1), wx.ALL, 0)
 
         # Max SPL to velocity association.
         max_label = wx.StaticText(self, wx.ID_ANY, 'Maximum:')
-        gbsizer.Add(max_label, (4, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        gbsizer.Add(max_label, (6, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
         max_sizer = wx.BoxSizer(wx.HORIZONTAL)
         max_spl_value = str(wx.GetApp().GetStrengthMaxSPL())
         max_spl_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(70, -1), value=max_spl_value, min=-120, max=0)
@@ -296,19 +393,61 @@ class StrengthPanel(wx.Panel):
         max_velo_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(60, -1), value=max_velo_value, min=0, max=127)
         self.Bind(wx.EVT_TEXT, self.OnMaxVelocitySpinner, max_velo_spinner)
         max_sizer.Add(max_velo_spinner, 0, wx.ALL, 0)
-        gbsizer.Add(max_sizer, (4, 1), (1, 1), wx.ALL, 0)
+        gbsizer.Add(max_sizer, (6, 1), (1, 1), wx.ALL, 0)
+
+        # Response curve of the SPL to velocity mapping.
+        curve_label = wx.StaticText(self, wx.ID_ANY, 'Curve:')
+        gbsizer.Add(curve_label, (7, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        curve_choice = wx.Choice(self, wx.ID_ANY, choices=[x.title() for x in RESPONSE_CURVES])
+        curve_value = wx.GetApp().GetStrengthCurve()
+        curve_choice.SetSelection(RESPONSE_CURVES.index(curve_value) if curve_value in RESPONSE_CURVES else 0)
+        self.Bind(wx.EVT_CHOICE, self.OnCurveChoice, curve_choice)
+        gbsizer.Add(curve_choice, (7, 1), (1, 1), wx.ALL, 0)
+
+        # Change filter (hysteresis and maximum send rate).
+        filter_label = wx.StaticText(self, wx.ID_ANY, 'Filter:')
+        gbsizer.Add(filter_label, (8, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        filter_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        hysteresis_label = wx.StaticText(self, wx.ID_ANY, '\u00b1')
+        filter_sizer.Add(hysteresis_label, 0, wx.RIGHT, 4)
+        hysteresis_value = str(wx.GetApp().GetStrengthHysteresis())
+        hysteresis_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(60, -1), value=hysteresis_value, min=0, max=127)
+        self.Bind(wx.EVT_TEXT, self.OnHysteresisSpinner, hysteresis_spinner)
+        filter_sizer.Add(hysteresis_spinner, 0, wx.ALL, 0)
+        max_rate_label = wx.StaticText(self, wx.ID_ANY, 'max')
+        filter_sizer.Add(max_rate_label, 0, wx.LEFT | wx.RIGHT, 4)
+        max_rate_value = str(wx.GetApp().GetStrengthMaxRate())
+        max_rate_spinner = wx.SpinCtrl(self, wx.ID_ANY, size=(60, -1), value=max_rate_value, min=0, max=1000)
+        self.Bind(wx.EVT_TEXT, self.OnMaxRateSpinner, max_rate_spinner)
+        filter_sizer.Add(max_rate_spinner, 0, wx.ALL, 0)
+        max_rate_hz_label = wx.StaticText(self, wx.ID_ANY, '/sec')
+        filter_sizer.Add(max_rate_hz_label, 0, wx.LEFT, 4)
+        gbsizer.Add(filter_sizer, (8, 1), (1, 1), wx.ALL, 0)
+
+        # Periodic refresh of the current value.
+        refresh_label = wx.StaticText(self, wx.ID_ANY, 'Refresh:')
+        gbsizer.Add(refresh_label, (9, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        refresh_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        refresh_value = str(wx.GetApp().GetStrengthRefresh())
+        refresh_spinner = wx.SpinCtrlDouble(self, wx.ID_ANY, size=(80, -1), value=refresh_value, min=0.0, max=60.0, inc=0.5)
+        refresh_spinner.SetDigits(1)
+        self.Bind(wx.EVT_TEXT, self.OnRefreshSpinner, refresh_spinner)
+        refresh_sizer.Add(refresh_spinner, 0, wx.ALL, 0)
+        refresh_seconds_label = wx.StaticText(self, wx.ID_ANY, 'sec')
+        refresh_sizer.Add(refresh_seconds_label, 0, wx.LEFT, 4)
+        gbsizer.Add(refresh_sizer, (9, 1), (1, 1), wx.ALL, 0)
 
         # MIDI output selection.
         midi_label = wx.StaticText(self, wx.ID_ANY, 'MIDI Out:')
-        gbsizer.Add(midi_label, (5, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        gbsizer.Add(midi_label, (10, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
         midi_sizer = wx.BoxSizer(wx.HORIZONTAL)
         midi_text = wx.TextCtrl(self, wx.ID_ANY, value='', style=wx.TE_READONLY)
-        self.Bind(wx.EVT_UPDATE_UI, self.OnMidiTextUpdate, midi_text)
+        self._midi_text = midi_text
         midi_sizer.Add(midi_text, 0, wx.ALL, 0)
         midi_button = wx.Button(self, wx.ID_ANY, '...', style=wx.BU_EXACTFIT)
         self.Bind(wx.EVT_BUTTON, self.OnMidiButton, midi_button)
         midi_sizer.Add(midi_button, 0, wx.LEFT, 4)
-        gbsizer.Add(midi_sizer, (5, 1), (1, 1), wx.ALL, 0)
+        gbsizer.Add(midi_sizer, (10, 1), (1, 1), wx.ALL, 0)
 
         # Stregth gauge to show current velocity.
         strength_gauge = wx.lib.agw.pygauge.PyGauge(self, ID_STRENGTH_GAUGE, size=(-1, 10), style=wx.GA_HORIZONTAL)
@@ -317,11 +456,26 @@ class StrengthPanel(wx.Panel):
         strength_gauge.SetBarColor(wx.GREEN)
         strength_gauge.SetBackgroundColour(wx.WHITE)
         strength_gauge.SetBorderColor(wx.BLACK)
-        gbsizer.Add(strength_gauge, (6, 1), (1, 1), wx.EXPAND | wx.ALL, 0)
+        gbsizer.Add(strength_gauge, (11, 1), (1, 1), wx.EXPAND | wx.ALL, 0)
+
+        # Counts of messages sent and suppressed by the change filter.
+        counts_text = wx.StaticText(self, wx.ID_ANY, '', style=wx.ST_NO_AUTORESIZE)
+        counts_text.SetFont(counts_text.GetFont().MakeSmaller())
+        self._counts_text = counts_text
+        gbsizer.Add(counts_text, (12, 1), (1, 1), wx.EXPAND | wx.ALL, 0)
 
         sizer.Add(gbsizer, 1, wx.EXPAND | wx.ALL, 8)
         self.SetSizerAndFit(sizer)
 
+        app = wx.GetApp()
+        app.Subscribe(self, self.UpdateBands, 'strength_multiband')
+        app.Subscribe(self, self.UpdateCountsText, 'strength_counts')
+        app.Subscribe(self, self.UpdateMidiText, 'strength_multiband', 'strength_crossovers', 'strength_midi_output',
+                      'strength_band_midi_outputs')
+        self.UpdateBands()
+        self.UpdateCountsText()
+        self.UpdateMidiText()
+
     def OnEnabledCheck(self, event):
         wx.GetApp().SetStrengthEnabled(event.IsChecked())
 
@@ -331,6 +485,20 @@ class StrengthPanel(wx.Panel):
     def OnLPFSpinner(self, event):
         wx.GetApp().SetStrengthLPF(event.GetEventObject().GetValue())
 
+    def UpdateBands(self, name=None, value=None):
+        multiband = wx.GetApp().GetStrengthMultiBand()
+        self._lpf_spinner.Enable(not multiband)
+        self._crossovers_text.Enable(multiband)
+
+    def OnBandsChoice(self, event):
+        wx.GetApp().SetStrengthMultiBand(event.GetEventObject().GetSelection() == 1)
+
+    def OnBackendChoice(self, event):
+        wx.GetApp().SetStrengthBackend('goertzel' if event.GetEventObject().GetSelection() == 1 else 'filters')
+
+    def OnCrossoversText(self, event):
+        wx.GetApp().SetStrengthCrossovers(event.GetEventObject().GetValue())
+
     def OnAttackSpinner(self, event):
         wx.GetApp().SetStrengthAttack(event.GetEventObject().GetValue())
 
@@ -349,32 +517,73 @@ class StrengthPanel(wx.Panel):
     def OnMaxVelocitySpinner(self, event):
         wx.GetApp().SetStrengthMaxVelocity(event.GetEventObject().GetValue())
 
+    def OnCurveChoice(self, event):
+        wx.GetApp().SetStrengthCurve(RESPONSE_CURVES[event.GetEventObject().GetSelection()])
+
+    def OnHysteresisSpinner(self, event):
+        wx.GetApp().SetStrengthHysteresis(event.GetEventObject().GetValue())
+
+    def OnMaxRateSpinner(self, event):
+        wx.GetApp().SetStrengthMaxRate(event.GetEventObject().GetValue())
+
+    def OnRefreshSpinner(self, event):
+        wx.GetApp().SetStrengthRefresh(event.GetEventObject().GetValue())
+
+    def UpdateCountsText(self, name=None, value=None):
+        sent, suppressed = wx.GetApp().GetState().get('strength_counts', (0, 0))
+        value = 'Sent {} / Suppressed {}'.format(sent, suppressed)
+        if self._counts_text.GetLabel() != value:
+            self._counts_text.SetLabel(value)
+
+    def GetBandNames(self):
+        crossovers = sorted(set(wx.GetApp().GetStrengthCrossoverList()))[:MultiBandAnalyzer.MAX_BANDS - 1]
+        edges = [None] + crossovers + [None]
+        names = []
+        for low, high in zip(edges, edges[1:]):
+            if low is None:
+                names.append('< {} Hz'.format(high))
+            elif high is None:
+                names.append('> {} Hz'.format(low))
+            else:
+                names.append('{}-{} Hz'.format(low, high))
+        return names
+
     def OnMidiButton(self, event):
+        app = wx.GetApp()
+        band = None
+        if app.GetStrengthMultiBand():
+            names = self.GetBandNames()
+            outputs = app.GetStrengthBandMidiOutputList(len(names))
+            choices = ['{}: {}'.format(name, midi_output_label(output) or '-') for name, output in zip(names, outputs)]
+            dialog = wx.SingleChoiceDialog(self, 'Select a band:', 'MIDI Output', choices)
+            result = dialog.ShowModal()
+            band = dialog.GetSelection()
+            dialog.Destroy()
+            if result != wx.ID_OK:
+                return
         dialog = MidiCommandDialog(self, wx.ID_ANY, 'MIDI Output')
-        dialog.SetValue(wx.GetApp().GetStrengthMidiOutput())
+        if band is None:
+            dialog.SetValue(app.GetStrengthMidiOutput())
+        else:
+            dialog.SetValue(app.GetStrengthBandMidiOutputList(band + 1)[band])
         dialog.CenterOnScreen()
         result = dialog.ShowModal()
         if result == wx.ID_OK:
-            wx.GetApp().SetStrengthMidiOutput(dialog.GetValue())
+            if band is None:
+                app.SetStrengthMidiOutput(dialog.GetValue())
+            else:
+                app.SetStrengthBandMidiOutput(band, dialog.GetValue())
         dialog.Destroy()
 
-    def OnMidiTextUpdate(self, event):
-        midi_output = wx.GetApp().GetStrengthMidiOutput()
-        command = midi_output & 0xf000
-        channel = ((midi_output & 0x0f00) >> 16) + 1
-        data = midi_output & 0x7f
-        if command == 0x9000:
-            value = 'Ch{} {} On'.format(channel, int_to_midi_note(data))
-        elif command == 0x8000:
-            value = 'Ch{} {} Off'.format(channel, int_to_midi_note(data))
-        elif command == 0xb000:
-            value = 'Ch{} CC {}'.format(channel, data)
-        elif command == 0xc000:
-            value = 'Ch{} PC {}'.format(channel, data)
+    def UpdateMidiText(self, name=None, value=None):
+        app = wx.GetApp()
+        if app.GetStrengthMultiBand():
+            outputs = app.GetStrengthBandMidiOutputList(len(self.GetBandNames()))
+            value = ', '.join(midi_output_label(output) or '-' for output in outputs)
         else:
-            value = ''
-        midi_text = event.GetEventObject()
-        midi_text.SetValue(value)
+            value = midi_output_label(app.GetStrengthMidiOutput())
+        if self._midi_text.GetValue() != value:
+            self._midi_text.SetValue(value)
 
 
 class StylePanel(wx.Panel):
@@ -392,6 +601,8 @@ class StylePanel(wx.Panel):
         enabled_label = wx.StaticText(self, wx.ID_ANY, 'Enabled:')
         header_sizer.Add(enabled_label, 0, wx.ALIGN_BOTTOM | wx.LEFT, 4)
         enabled_checkbox = wx.CheckBox(self, wx.ID_ANY, '')
+        enabled_checkbox.SetValue(wx.GetApp().GetStyleEnabled())
+        self.Bind(wx.EVT_CHECKBOX, self.OnEnabledCheck, enabled_checkbox)
         header_sizer.Add(enabled_checkbox, 0, wx.ALIGN_BOTTOM | wx.LEFT, 4)
         sizer.Add(header_sizer, 0, wx.EXPAND | wx.ALL, 4)
 
@@ -401,12 +612,171 @@ class StylePanel(wx.Panel):
         spacer_panel.SetBackgroundColour(COLOR_LINES)
         sizer.Add(spacer_panel, 0, wx.EXPAND | wx.ALL, 4)
 
-        sizer.AddStretchSpacer(1)
+        # Sizer for controls.
+        gbsizer = wx.GridBagSizer(8, 8)
+        gbsizer.SetCols(2)
+        gbsizer.AddGrowableCol(0)
+        gbsizer.AddGrowableCol(1)
+
+        # Currently detected chord.
+        chord_label = wx.StaticText(self, wx.ID_ANY, 'Chord:')
+        gbsizer.Add(chord_label, (0, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        chord_text = wx.StaticText(self, wx.ID_ANY, '', size=(80, -1), style=wx.ST_NO_AUTORESIZE)
+        chord_text.SetFont(chord_text.GetFont().Scale(1.2).MakeBold())
+        self._chord_text = chord_text
+        gbsizer.Add(chord_text, (0, 1), (1, 1), wx.ALL, 0)
+
+        # MIDI output selection for chords.
+        chord_midi_label = wx.StaticText(self, wx.ID_ANY, 'MIDI Out:')
+        gbsizer.Add(chord_midi_label, (1, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        chord_midi_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        chord_midi_text = wx.TextCtrl(self, wx.ID_ANY, value='', style=wx.TE_READONLY)
+        self._chord_midi_text = chord_midi_text
+        chord_midi_sizer.Add(chord_midi_text, 0, wx.ALL, 0)
+        chord_midi_button = wx.Button(self, wx.ID_ANY, '...', style=wx.BU_EXACTFIT)
+        self.Bind(wx.EVT_BUTTON, self.OnChordMidiButton, chord_midi_button)
+        chord_midi_sizer.Add(chord_midi_button, 0, wx.LEFT, 4)
+        gbsizer.Add(chord_midi_sizer, (1, 1), (1, 1), wx.ALL, 0)
+
+        # Currently detected key and its confidence.
+        key_label = wx.StaticText(self, wx.ID_ANY, 'Key:')
+        gbsizer.Add(key_label, (2, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        key_text = wx.StaticText(self, wx.ID_ANY, '', size=(120, -1), style=wx.ST_NO_AUTORESIZE)
+        self._key_text = key_text
+        gbsizer.Add(key_text, (2, 1), (1, 1), wx.ALL, 0)
+
+        # MIDI output selection for keys.
+        key_midi_label = wx.StaticText(self, wx.ID_ANY, 'MIDI Out:')
+        gbsizer.Add(key_midi_label, (3, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+        key_midi_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        key_midi_text = wx.TextCtrl(self, wx.ID_ANY, value='', style=wx.TE_READONLY)
+        self._key_midi_text = key_midi_text
+        key_midi_sizer.Add(key_midi_text, 0, wx.ALL, 0)
+        key_midi_button = wx.Button(self, wx.ID_ANY, '...', style=wx.BU_EXACTFIT)
+        self.Bind(wx.EVT_BUTTON, self.OnKeyMidiButton, key_midi_button)
+        key_midi_sizer.Add(key_midi_button, 0, wx.LEFT, 4)
+        gbsizer.Add(key_midi_sizer, (3, 1), (1, 1), wx.ALL, 0)
+
+        # Spectral descriptors, each with its own MIDI output.
+        self._descriptor_texts = {}
+        self._descriptor_midi_texts = {}
+        for row, name in enumerate(SPECTRAL_DESCRIPTORS, 4):
+            descriptor_label = wx.StaticText(self, wx.ID_ANY, '{}:'.format(name.title()))
+            gbsizer.Add(descriptor_label, (row, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT, 0)
+            descriptor_sizer = wx.BoxSizer(wx.HORIZONTAL)
+            descriptor_text = wx.StaticText(self, wx.ID_ANY, '', size=(70, -1), style=wx.ST_NO_AUTORESIZE)
+            descriptor_text.SetName(name)
+            self._descriptor_texts[name] = descriptor_text
+            descriptor_sizer.Add(descriptor_text, 0, wx.ALL, 0)
+            descriptor_midi_text = wx.TextCtrl(self, wx.ID_ANY, value='', style=wx.TE_READONLY)
+            descriptor_midi_text.SetName(name)
+            self._descriptor_midi_texts['style_{}_midi_output'.format(name)] = descriptor_midi_text
+            descriptor_sizer.Add(descriptor_midi_text, 0, wx.LEFT, 4)
+            descriptor_midi_button = wx.Button(self, wx.ID_ANY, '...', style=wx.BU_EXACTFIT)
+            descriptor_midi_button.SetName(name)
+            self.Bind(wx.EVT_BUTTON, self.OnDescriptorMidiButton, descriptor_midi_button)
+            descriptor_sizer.Add(descriptor_midi_button, 0, wx.LEFT, 4)
+            gbsizer.Add(descriptor_sizer, (row, 1), (1, 1), wx.ALL, 0)
+
+        sizer.Add(gbsizer, 1, wx.EXPAND | wx.ALL, 8)
         self.SetSizerAndFit(sizer)
 
+        app = wx.GetApp()
+        app.Subscribe(self, self.UpdateChordText, 'style_chord')
+        app.Subscribe(self, self.UpdateChordMidiText, 'style_chord_midi_output')
+        app.Subscribe(self, self.UpdateKeyText, 'style_key')
+        app.Subscribe(self, self.UpdateKeyMidiText, 'style_key_midi_output')
+        app.Subscribe(self, self.UpdateDescriptorTexts, 'style_descriptors')
+        app.Subscribe(self, self.UpdateDescriptorMidiText, *self._descriptor_midi_texts)
+        self.UpdateChordText()
+        self.UpdateChordMidiText()
+        self.UpdateKeyText()
+        self.UpdateKeyMidiText()
+        self.UpdateDescriptorTexts()
+        for name in self._descriptor_midi_texts:
+            self.UpdateDescriptorMidiText(name)
+
+    def OnEnabledCheck(self, event):
+        wx.GetApp().SetStyleEnabled(event.IsChecked())
+
+    def UpdateChordText(self, name=None, value=None):
+        value = chord_name(*wx.GetApp().GetState().get('style_chord', (None, None)))
+        if self._chord_text.GetLabel() != value:
+            self._chord_text.SetLabel(value)
+
+    def OnChordMidiButton(self, event):
+        dialog = MidiCommandDialog(self, wx.ID_ANY, 'MIDI Output')
+        dialog.SetValue(wx.GetApp().GetStyleChordMidiOutput())
+        dialog.CenterOnScreen()
+        result = dialog.ShowModal()
+        if result == wx.ID_OK:
+            wx.GetApp().SetStyleChordMidiOutput(dialog.GetValue())
+        dialog.Destroy()
+
+    def UpdateChordMidiText(self, name=None, value=None):
+        value = midi_output_label(wx.GetApp().GetStyleChordMidiOutput())
+        if self._chord_midi_text.GetValue() != value:
+            self._chord_midi_text.SetValue(value)
+
+    def UpdateKeyText(self, name=None, value=None):
+        tonic, mode, confidence = wx.GetApp().GetState().get('style_key', (None, None, 0.0))
+        if tonic is None:
+            value = ''
+        else:
+            value = '{} {} ({:.0%})'.format(NOTES[tonic], mode, confidence)
+        if self._key_text.GetLabel() != value:
+            self._key_text.SetLabel(value)
+
+    def OnKeyMidiButton(self, event):
+        dialog = MidiCommandDialog(self, wx.ID_ANY, 'MIDI Output')
+        dialog.SetValue(wx.GetApp().GetStyleKeyMidiOutput())
+        dialog.CenterOnScreen()
+        result = dialog.ShowModal()
+        if result == wx.ID_OK:
+            wx.GetApp().SetStyleKeyMidiOutput(dialog.GetValue())
+        dialog.Destroy()
+
+    def UpdateKeyMidiText(self, name=None, value=None):
+        value = midi_output_label(wx.GetApp().GetStyleKeyMidiOutput())
+        if self._key_midi_text.GetValue() != value:
+            self._key_midi_text.SetValue(value)
+
+    def UpdateDescriptorTexts(self, name=None, value=None):
+        values = wx.GetApp().GetState().get('style_descriptors', {})
+        for descriptor, descriptor_text in self._descriptor_texts.items():
+            label = values.get(descriptor)
+            if label is None:
+                label = ''
+            elif descriptor == 'flatness':
+                label = '{:.2f}'.format(label)
+            else:
+                label = '{:.0f} Hz'.format(label)
+            if descriptor_text.GetLabel() != label:
+                descriptor_text.SetLabel(label)
+
+    def OnDescriptorMidiButton(self, event):
+        name = event.GetEventObject().GetName()
+        dialog = MidiCommandDialog(self, wx.ID_ANY, 'MIDI Output')
+        dialog.SetValue(wx.GetApp().GetStyleDescriptorMidiOutput(name))
+        dialog.CenterOnScreen()
+        result = dialog.ShowModal()
+        if result == wx.ID_OK:
+            wx.GetApp().SetStyleDescriptorMidiOutput(name, dialog.GetValue())
+        dialog.Destroy()
+
+    def UpdateDescriptorMidiText(self, name, value=None):
+        # Called with the setting name, style_<descriptor>_midi_output.
+        midi_text = self._descriptor_midi_texts[name]
+        value = midi_output_label(wx.GetApp().GetStyleDescriptorMidiOutput(midi_text.GetName()))
+        if midi_text.GetValue() != value:
+            midi_text.SetValue(value)
+
 
 class SetupPanel(wx.Panel):
 
+    BUFFER_SIZES = [32, 64, 128, 256, 512, 1024, 2048]
+    SAMPLING_RATES = [44100, 48000, 88200, 96000]
+
     def __init__(self, *args, **kwargs):
         super(SetupPanel, self).__init__(*args, **kwargs)
         self.SetBackgroundColour(COLOR_BACKGROUND)
@@ -417,8 +787,6 @@ class SetupPanel(wx.Panel):
         header_text.SetFont(header_text.GetFont().Scale(1.2).MakeBold())
         sizer.Add(header_text, 0, wx.EXPAND | wx.ALL, 4)
 
-        wx.GetApp().RefreshAudioMidiIO()  # FIXME: Do periodically?
-
         gbsizer = wx.GridBagSizer(8, 8)
         gbsizer.SetCols(4)
         gbsizer.AddGrowableCol(0)
@@ -429,12 +797,10 @@ class SetupPanel(wx.Panel):
         gbsizer.Add(audio_input_label, (0, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
 
         # Dropdown select for audio input source.
-        audio_input_choices = self.GetAudioInputChoices()
-        audio_input_select = wx.Choice(self, wx.ID_ANY, choices=[x[1] for x in audio_input_choices])
-        audio_input_selection = self.GetAudioInputSelection()
-        audio_input_select.SetSelection(audio_input_selection)
+        # Filled in once the devices have been enumerated.
+        audio_input_select = wx.Choice(self, wx.ID_ANY)
         self.Bind(wx.EVT_CHOICE, self.OnChangeAudioInputSelect, audio_input_select)
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateAudioInputSelect, audio_input_select)
+        self._audio_input_select = audio_input_select
         gbsizer.Add(audio_input_select, (0, 1), (1, 1), wx.TOP | wx.EXPAND, 0)
 
         # Label for audio channel selection.
@@ -443,19 +809,18 @@ class SetupPanel(wx.Panel):
 
         # Row of checkboxes for audio channel selection.
         grid_sizer = wx.GridSizer(2, 0, 0, 0)
-        audio_input_channels_selection = self.GetAudioInputChannelsSelection()
+        self._audio_channel_check_boxes = []
+        self._audio_channel_labels = []
         for n in range(8):
             check_box = wx.CheckBox(self, wx.ID_ANY, name='accb_{}'.format(n))
-            if n in audio_input_channels_selection:
-                check_box.SetValue(True)
             grid_sizer.Add(check_box, 1, wx.ALIGN_CENTER | wx.ALL, 0)
-            self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateAudioInputChannel, check_box)
             self.Bind(wx.EVT_CHECKBOX, self.OnCheckAudioInputChannel, check_box)
+            self._audio_channel_check_boxes.append(check_box)
         for n in range(8):
             static_text = wx.StaticText(self, wx.ID_ANY, '{} '.format(n + 1), name='aclb_{}'.format(n))
             static_text.SetFont(static_text.GetFont().MakeSmaller())
             grid_sizer.Add(static_text, 1, wx.ALIGN_CENTER | wx.ALL, 0)
-            self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateAudioInputChannel, static_text)
+            self._audio_channel_labels.append(static_text)
         gbsizer.Add(grid_sizer, (1, 1), (1, 1), wx.TOP | wx.EXPAND, 0)
 
         # Label for midi input selection.
@@ -463,12 +828,10 @@ class SetupPanel(wx.Panel):
         gbsizer.Add(midi_input_label, (0, 2), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
 
         # Dropdown select for midi input source.
-        midi_input_choices = self.GetMidiInputChoices()
-        midi_input_select = wx.Choice(self, wx.ID_ANY, choices=[x[1] for x in midi_input_choices])
-        midi_input_selection = self.GetMidiInputSelection()
-        midi_input_select.SetSelection(midi_input_selection)
+        # Filled in once the devices have been enumerated.
+        midi_input_select = wx.Choice(self, wx.ID_ANY)
         self.Bind(wx.EVT_CHOICE, self.OnChangeMidiInputSelect, midi_input_select)
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateMidiInputSelect, midi_input_select)
+        self._midi_input_select = midi_input_select
         gbsizer.Add(midi_input_select, (0, 3), (1, 1), wx.TOP | wx.EXPAND, 0)
 
         # Label for midi output selection.
@@ -476,19 +839,131 @@ class SetupPanel(wx.Panel):
         gbsizer.Add(midi_output_label, (1, 2), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
 
         # Dropdown select for midi output device.
-        midi_output_choices = self.GetMidiOutputChoices()
-        midi_output_select = wx.Choice(self, wx.ID_ANY, choices=[x[1] for x in midi_output_choices])
-        midi_output_selection = self.GetMidiOutputSelection()
-        midi_output_select.SetSelection(midi_output_selection)
+        # Filled in once the devices have been enumerated.
+        midi_output_select = wx.Choice(self, wx.ID_ANY)
         self.Bind(wx.EVT_CHOICE, self.OnChangeMidiOutputSelect, midi_output_select)
-        self.Bind(wx.EVT_UPDATE_UI, self.OnUpdateMidiOutputSelect, midi_output_select)
+        self._midi_output_select = midi_output_select
         gbsizer.Add(midi_output_select, (1, 3), (1, 1), wx.TOP | wx.EXPAND, 0)
 
+        # Latency profile (server buffer size) selection.
+        latency_label = wx.StaticText(self, wx.ID_ANY, 'Latency:')
+        gbsizer.Add(latency_label, (2, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
+        latency_choices = ['{} ({})'.format(name.title(), size) for name, size in LATENCY_PROFILES.items()]
+        latency_select = wx.Choice(self, wx.ID_ANY, choices=latency_choices + ['Custom'])
+        latency_select.SetSelection(self.GetLatencyProfileSelection())
+        self.Bind(wx.EVT_CHOICE, self.OnChangeLatencySelect, latency_select)
+        gbsizer.Add(latency_select, (2, 1), (1, 1), wx.TOP | wx.EXPAND, 0)
+
+        # Buffer size for the custom latency profile.
+        buffer_size_label = wx.StaticText(self, wx.ID_ANY, 'Buffer Size:')
+        gbsizer.Add(buffer_size_label, (2, 2), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
+        buffer_size_select = wx.Choice(self, wx.ID_ANY, choices=[str(n) for n in self.BUFFER_SIZES])
+        self.Bind(wx.EVT_CHOICE, self.OnChangeBufferSizeSelect, buffer_size_select)
+        self._buffer_size_select = buffer_size_select
+        gbsizer.Add(buffer_size_select, (2, 3), (1, 1), wx.TOP | wx.EXPAND, 0)
+
+        # Sampling rate selection.
+        sampling_rate_label = wx.StaticText(self, wx.ID_ANY, 'Sample Rate:')
+        gbsizer.Add(sampling_rate_label, (3, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
+        sampling_rate_select = wx.Choice(self, wx.ID_ANY, choices=['{} Hz'.format(n) for n in self.SAMPLING_RATES])
+        sampling_rate_value = wx.GetApp().GetAudioSamplingRate()
+        if sampling_rate_value in self.SAMPLING_RATES:
+            sampling_rate_select.SetSelection(self.SAMPLING_RATES.index(sampling_rate_value))
+        self.Bind(wx.EVT_CHOICE, self.OnChangeSamplingRateSelect, sampling_rate_select)
+        gbsizer.Add(sampling_rate_select, (3, 1), (1, 1), wx.TOP | wx.EXPAND, 0)
+
+        # Keep the (always opened) output stream to a single channel.
+        input_only_checkbox = wx.CheckBox(self, wx.ID_ANY, 'Input Only')
+        input_only_checkbox.SetValue(wx.GetApp().GetAudioInputOnly())
+        input_only_checkbox.SetToolTip('Open a single output channel only')
+        self.Bind(wx.EVT_CHECKBOX, self.OnCheckInputOnly, input_only_checkbox)
+        gbsizer.Add(input_only_checkbox, (3, 3), (1, 1), wx.TOP | wx.EXPAND, 0)
+
+        # Measured block period and estimated round trip latency.
+        measured_label = wx.StaticText(self, wx.ID_ANY, 'Measured:')
+        gbsizer.Add(measured_label, (4, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
+        measured_text = wx.StaticText(self, wx.ID_ANY, '-')
+        self._measured_text = measured_text
+        gbsizer.Add(measured_text, (4, 1), (1, 3), wx.TOP | wx.EXPAND, 0)
+
+        # How the last audio settings change was applied.
+        change_label = wx.StaticText(self, wx.ID_ANY, 'Last Change:')
+        gbsizer.Add(change_label, (5, 0), (1, 1), wx.ALL | wx.ALIGN_RIGHT | wx.ALIGN_CENTER_VERTICAL, 0)
+        change_text = wx.StaticText(self, wx.ID_ANY, '-')
+        self._change_text = change_text
+        gbsizer.Add(change_text, (5, 1), (1, 3), wx.TOP | wx.EXPAND, 0)
+
         sizer.Add(gbsizer, 1, wx.ALIGN_CENTER | wx.ALL, 8)
         self.SetSizerAndFit(sizer)
 
+        app = wx.GetApp()
+        app.Subscribe(self, self.UpdateAudioInput, 'audio_inputs', 'audio_input', 'audio_input_channels')
+        app.Subscribe(self, self.UpdateMidiInputSelect, 'midi_inputs', 'midi_input')
+        app.Subscribe(self, self.UpdateMidiOutputSelect, 'midi_outputs', 'midi_output')
+        app.Subscribe(self, self.UpdateBufferSizeSelect, 'audio_latency_profile', 'audio_buffer_size')
+        app.Subscribe(self, self.UpdateMeasuredText, 'audio_latency')
+        app.Subscribe(self, self.UpdateChangeText, 'audio_reconfiguration')
+        self.UpdateAudioInput()
+        self.UpdateMidiInputSelect()
+        self.UpdateMidiOutputSelect()
+        self.UpdateBufferSizeSelect()
+        self.UpdateMeasuredText()
+        self.UpdateChangeText()
+
+    def GetLatencyProfileSelection(self):
+        profiles = list(LATENCY_PROFILES)
+        profile = wx.GetApp().GetAudioLatencyProfile()
+        return profiles.index(profile) if profile in profiles else len(profiles)
+
+    def OnChangeLatencySelect(self, event):
+        profiles = list(LATENCY_PROFILES) + ['custom']
+        wx.GetApp().SetAudioLatencyProfile(profiles[event.GetEventObject().GetSelection()])
+
+    def OnChangeBufferSizeSelect(self, event):
+        wx.GetApp().SetAudioBufferSize(self.BUFFER_SIZES[event.GetEventObject().GetSelection()])
+
+    def UpdateBufferSizeSelect(self, name=None, value=None):
+        buffer_size_select = self._buffer_size_select
+        buffer_size = wx.GetApp().GetAudioServerBufferSize()
+        if buffer_size in self.BUFFER_SIZES and buffer_size_select.GetSelection() != self.BUFFER_SIZES.index(buffer_size):
+            buffer_size_select.SetSelection(self.BUFFER_SIZES.index(buffer_size))
+        buffer_size_select.Enable(wx.GetApp().GetAudioLatencyProfile() not in LATENCY_PROFILES)
+
+    def OnChangeSamplingRateSelect(self, event):
+        wx.GetApp().SetAudioSamplingRate(self.SAMPLING_RATES[event.GetEventObject().GetSelection()])
+
+    def OnCheckInputOnly(self, event):
+        wx.GetApp().SetAudioInputOnly(event.IsChecked())
+
+    def UpdateMeasuredText(self, name=None, value=None):
+        latency = wx.GetApp().GetState().get('audio_latency')
+        if latency:
+            label = '{:.1f} ms blocks, ~{:.1f} ms round trip ({:.1f} ms jitter)'.format(
+                *[value * 1000.0 for value in latency])
+        else:
+            label = '-'
+        if self._measured_text.GetLabel() != label:
+            self._measured_text.SetLabel(label)
+
+    def UpdateChangeText(self, name=None, value=None):
+        path, changed, gap = wx.GetApp().GetState().get('audio_reconfiguration', ('none', [], 0.0))
+        label = {'none': 'No change', 'repatch': 'Re-patched', 'restart': 'Restarted'}.get(path, path)
+        if changed:
+            label += ' ({})'.format(', '.join(name.replace('_', ' ') for name in changed))
+        if gap is None:
+            label += ', restarting...'
+        elif gap:
+            label += ', {} without audio'.format(duration_label(gap))
+        if self._change_text.GetLabel() != label:
+            self._change_text.SetLabel(label)
+
+    def GetDevices(self, kind):
+        # As last published by the app; empty until the first enumeration
+        # (asking the device registry here would start it before the frame).
+        return wx.GetApp().GetState().get(kind, {})
+
     def GetAudioInputChoices(self):
-        audio_inputs = wx.GetApp().GetAudioInputs()
+        audio_inputs = self.GetDevices('audio_inputs')
         choices = [(-1, '(No Audio Input)')]
         for input_index, input_details in sorted(audio_inputs.items()):
             input_default = 'default, ' if input_details['default'] else ''
@@ -500,7 +975,7 @@ class SetupPanel(wx.Panel):
         audio_input = wx.GetApp().GetAudioInput()
         if audio_input == -1:
             return 0
-        audio_inputs = wx.GetApp().GetAudioInputs()
+        audio_inputs = self.GetDevices('audio_inputs')
         audio_input_selection = wx.NOT_FOUND
         for n, (input_index, input_details) in enumerate(sorted(audio_inputs.items())):
             if input_index == audio_input or (input_details['default'] and audio_input < 0):
@@ -514,7 +989,7 @@ class SetupPanel(wx.Panel):
         if audio_input_selection == 0:
             wx.GetApp().SetAudioInput(-1)
             return
-        audio_inputs = wx.GetApp().GetAudioInputs()
+        audio_inputs = self.GetDevices('audio_inputs')
         audio_input = wx.GetApp().GetAudioInput()
         for n, (input_index, input_details) in enumerate(sorted(audio_inputs.items())):
             if (n + 1) == audio_input_selection and input_index != audio_input:
@@ -527,11 +1002,36 @@ class SetupPanel(wx.Panel):
         # if not self.GetAudioInputChannelsSelection():
         #     self.SetAudioInputChannelsSelection(range(self.GetAudioInputMaxChannels()))
 
-    def OnUpdateAudioInputSelect(self, event):
-        event.Enable(self.GetAudioInputSelection() != wx.NOT_FOUND)
+    def UpdateAudioInput(self, name=None, value=None):
+        # The input select and the channel checkboxes below it depend on the
+        # same devices and settings; work out the selection once for all.
+        audio_input_select = self._audio_input_select
+        audio_input_labels = [x[1] for x in self.GetAudioInputChoices()]
+        if audio_input_select.GetItems() != audio_input_labels:
+            audio_input_select.Set(audio_input_labels)
+        audio_input_selection = self.GetAudioInputSelection()
+        if audio_input_select.GetSelection() != audio_input_selection:
+            audio_input_select.SetSelection(audio_input_selection)
+        audio_input_select.Enable(audio_input_selection != wx.NOT_FOUND)
+
+        enabled = audio_input_selection not in (0, wx.NOT_FOUND)
+        max_channels = self.GetAudioInputMaxChannels()
+        selected_channels = self.GetAudioInputChannelsSelection()
+        relayout = False
+        for n, check_box in enumerate(self._audio_channel_check_boxes):
+            check_box.Enable(enabled)
+            if check_box.GetValue() != (n in selected_channels):
+                check_box.SetValue(n in selected_channels)
+            shown = n < max_channels or max_channels < 0
+            for window in (check_box, self._audio_channel_labels[n]):
+                if window.IsShown() != shown:
+                    window.Show(shown)
+                    relayout = True
+        if relayout:
+            self.Layout()
 
     def GetAudioInputMaxChannels(self):
-        audio_inputs = wx.GetApp().GetAudioInputs()
+        audio_inputs = self.GetDevices('audio_inputs')
         audio_input = wx.GetApp().GetAudioInput()
         for input_index, input_details in audio_inputs.items():
             if input_index == audio_input:
@@ -565,16 +1065,8 @@ class SetupPanel(wx.Panel):
             selected_channels.discard(input_index)
         self.SetAudioInputChannelsSelection(selected_channels)
 
-    def OnUpdateAudioInputChannel(self, event):
-        input_name = event.GetEventObject().GetName()
-        if input_name.startswith('accb_'):
-            event.Enable(self.GetAudioInputSelection() not in (0, wx.NOT_FOUND))
-        input_index = int(input_name.split('_')[-1])
-        max_channels = self.GetAudioInputMaxChannels()
-        event.Show(input_index < max_channels or max_channels < 0)
-
     def GetMidiInputChoices(self):
-        midi_inputs = wx.GetApp().GetMidiInputs()
+        midi_inputs = self.GetDevices('midi_inputs')
         choices = [(-1, '(No MIDI Input)')]
         for input_index, input_details in sorted(midi_inputs.items()):
             input_default = ' (default)' if input_details['default'] else ''
@@ -586,7 +1078,7 @@ class SetupPanel(wx.Panel):
         midi_input = wx.GetApp().GetMidiInput()
         if midi_input == -1:
             return 0
-        midi_inputs = wx.GetApp().GetMidiInputs()
+        midi_inputs = self.GetDevices('midi_inputs')
         midi_input_selection = wx.NOT_FOUND
         for n, (input_index, input_details) in enumerate(sorted(midi_inputs.items())):
             if input_index == midi_input or (input_details['default'] and midi_input < 0):
@@ -600,7 +1092,7 @@ class SetupPanel(wx.Panel):
         if midi_input_selection == 0:
             wx.GetApp().SetMidiInput(-1)
             return
-        midi_inputs = wx.GetApp().GetMidiInputs()
+        midi_inputs = self.GetDevices('midi_inputs')
         midi_input = wx.GetApp().GetMidiInput()
         for n, (input_index, input_details) in enumerate(sorted(midi_inputs.items())):
             if (n + 1) == midi_input_selection and input_index != midi_input:
@@ -611,11 +1103,18 @@ class SetupPanel(wx.Panel):
         midi_input_selection = midi_input_select.GetSelection()
         self.SetMidiInputSelection(midi_input_selection)
 
-    def OnUpdateMidiInputSelect(self, event):
-        event.Enable(self.GetMidiInputSelection() != wx.NOT_FOUND)
+    def UpdateMidiInputSelect(self, name=None, value=None):
+        midi_input_select = self._midi_input_select
+        midi_input_labels = [x[1] for x in self.GetMidiInputChoices()]
+        if midi_input_select.GetItems() != midi_input_labels:
+            midi_input_select.Set(midi_input_labels)
+        midi_input_selection = self.GetMidiInputSelection()
+        if midi_input_select.GetSelection() != midi_input_selection:
+            midi_input_select.SetSelection(midi_input_selection)
+        midi_input_select.Enable(midi_input_selection != wx.NOT_FOUND)
 
     def GetMidiOutputChoices(self):
-        midi_outputs = wx.GetApp().GetMidiOutputs()
+        midi_outputs = self.GetDevices('midi_outputs')
         choices = [(-1, '(No MIDI Output)')]
         for output_index, output_details in sorted(midi_outputs.items()):
             output_default = ' (default)' if output_details['default'] else ''
@@ -627,7 +1126,7 @@ class SetupPanel(wx.Panel):
         midi_output = wx.GetApp().GetMidiOutput()
         if midi_output == -1:
             return 0
-        midi_outputs = wx.GetApp().GetMidiOutputs()
+        midi_outputs = self.GetDevices('midi_outputs')
         midi_output_selection = wx.NOT_FOUND
         for n, (output_index, output_details) in enumerate(sorted(midi_outputs.items())):
             if output_index == midi_output or (output_details['default'] and midi_output < 0):
@@ -641,7 +1140,7 @@ class SetupPanel(wx.Panel):
         if midi_output_selection == 0:
             wx.GetApp().SetMidiOutput(-1)
             return
-        midi_outputs = wx.GetApp().GetMidiOutputs()
+        midi_outputs = self.GetDevices('midi_outputs')
         midi_output = wx.GetApp().GetMidiOutput()
         for n, (output_index, output_details) in enumerate(sorted(midi_outputs.items())):
             if (n + 1) == midi_output_selection and output_index != midi_output:
@@ -652,8 +1151,15 @@ class SetupPanel(wx.Panel):
         midi_output_selection = midi_output_select.GetSelection()
         self.SetMidiOutputSelection(midi_output_selection)
 
-    def OnUpdateMidiOutputSelect(self, event):
-        event.Enable(self.GetMidiOutputSelection() != wx.NOT_FOUND)
+    def UpdateMidiOutputSelect(self, name=None, value=None):
+        midi_output_select = self._midi_output_select
+        midi_output_labels = [x[1] for x in self.GetMidiOutputChoices()]
+        if midi_output_select.GetItems() != midi_output_labels:
+            midi_output_select.Set(midi_output_labels)
+        midi_output_selection = self.GetMidiOutputSelection()
+        if midi_output_select.GetSelection() != midi_output_selection:
+            midi_output_select.SetSelection(midi_output_selection)
+        midi_output_select.Enable(midi_output_selection != wx.NOT_FOUND)
 
 
 class ContentPanel(wx.Panel):
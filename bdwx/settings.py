@@ -0,0 +1,133 @@
+# Python
+import logging
+import threading
+
+# BeatDown
+from .state import Observable
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsStore(Observable):
+    """Typed settings kept in memory and written behind to a backend.
+
+    The type and default of a setting are registered the first time it is
+    read or written. set() only updates memory and calls the callbacks
+    subscribed to that name. Changed values are written to the backend
+    from a worker thread, coalesced over `delay` seconds, so a burst of
+    changes (typing in a spinner, dragging the window) is one write.
+
+    The backend needs read(name, type_, default), write(name, type_,
+    value) and flush(); it is only called with the store's backend lock
+    held, so it does not need to be thread safe itself.
+    """
+
+    def __init__(self, backend, delay=0.3):
+        super(SettingsStore, self).__init__()
+        self._backend = backend
+        self._delay = delay
+        self._schema = {}
+        self._values = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._backend_lock = threading.Lock()
+        self._dirty_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._write_count = 0
+        self._flush_count = 0
+
+    def define(self, name, type_=str, default=''):
+        # The first definition of a setting wins.
+        return self._schema.setdefault(name, (type_, type_(default)))
+
+    def get(self, name, type_=str, default=''):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        type_, default = self.define(name, type_, default)
+        with self._backend_lock:
+            value = type_(self._backend.read(name, type_, default))
+        with self._lock:
+            return self._values.setdefault(name, value)
+
+    def set(self, name, type_=str, value=''):
+        # Returns whether the value changed; subscribers are only called
+        # (on the calling thread) when it did.
+        type_, default = self.define(name, type_, type_())
+        value = type_(value)
+        if self.get(name, type_, default) == value:
+            return False
+        with self._lock:
+            self._values[name] = value
+            self._dirty[name] = (type_, value)
+        self.start()
+        self._dirty_event.set()
+        self.notify(name, value)
+        return True
+
+    def flush(self):
+        # Write pending changes now; returns how many were written.
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        with self._backend_lock:
+            try:
+                for name, (type_, value) in sorted(dirty.items()):
+                    self._backend.write(name, type_, value)
+                self._backend.flush()
+            except Exception:
+                logger.exception('unable to write settings')
+        self._write_count += len(dirty)
+        self._flush_count += 1
+        return len(dirty)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._dirty_event.wait()
+            # Let further changes pile up (returns early when closing).
+            self._stop_event.wait(self._delay)
+            self._dirty_event.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread or self._stop_event.is_set():
+            return
+        self._thread = threading.Thread(target=self.run, name='SettingsStore')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        # Stop the worker and write whatever is still pending.
+        self._stop_event.set()
+        self._dirty_event.set()
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+        self.flush()
+
+    def getSchema(self):
+        return dict(self._schema)
+
+    def getDelay(self):
+        return self._delay
+
+    def setDelay(self, value):
+        self._delay = max(0.0, float(value))
+
+    def getPending(self):
+        return len(self._dirty)
+
+    def getWriteCount(self):
+        return self._write_count
+
+    def getFlushCount(self):
+        return self._flush_count
+
+    schema = property(getSchema)
+    delay = property(getDelay, setDelay)
+    pending = property(getPending)
+    write_count = property(getWriteCount)
+    flush_count = property(getFlushCount)
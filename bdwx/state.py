@@ -0,0 +1,72 @@
+# Python
+import collections
+
+
+class Observable(object):
+    """Callbacks subscribed to named values.
+
+    notify() calls every callback subscribed to the name on the calling
+    thread, as callback(name, value). A callback may unsubscribe itself
+    while it is being called.
+    """
+
+    def __init__(self):
+        self._subscribers = collections.defaultdict(list)
+        self._notify_count = 0
+
+    def subscribe(self, callback, *names):
+        for name in names:
+            if callback not in self._subscribers[name]:
+                self._subscribers[name].append(callback)
+
+    def unsubscribe(self, callback, *names):
+        for name in names or list(self._subscribers):
+            if callback in self._subscribers.get(name, ()):
+                self._subscribers[name].remove(callback)
+
+    def notify(self, name, value):
+        for callback in list(self._subscribers.get(name, ())):
+            self._notify_count += 1
+            callback(name, value)
+
+    def getNotifyCount(self):
+        return self._notify_count
+
+    notify_count = property(getNotifyCount)
+
+
+class StateModel(Observable):
+    """Runtime state published by the app (devices, component status and
+    measurements), as opposed to the settings the user picked.
+
+    set() keeps the latest value per name and only notifies when it differs
+    from the previous one, so publishing the same value over and over costs
+    a comparison and no widget updates. Values are compared with ==; publish
+    snapshots (tuples, copies), never objects that are changed in place.
+    """
+
+    def __init__(self):
+        super(StateModel, self).__init__()
+        self._values = {}
+        self._publish_count = 0
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def set(self, name, value):
+        # Returns whether the value changed.
+        self._publish_count += 1
+        if name in self._values and self._values[name] == value:
+            return False
+        self._values[name] = value
+        self.notify(name, value)
+        return True
+
+    def getNames(self):
+        return sorted(self._values)
+
+    def getPublishCount(self):
+        return self._publish_count
+
+    names = property(getNames)
+    publish_count = property(getPublishCount)
@@ -10,3 +10,47 @@ def midi_note_to_int(v):
 
 def int_to_midi_note(v):
     return '{:s}{:d}'.format(NOTES[int(v) % 12], int(v) // 12 - 2)
+
+
+def midi_output_label(v):
+    command = v & 0xf000
+    channel = ((v & 0x0f00) >> 8) + 1
+    data = v & 0x7f
+    if command == 0x9000:
+        return 'Ch{} {} On'.format(channel, int_to_midi_note(data))
+    elif command == 0x8000:
+        return 'Ch{} {} Off'.format(channel, int_to_midi_note(data))
+    elif command == 0xb000:
+        return 'Ch{} CC {}'.format(channel, data)
+    elif command == 0xc000:
+        return 'Ch{} PC {}'.format(channel, data)
+    return ''
+
+
+def midi_output_message(v, value):
+    # (status, data1, data2) sending a 0-127 value as the last data byte of
+    # a configured MIDI output.
+    return (v & 0xff00) >> 8, v & 0xff, value & 0x7f
+
+
+def chord_name(root, quality):
+    if root is None:
+        return ''
+    return '{:s}{:s}'.format(NOTES[int(root) % 12], 'm' if quality == 'minor' else '')
+
+
+def duration_label(seconds):
+    if seconds >= 0.001:
+        return '{:.2f}ms'.format(seconds * 1000.0)
+    return '{:.1f}us'.format(seconds * 1000000.0)
+
+
+def import_win32gui():
+    # (win32con, win32gui), or Nones without PyWin32. Imported where window
+    # handles are used rather than with the modules.
+    try:
+        import win32con
+        import win32gui
+    except ImportError:
+        return None, None
+    return win32con, win32gui
@@ -0,0 +1,3 @@
+# Single source of the version, read by setup.py at build time so that the
+# app does not have to parse setup.py when it starts.
+__version__ = '0.1.0'
@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 
-from bdwx.app import main
+import sys
+
+# Decide before importing the GUI, so headless mode never loads wxPython.
+if '--headless' in sys.argv[1:]:
+    from bdwx.headless import main
+else:
+    from bdwx.app import main
 
 if __name__ == '__main__':
     main()
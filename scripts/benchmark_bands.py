@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+'''
+Compare the two strength band detectors: the pyo filter chain (MultiBand +
+Follower2 + PeakAmp) and the Goertzel bank fed from the process callback.
+
+A test file of tone bursts (one per band, after a stretch of silence) is
+rendered offline through each detector. CPU per block is the render time
+over a run without any detector, divided by the number of blocks; detection
+latency is the time from each burst onset until its band's velocity comes
+within --drop dB of the burst level.
+'''
+
+# Python
+import math
+import optparse
+import os
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# NumPy
+import numpy as np  # noqa
+
+# BeatDown
+from bdwx.engine import GoertzelAnalyzer, GoertzelBank, MultiBandAnalyzer, OfflineEngine  # noqa
+
+CROSSOVERS = [100, 400, 2000]
+FREQUENCIES = [60, 250, 1000, 5000]
+
+
+def write_bursts(path, sampling_rate, amplitude, burst, gap):
+    # Silence, then one burst per band; returns (onset, band) pairs.
+    t = np.arange(int(burst * sampling_rate)) / float(sampling_rate)
+    fade = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.002)
+    parts, onsets, position = [], [], 0.0
+    for band, frequency in enumerate(FREQUENCIES):
+        parts.append(np.zeros(int(gap * sampling_rate)))
+        position += gap
+        onsets.append((position, band))
+        parts.append(amplitude * fade * np.sin(2 * math.pi * frequency * t))
+        position += burst
+    parts.append(np.zeros(int(gap * sampling_rate)))
+    samples = (np.concatenate(parts) * 32767).astype('<i2')
+    f = wave.open(path, 'wb')
+    f.setnchannels(1)
+    f.setsampwidth(2)
+    f.setframerate(sampling_rate)
+    f.writeframes(samples.tobytes())
+    f.close()
+    return onsets
+
+
+def run(engine, factory, path, attack, release):
+    events = []
+    analyzer = factory(lambda velocities: events.append((engine.getTime(), velocities)))
+    analyzer.crossovers = CROSSOVERS
+    analyzer.min_spl, analyzer.max_spl = -60, 0
+    analyzer.hysteresis, analyzer.max_rate = 0, 0
+    analyzer.attack, analyzer.release = attack, release
+    engine.strength_analyzer = analyzer
+    engine.run(path)
+    return events
+
+
+def latencies(events, onsets, threshold, burst):
+    results = []
+    for onset, band in onsets:
+        hits = [t for t, velocities in events
+                if onset <= t < onset + burst and velocities[band] is not None and velocities[band] >= threshold]
+        results.append(hits[0] - onset if hits else None)
+    return results
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='server buffer size')
+    parser.add_option('--sampling-rate', dest='sampling_rate', type='int', default=44100, help='sampling rate')
+    parser.add_option('--attack', type='float', default=0.01, help='follower rise time in seconds')
+    parser.add_option('--release', type='float', default=0.1, help='follower fall time in seconds')
+    parser.add_option('--amplitude', type='float', default=0.5, help='burst amplitude')
+    parser.add_option('--drop', type='float', default=6.0, help='detection threshold in dB below the burst level')
+    parser.add_option('--repeat', type='int', default=3, help='renders per detector (best is kept)')
+    options, args = parser.parse_args()
+
+    burst, gap = 0.5, 0.5
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        onsets = write_bursts(path, options.sampling_rate, options.amplitude, burst, gap)
+        engine = OfflineEngine(buffer_size=options.buffer_size)
+        spl = 20.0 * math.log10(options.amplitude) - options.drop
+        threshold = int(round((spl + 60.0) / 60.0 * 127))
+
+        def best(factory):
+            elapsed, events = [], None
+            for n in range(options.repeat):
+                if factory:
+                    events = run(engine, factory, path, options.attack, options.release)
+                else:
+                    engine.strength_enabled = False
+                    engine.run(path)
+                    engine.strength_enabled = True
+                elapsed.append(engine.elapsed)
+            return min(elapsed), events
+
+        baseline, _ = best(None)
+        blocks = engine.duration * options.sampling_rate / options.buffer_size
+        detectors = [
+            ('filters', lambda callback: MultiBandAnalyzer(callback, engine.getTime, engine.input_bus)),
+            ('goertzel', lambda callback: GoertzelAnalyzer(callback, engine.getTime, engine.input_bus,
+                                                           options.buffer_size, options.sampling_rate)),
+        ]
+        print('{} blocks of {} samples, threshold velocity {} ({:.0f} dB)'.format(
+            int(blocks), options.buffer_size, threshold, spl))
+        for name, factory in detectors:
+            elapsed, events = best(factory)
+            cpu = max(0.0, elapsed - baseline) / blocks * 1e6
+            results = latencies(events, onsets, threshold, burst)
+            print('{:10s} {:7.1f} us/block  latency {}'.format(name, cpu, '  '.join(
+                '{}Hz {}'.format(f, '-' if r is None else '{:.1f}ms'.format(r * 1000.0))
+                for f, r in zip(FREQUENCIES, results))))
+
+        # The bank on its own, without the server or the analyzer around it.
+        bank = GoertzelBank([20] + CROSSOVERS + [20000], options.sampling_rate, options.buffer_size)
+        block = np.random.uniform(-0.5, 0.5, options.buffer_size)
+        count = 2000
+        started = time.perf_counter()
+        for n in range(count):
+            bank.process(block)
+        print('bank only  {:7.1f} us/block  ({} bins, windows {})'.format(
+            (time.perf_counter() - started) / count * 1e6, len(bank.frequencies),
+            ' '.join('{:.1f}ms'.format(w * 1000.0) for w in bank.latency)))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+'''
+Measure the paint cost of the beat display.
+
+The display is stepped through every clock position --rounds times and
+drawn into a memory DC three ways:
+
+    uncached  every dot with a new brush and pen per dot, as the display
+              used to paint on every clock
+    full      cached dot layer blitted, highlighted dots drawn on top
+    changed   as full, limited to the dots that changed colour (what a
+              clock tick invalidates)
+
+Then the same steps are painted on screen through SetValue() and Update(),
+and the BeatDisplay.OnPaint timings are reported, as seen by the app.
+'''
+
+# Python
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# wxPython
+import wx  # noqa
+
+# BeatDown
+from bdwx.controls import BeatDisplay  # noqa
+from bdwx.engine import TIMINGS  # noqa
+
+
+def draw_uncached(display, dc):
+    # The display's previous OnPaint, for comparison.
+    rect = display.GetClientRect()
+    fg_color = display.GetForegroundColour()
+    bg_color = display.GetBackgroundColour()
+    in_color = display.GetInactiveColour()
+    in_color1 = wx.Colour(fg_color)
+    in_color1.MakeDisabled(128)
+    in_color2 = wx.Colour(fg_color)
+    in_color2.MakeDisabled(64)
+    dc.SetBackground(wx.Brush(bg_color))
+    dc.Clear()
+    dc.SetBrush(wx.Brush(bg_color))
+    dc.SetPen(wx.Pen(bg_color))
+    dc.DrawRectangle(rect)
+    value = display.GetValue()
+    for clock, left, offset, radius in BeatDisplay.DOTS:
+        circle_radius = rect.width * radius / 100
+        if circle_radius < 1.2:
+            continue
+        if value is not None:
+            active = [x % 96 for x in range(value - 2, value + 1)]
+            inactive1 = [x % 96 for x in range(value - 11, value - 2)]
+            inactive2 = [x % 96 for x in range(value - 23, value - 11)]
+            if clock in active:
+                color = fg_color
+            elif clock in inactive1:
+                color = in_color1
+            elif clock in inactive2:
+                color = in_color2
+            else:
+                color = in_color
+        else:
+            color = in_color
+        dc.SetBrush(wx.Brush(color))
+        dc.SetPen(wx.Pen(color))
+        dc.DrawCircle(int(rect.width * (left + offset) / 100), int(rect.height * 0.5), int(circle_radius))
+
+
+def time_steps(display, rounds, draw):
+    # Mean seconds per clock step.
+    started = time.perf_counter()
+    for n in range(rounds * 96):
+        previous = display.GetValue()
+        display.SetValue(n % 96)
+        draw(previous, n % 96)
+    return (time.perf_counter() - started) / (rounds * 96)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--width', type='int', default=600, help='display width in pixels')
+    parser.add_option('--height', type='int', default=30, help='display height in pixels')
+    parser.add_option('--rounds', type='int', default=20, help='times to step through all 96 clocks')
+    options, args = parser.parse_args()
+
+    app = wx.App(False)
+    frame = wx.Frame(None, wx.ID_ANY, 'BeatDisplay', size=(options.width + 40, options.height + 80))
+    display = BeatDisplay(frame, wx.ID_ANY, size=(options.width, options.height))
+    display.SetForegroundColour(wx.GREEN)
+    display.SetBackgroundColour(wx.BLACK)
+    frame.Show()
+    display.SetSize((options.width, options.height))
+    app.Yield()
+
+    bitmap = wx.Bitmap(options.width, options.height)
+    dc = wx.MemoryDC(bitmap)
+    results = [
+        ('uncached', time_steps(display, options.rounds, lambda previous, value: draw_uncached(display, dc))),
+        ('full', time_steps(display, options.rounds, lambda previous, value: display.Draw(dc))),
+        ('changed', time_steps(display, options.rounds, lambda previous, value: display.Draw(
+            dc, display.GetChangedRect(previous, value) or wx.Rect(0, 0, 1, 1)))),
+    ]
+    dc.SelectObject(wx.NullBitmap)
+    print('{}x{} display, {} dots drawn'.format(options.width, options.height, len(display.GetLayout())))
+    for name, seconds in results:
+        print('{:9s} {:8.1f} us per clock ({:.0f} clocks/s at 100% of one core)'.format(
+            name, seconds * 1e6, 1.0 / seconds if seconds else 0))
+
+    TIMINGS.reset()
+    started = time.perf_counter()
+    for n in range(options.rounds * 96):
+        display.SetValue(n % 96)
+        display.Update()
+    elapsed = time.perf_counter() - started
+    histogram = TIMINGS.get('BeatDisplay.OnPaint')
+    print('on screen {:8.1f} us per clock, {} paints, OnPaint mean {:.1f} us, p99 <= {:.0f} us, max {:.1f} us'.format(
+        elapsed * 1e6 / (options.rounds * 96), histogram.count, histogram.mean * 1e6,
+        histogram.getPercentile(0.99) * 1e6, histogram.max * 1e6))
+    frame.Destroy()
+
+
+if __name__ == '__main__':
+    main()
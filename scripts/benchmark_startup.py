@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+'''
+Measure how long BeatDown takes to start.
+
+Every measurement runs in a fresh interpreter so that nothing is cached:
+
+    import    time to import each module (including everything it imports)
+    launch    ./beatdown.py started until wx.App.OnInit
+    show      OnInit until the frame has been shown
+    frame     launch until the first frame has been painted (first idle)
+    devices   audio and MIDI device discovery after the first frame
+
+The GUI runs are made with --startup-report, which makes the app print its
+timings and exit instead of booting the audio server; no other instance of
+the app may be running. The medians over --repeat runs are reported. --save
+writes them to a JSON file and --compare prints the change against such a
+file, to keep track of the startup budget.
+'''
+
+# Python
+import json
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'numpy',
+    'pyo',
+    'wx',
+    'wx.lib.agw.floatspin',
+    'wx.lib.agw.peakmeter',
+    'wx.lib.agw.pygauge',
+    'win32gui',
+    'bdwx.engine',
+    'bdwx.headless',
+    'bdwx.panels',
+    'bdwx.app',
+]
+
+IMPORT_CODE = '''
+import sys, time
+sys.path.insert(0, {root!r})
+t = time.perf_counter()
+import {module}
+print('{{:.6f}} {{}}'.format(time.perf_counter() - t, len(sys.modules)))
+'''
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+def time_import(module):
+    # Seconds to import the module and the number of modules then loaded.
+    code = IMPORT_CODE.format(root=ROOT, module=module)
+    process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    output, errors = process.communicate()
+    if process.returncode:
+        return None, errors.strip().splitlines()[-1] if errors.strip() else 'failed'
+    seconds, count = output.strip().splitlines()[-1].split()
+    return float(seconds), int(count)
+
+
+def time_launch(timeout):
+    # Times reported by the app with --startup-report, relative to launch.
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'beatdown.py'), '--startup-report'],
+                               stdout=subprocess.PIPE, universal_newlines=True)
+    reported = {}
+    arrived = None
+    try:
+        for line in process.stdout:
+            fields = line.split()
+            if len(fields) == 3 and fields[0] == 'startup':
+                reported[fields[1]] = float(fields[2])
+                arrived = time.perf_counter() - started
+            if time.perf_counter() - started > timeout:
+                break
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    if 'devices' not in reported:
+        return None
+    # The report is printed after device discovery; work back from there.
+    init = arrived - reported['devices']
+    return {
+        'launch': init,
+        'show': reported['show'],
+        'frame': init + reported['first_frame'],
+        'devices': reported['devices'] - reported['first_frame'],
+    }
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--repeat', type='int', default=5, help='runs per measurement')
+    parser.add_option('--timeout', type='float', default=60.0, help='seconds to wait for the app to report')
+    parser.add_option('--no-gui', dest='gui', action='store_false', default=True, help='only time the imports')
+    parser.add_option('--save', default='', help='write the medians to this JSON file')
+    parser.add_option('--compare', default='', help='compare the medians with this JSON file')
+    options, args = parser.parse_args()
+
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    results = {}
+
+    def report(name, value, extra=''):
+        line = '{:24s} {:8.1f} ms'.format(name, value * 1000.0)
+        previous = baseline.get(name)
+        if previous is not None:
+            line += ' ({:+.1f})'.format((value - previous) * 1000.0)
+        print(line + extra)
+
+    for module in args or MODULES:
+        times, detail = [], None
+        for n in range(options.repeat):
+            seconds, detail = time_import(module)
+            if seconds is None:
+                break
+            times.append(seconds)
+        if not times:
+            print('{:24s}        - ms ({})'.format(module, detail))
+            continue
+        results[module] = median(times)
+        report(module, results[module], ', {} modules'.format(detail))
+
+    if options.gui:
+        runs = [r for r in (time_launch(options.timeout) for n in range(options.repeat)) if r]
+        if runs:
+            for name in ('launch', 'show', 'frame', 'devices'):
+                results[name] = median([r[name] for r in runs])
+                report(name, results[name])
+        else:
+            print('no startup report from the app (failed, timed out or already running)')
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
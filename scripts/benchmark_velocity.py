@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''
+Compare the per-call cost of mapping a PeakAmp amplitude to a velocity the
+old way (log10, comparisons and pyo.rescale) against the LevelTable lookup
+now used by StrengthAnalyzer._peak_amp_callback, plus the same comparison
+for the header meter's per-channel mapping.
+'''
+
+# Python
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# PyO
+import pyo  # noqa
+
+# BeatDown
+from bdwx.engine import LevelTable, StrengthAnalyzer  # noqa
+
+MIN_SPL, MAX_SPL, MIN_VELOCITY, MAX_VELOCITY = -60, -6, 0, 127
+
+
+def old_velocity(amp):
+    spl = -120.0 if amp < 0.000001 else 20.0 * math.log10(amp)
+    if spl <= MIN_SPL:
+        velocity = MIN_VELOCITY
+    elif spl >= MAX_SPL:
+        velocity = MAX_VELOCITY
+    else:
+        velocity = int(pyo.rescale(spl, MIN_SPL, MAX_SPL, MIN_VELOCITY, MAX_VELOCITY))
+    return velocity
+
+
+def old_meter(*args):
+    return [min(120, max(0, int(-120.0 if arg < 0.000001 else 20.0 * math.log10(arg)) + 90)) for arg in args]
+
+
+def main():
+    amps = [10 ** random.uniform(-6, 0) for n in range(10000)]
+
+    analyzer = StrengthAnalyzer()
+    analyzer.min_spl, analyzer.max_spl = MIN_SPL, MAX_SPL
+    analyzer.min_velocity, analyzer.max_velocity = MIN_VELOCITY, MAX_VELOCITY
+    new_velocity = analyzer._table.lookup
+
+    meter = LevelTable(max_amp=10 ** 1.5)
+    meter.build(-90, 30, 0, 120)
+    meter_lookup = meter.lookup
+
+    def new_meter(*args):
+        return [meter_lookup(arg) for arg in args]
+
+    pairs = list(zip(amps[::2], amps[1::2]))
+    results = [
+        ('velocity (old)', lambda: [old_velocity(a) for a in amps], len(amps)),
+        ('velocity (table)', lambda: [new_velocity(a) for a in amps], len(amps)),
+        ('callback (table)', lambda: [analyzer._peak_amp_callback(a) for a in amps], len(amps)),
+        ('meter (old)', lambda: [old_meter(a, b) for a, b in pairs], len(pairs)),
+        ('meter (table)', lambda: [new_meter(a, b) for a, b in pairs], len(pairs)),
+    ]
+    for name, func, calls in results:
+        best = min(timeit.repeat(func, number=10, repeat=5)) / (10 * calls)
+        print('{:18s} {:8.1f} ns/call'.format(name, best * 1e9))
+
+
+if __name__ == '__main__':
+    main()
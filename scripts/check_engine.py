@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+'''
+Regression checks for the engine that need no audio or MIDI device: pyo
+runs on an offline server and the estimators are fed synthetic signals.
+
+Runs every check (or the ones named on the command line), prints one line
+per check and exits non-zero when any of them failed. Checks of wx controls
+are skipped without wxPython.
+'''
+
+# Python
+import math
+import optparse
+import os
+import sys
+import traceback
+
+# NumPy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# PyO
+import pyo  # noqa
+
+# BeatDown
+from bdwx.engine import (BeatGenerator, BeatTracker, ChangeFilter, ChordEstimator, ChromaFilter, InputBus,  # noqa
+                         KeyEstimator, LevelTable, MultiBandAnalyzer, SpectralDescriptors, SpectrumFrames,
+                         TempoEstimator)
+from bdwx.utils import midi_output_label  # noqa
+
+CHECKS = []
+
+
+class Skip(Exception):
+    pass
+
+
+def check(function):
+    CHECKS.append(function)
+    return function
+
+
+def get_server():
+    # One offline server for all checks that build pyo objects.
+    if not hasattr(get_server, 'server'):
+        get_server.server = pyo.Server(nchnls=1, duplex=0, audio='offline').boot()
+    return get_server.server
+
+
+@check
+def multiband_lpf_while_playing():
+    # The LPF setting is pushed to whichever analyzer is running; the
+    # crossover bank has no cutoff to change and must only keep the value.
+    get_server()
+    analyzer = MultiBandAnalyzer(bus=InputBus([0], pyo.Sine(440)))
+    analyzer.play()
+    try:
+        analyzer.lpf = 500
+        assert analyzer.lpf == 500, analyzer.lpf
+    finally:
+        analyzer.stop()
+
+
+@check
+def tempo_octave_fast():
+    # A 174 BPM track with accented downbeats must not read as its half
+    # tempo (87 BPM), which the tempo prior alone prefers.
+    sampling_rate, bpm = 44100, 174.0
+    random = np.random.RandomState(1)
+    samples = random.randn(30 * sampling_rate) * 0.01
+    kick = np.sin(2 * np.pi * 60 * np.arange(2000) / sampling_rate) * np.exp(-np.arange(2000) / 400.0)
+    for n, start in enumerate(np.arange(0, 29.9, 60.0 / bpm)):
+        index = int(start * sampling_rate)
+        samples[index:index + len(kick)] += kick * (1.0 if n % 2 == 0 else 0.6)
+    estimates = []
+    estimator = TempoEstimator(lambda value, confidence: estimates.append(value), sampling_rate)
+    for start in range(0, len(samples), 256):
+        estimator.process(samples[start:start + 256])
+    assert estimates and abs(estimates[-1] - bpm) < 0.02 * bpm, estimates[-1:]
+
+
+@check
+def tempo_three_two_offbeat_hats():
+    # Kicks at 100 BPM with quiet off-beat hats once locked to 66.7 BPM
+    # (a 3:2 error), which the octave check alone cannot correct.
+    sampling_rate, bpm = 44100, 100.0
+    random = np.random.RandomState(0)
+    samples = random.randn(30 * sampling_rate) * 0.01
+    kick = np.sin(2 * np.pi * 60 * np.arange(2000) / sampling_rate) * np.exp(-np.arange(2000) / 400.0)
+    hat = random.randn(1000) * np.exp(-np.arange(1000) / 150.0) * 0.1
+    for start in np.arange(0, 29.9, 60.0 / bpm):
+        index = int(start * sampling_rate)
+        samples[index:index + len(kick)] += kick
+        index = int((start + 30.0 / bpm) * sampling_rate)
+        samples[index:index + len(hat)] += hat[:len(samples) - index]
+    estimates = []
+    estimator = TempoEstimator(lambda value, confidence: estimates.append(value), sampling_rate)
+    for start in range(0, len(samples), 256):
+        estimator.process(samples[start:start + 256])
+    assert estimates and abs(estimates[-1] - bpm) < 0.02 * bpm, estimates[-1:]
+
+
+@check
+def beat_generator_rounds_bpm():
+    # Detected tempos are fractional; 127.9 BPM is 128, not 127.
+    generator = BeatGenerator(threaded=False)
+    generator.bpm = 127.9
+    assert generator.bpm == 128, generator.bpm
+    generator.bpm = 127.4
+    assert generator.bpm == 127, generator.bpm
+
+
+@check
+def beat_tracker_keeps_trim():
+    # Lock onto onsets slightly slower than the clock, then move the tempo
+    # by one BPM (as tempo detection does): the trim must survive. A jump
+    # beyond max_trim starts over.
+    now = [0.0]
+    generator = BeatGenerator(timer=lambda: now[0], threaded=False)
+    tracker = BeatTracker(generator)
+    generator.play()
+    for beat in range(1, 40):
+        now[0] = beat * 0.5 * 1.01
+        generator.schedule(now[0])
+        tracker.onset(now[0])
+    trim = tracker.trim
+    assert trim > 0.001, trim
+    tracker.setBPM(121)
+    assert tracker.trim == trim and generator.scale == 1.0 + trim, (tracker.trim, generator.scale)
+    tracker.setBPM(140)
+    assert tracker.trim == 0.0 and generator.scale == 1.0, (tracker.trim, generator.scale)
+
+
+@check
+def change_filter_trailing_send():
+    # A jump held back by the rate limit is sent once the window expires,
+    # as the latest value, even when that is back within the hysteresis.
+    change_filter = ChangeFilter(hysteresis=2, max_rate=10, refresh=0)
+    assert change_filter.check(60, 0.0)
+    assert not change_filter.check(90, 0.05)
+    assert not change_filter.check(61, 0.08)
+    assert change_filter.check(61, 0.11)
+    # Back to the value sent last: nothing is left to send.
+    assert not change_filter.check(90, 0.15)
+    assert not change_filter.check(61, 0.18)
+    assert not change_filter.check(62, 0.3)
+
+
+@check
+def level_table_matches_formula():
+    # Table lookups give the same values as computing the SPL and the curve
+    # for every amplitude, down to -120 dB.
+    random = np.random.RandomState(1)
+    amps = list(10 ** random.uniform(-6.5, 0.1, 20000)) + [0.0, 1e-6, 1.0, 2.0]
+    table = LevelTable()
+    for config in [(-60, -6, 0, 127, 'linear'), (-120, -100, 0, 127, 'linear'),
+                   (-120, 0, 0, 127, 's-curve'), (-40, 0, 10, 100, 'exponential')]:
+        table.build(*config)
+        spl = [20.0 * math.log10(a) if a >= 0.000001 else -120.0 for a in amps]
+        expected = table.map(np.array(spl)).astype(int)
+        wrong = [(a, table.lookup(a), e) for a, e in zip(amps, expected) if table.lookup(a) != e]
+        assert not wrong, (config, wrong[:5])
+
+
+@check
+def midi_output_label_channels():
+    # The channel is the low nibble of the status byte, as sent.
+    assert midi_output_label(0xb005) == 'Ch1 CC 5', midi_output_label(0xb005)
+    assert midi_output_label(0xb305) == 'Ch4 CC 5', midi_output_label(0xb305)
+    assert midi_output_label(0x9f3c) == 'Ch16 C3 On', midi_output_label(0x9f3c)
+    assert midi_output_label(0xc912) == 'Ch10 PC 18', midi_output_label(0xc912)
+
+
+def chord_track(chords, seconds, sampling_rate, random):
+    # Each chord (a tuple of MIDI notes) held for `seconds` as equal sines.
+    t = np.arange(int(seconds * sampling_rate)) / float(sampling_rate)
+    parts = []
+    for notes in chords:
+        tone = sum(np.sin(2 * np.pi * 440.0 * 2 ** ((note - 69) / 12.0) * t) for note in notes)
+        parts.append(tone * 0.5 / len(notes))
+    samples = np.concatenate(parts)
+    return samples + random.randn(len(samples)) * 0.001
+
+
+def feed_chroma(samples, sampling_rate, *estimators):
+    # Run samples through the StyleDetector front end into the estimators.
+    frames = SpectrumFrames(sampling_rate)
+    chroma_filter = ChromaFilter(frames.frequencies)
+    for start in range(0, len(samples), 256):
+        for spectrum in frames.process(samples[start:start + 256]):
+            chroma = chroma_filter.process(spectrum)
+            for estimator in estimators:
+                estimator.process(chroma)
+
+
+# C, G, Am and F triads.
+PROGRESSION = [(60, 64, 67), (55, 59, 62), (57, 60, 64), (53, 57, 60)]
+
+
+@check
+def chord_estimator_progression():
+    # A C-G-Am-F progression is reported chord by chord; noise after it
+    # matches no triad and reports no chord.
+    sampling_rate = 44100
+    random = np.random.RandomState(0)
+    samples = chord_track(PROGRESSION * 2, 2.0, sampling_rate, random)
+    samples = np.concatenate((samples, random.randn(3 * sampling_rate) * 0.3))
+    chords = []
+    estimator = ChordEstimator(lambda root, quality: chords.append((root, quality)))
+    assert estimator.chord == (None, None), estimator.chord
+    feed_chroma(samples, sampling_rate, estimator)
+    expected = [(0, 'major'), (7, 'major'), (9, 'minor'), (5, 'major')] * 2 + [(None, None)]
+    assert chords == expected, chords
+    assert estimator.chord == (None, None), estimator.chord
+
+
+@check
+def key_estimator_progression():
+    # Noise alone correlates with no key profile well enough to report a
+    # key; a repeated C-G-Am-F progression is in C major.
+    sampling_rate = 44100
+    random = np.random.RandomState(0)
+    frame_rate = SpectrumFrames(sampling_rate).frame_rate
+    keys = []
+    estimator = KeyEstimator(lambda tonic, mode: keys.append((tonic, mode)), frame_rate)
+    feed_chroma(random.randn(20 * sampling_rate) * 0.3, sampling_rate, estimator)
+    assert not keys and estimator.key == (None, None), (keys, estimator.key)
+    estimator.reset()
+    feed_chroma(chord_track(PROGRESSION * 3, 2.0, sampling_rate, random), sampling_rate, estimator)
+    assert keys == [(0, 'major')], keys
+    assert estimator.key == (0, 'major'), estimator.key
+
+
+@check
+def spectral_descriptors_tone_noise_silence():
+    # A steady 1 kHz tone has its centroid and rolloff at 1 kHz and no
+    # flatness, and unchanged values come through as None; white noise is
+    # flat; silence sends nothing at all.
+    sampling_rate = 44100
+    random = np.random.RandomState(0)
+    frames = SpectrumFrames(sampling_rate)
+    sent = []
+    descriptors = SpectralDescriptors(sent.append, frames.frequencies, frames.frame_rate)
+
+    def feed(samples):
+        for start in range(0, len(samples), 256):
+            for spectrum in frames.process(samples[start:start + 256]):
+                descriptors.process(spectrum)
+
+    t = np.arange(2 * sampling_rate) / float(sampling_rate)
+    feed(np.sin(2 * np.pi * 1000.0 * t) * 0.5)
+    centroid, flatness, rolloff = descriptors.values
+    assert abs(centroid - 1000.0) < 50 and abs(rolloff - 1000.0) < 50 and flatness < 0.01, descriptors.values
+    assert any(None in values for values in sent), sent
+    feed(random.randn(2 * sampling_rate) * 0.3)
+    assert descriptors.values[1] > 0.3, descriptors.values
+    feed(np.zeros(sampling_rate))
+    del sent[:]
+    feed(np.zeros(2 * sampling_rate))
+    assert not sent, sent
+
+
+@check
+def beat_display_start_stop():
+    # Starting the clock (None to 0) and stopping it (0 to None) must
+    # repaint the dots that change colour.
+    try:
+        import wx
+    except ImportError:
+        raise Skip('needs wxPython')
+    from bdwx.controls import BeatDisplay
+    app = wx.App(False)  # noqa
+    frame = wx.Frame(None)
+    try:
+        display = BeatDisplay(frame, size=(400, 30))
+        display.SetSize((400, 30))
+        for previous, value in [(None, 0), (0, None)]:
+            rect = display.GetChangedRect(previous, value)
+            assert rect is not None and not rect.IsEmpty(), (previous, value, rect)
+        refreshed = []
+        display.RefreshRect = lambda rect, erase=True: refreshed.append(rect)
+        display.SetValue(0)
+        display.SetValue(None)
+        assert len(refreshed) == 2 and not any(rect.IsEmpty() for rect in refreshed), refreshed
+    finally:
+        frame.Destroy()
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [check ...]')
+    options, args = parser.parse_args()
+    checks = [c for c in CHECKS if not args or c.__name__ in args]
+    failed = 0
+    for function in checks:
+        try:
+            function()
+        except Skip as e:
+            print('skip {} ({})'.format(function.__name__, e))
+        except Exception:
+            failed += 1
+            print('FAIL {}'.format(function.__name__))
+            traceback.print_exc()
+        else:
+            print('ok   {}'.format(function.__name__))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
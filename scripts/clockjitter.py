@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+'''
+Compare MIDI clock jitter of the lookahead scheduler in BeatGenerator with
+the previous Metro + TrigFunc callback path while another thread keeps the
+interpreter busy (standing in for GUI work).
+
+For the scheduler the tick time is the hand-off time plus the timestamp
+given to the MIDI layer; for the callback path it is the time the Python
+callback actually ran, after rounding up to the next audio block boundary.
+Reports inter-tick p50/p99/max deviation from the ideal period.
+'''
+
+# Python
+import math
+import optparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# BeatDown
+from bdwx.engine import BeatGenerator  # noqa
+
+
+def busy(stop_event, load):
+    # Hold the GIL with pure Python work for `load` of every 10 ms.
+    while not stop_event.is_set():
+        until = time.perf_counter() + 0.01 * load
+        while time.perf_counter() < until:
+            sum(range(100))
+        time.sleep(0.01 * (1.0 - load))
+
+
+def run_callback(bpm, ticks, block_period):
+    # Emulate Metro -> TrigFunc -> Python callback: the tick fires on the
+    # first block boundary after it is due, then waits for the interpreter.
+    period = 2.5 / bpm
+    started = time.perf_counter()
+    times = []
+    for tick in range(ticks):
+        due = started + tick * period
+        due = started + math.ceil((due - started) / block_period) * block_period
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        times.append(time.perf_counter())
+    return times
+
+
+def run_scheduler(bpm, ticks):
+    times = []
+    done = threading.Event()
+
+    def sender(msg, timestamp=0):
+        if msg == b'\xf8':
+            times.append(time.perf_counter() + timestamp / 1000.0)
+            if len(times) >= ticks:
+                done.set()
+
+    generator = BeatGenerator(sender=sender)
+    generator.bpm = bpm
+    generator.play()
+    done.wait()
+    generator.stop()
+    return times[:ticks]
+
+
+def report(name, times, period):
+    deviations = sorted(abs((b - a) - period) * 1000.0 for a, b in zip(times, times[1:]))
+    count = len(deviations)
+    p50 = deviations[int(0.50 * (count - 1))]
+    p99 = deviations[int(0.99 * (count - 1))]
+    print('{:10s} p50 {:6.3f} ms  p99 {:6.3f} ms  max {:6.3f} ms  ({} intervals of {:.3f} ms)'.format(
+        name, p50, p99, deviations[-1], count, period * 1000.0))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--bpm', type='int', default=360, help='clock tempo')
+    parser.add_option('--seconds', type='float', default=10.0, help='length of each run')
+    parser.add_option('--load', type='float', default=0.5, help='fraction of time a busy thread holds the interpreter')
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='audio block size of the callback path')
+    parser.add_option('--sampling-rate', dest='sampling_rate', type='int', default=44100, help='sampling rate of the callback path')
+    options, args = parser.parse_args()
+
+    period = 2.5 / options.bpm
+    ticks = int(options.seconds / period)
+    stop_event = threading.Event()
+    if options.load > 0:
+        thread = threading.Thread(target=busy, args=(stop_event, min(options.load, 1.0)))
+        thread.daemon = True
+        thread.start()
+    try:
+        report('callback', run_callback(options.bpm, ticks, float(options.buffer_size) / options.sampling_rate), period)
+        report('scheduler', run_scheduler(options.bpm, ticks), period)
+    finally:
+        stop_event.set()
+
+
+if __name__ == '__main__':
+    main()
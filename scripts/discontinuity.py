@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+'''
+Measure the velocity discontinuity when the input channels are switched.
+
+A two channel test file carries the same steady tone on both channels, the
+second one phase shifted (and optionally at a different level). It is
+rendered offline while the strength analyzer input is switched between the
+channels every --interval seconds, once per --fade setting. With equal
+levels the velocity should not move at all, so for each switch the largest
+deviation from the velocity just before it (within --window seconds) and
+the largest step between consecutive velocities are reported, as the
+median and worst case over all switches.
+
+Example:
+
+    ./discontinuity.py --fade 0,0.01,0.05,0.1
+'''
+
+# Python
+import math
+import optparse
+import os
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# NumPy
+import numpy as np  # noqa
+
+# BeatDown
+from bdwx.engine import OfflineEngine  # noqa
+
+
+def write_tone(path, sampling_rate, seconds, frequency, amplitude, phase, level_db):
+    t = np.arange(int(seconds * sampling_rate)) / float(sampling_rate)
+    left = amplitude * np.sin(2 * math.pi * frequency * t)
+    right = amplitude * 10 ** (level_db / 20.0) * np.sin(2 * math.pi * frequency * t + math.radians(phase))
+    samples = np.empty(2 * len(t))
+    samples[0::2], samples[1::2] = left, right
+    f = wave.open(path, 'wb')
+    f.setnchannels(2)
+    f.setsampwidth(2)
+    f.setframerate(sampling_rate)
+    f.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+    f.close()
+
+
+def measure(events, switches, window):
+    # (deviation, step) per switch, from the velocity events around it.
+    velocities = [(ts, value) for ts, kind, value in events if kind == 'velocity']
+    results = []
+    for switch in switches:
+        before = [value for ts, value in velocities if ts < switch]
+        after = [value for ts, value in velocities if switch <= ts < switch + window]
+        if not before:
+            continue
+        steady = before[-1]
+        values = [steady] + after
+        deviation = max(abs(value - steady) for value in values)
+        step = max([abs(b - a) for a, b in zip(values, values[1:])] or [0])
+        results.append((deviation, step))
+    return results
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--fade', default='0,0.02,0.05,0.1', help='crossfade times in seconds (comma separated)')
+    parser.add_option('--seconds', type='float', default=20.0, help='length of the test file')
+    parser.add_option('--interval', type='float', default=1.0, help='seconds between channel switches')
+    parser.add_option('--window', type='float', default=0.5, help='seconds after a switch to look at')
+    parser.add_option('--frequency', type='float', default=60.0, help='tone frequency in Hz')
+    parser.add_option('--phase', type='float', default=90.0, help='phase of the second channel in degrees')
+    parser.add_option('--level', type='float', default=0.0, help='level of the second channel in dB')
+    parser.add_option('--attack', type='float', default=0.01, help='follower rise time in seconds')
+    parser.add_option('--release', type='float', default=0.05, help='follower fall time in seconds')
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='server buffer size')
+    parser.add_option('--sampling-rate', dest='sampling_rate', type='int', default=44100, help='sampling rate')
+    options, args = parser.parse_args()
+
+    engine = OfflineEngine(buffer_size=options.buffer_size)
+    analyzer = engine.strength_analyzer
+    analyzer.attack, analyzer.release = options.attack, options.release
+    analyzer.min_spl, analyzer.max_spl = -60, 0
+    analyzer.hysteresis, analyzer.max_rate = 0, 0
+    period = float(options.buffer_size) / options.sampling_rate
+    every = max(1, int(round(options.interval / period)))
+    switches = []
+
+    def on_block(block):
+        if block and block % every == 0:
+            engine.input_bus.channels = [1] if engine.input_bus.channels == [0] else [0]
+            switches.append(block * period)
+
+    engine.block_callback = on_block
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        write_tone(path, options.sampling_rate, options.seconds, options.frequency, 0.5, options.phase,
+                   options.level)
+        print('{:.0f} Hz tone, second channel {:+.1f} dB at {:.0f} degrees, switching every {:.2f}s'.format(
+            options.frequency, options.level, options.phase, every * period))
+        for fade in [float(v) for v in options.fade.split(',') if v.strip()]:
+            engine.input_bus.fade = fade
+            engine.channels = [0]
+            del switches[:]
+            results = measure(engine.run(path), switches, options.window)
+            if not results:
+                print('fade {:5.3f}s: no switches measured'.format(fade))
+                continue
+            deviations = sorted(r[0] for r in results)
+            steps = sorted(r[1] for r in results)
+            print('fade {:5.3f}s: {} switches, deviation median {} worst {}, step median {} worst {}'.format(
+                fade, len(results), deviations[len(deviations) // 2], deviations[-1],
+                steps[len(steps) // 2], steps[-1]))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+'''
+Measure how much CPU BeatDown uses while it sits idle.
+
+./beatdown.py is started, given --settle seconds to finish starting up, and
+then sampled over --seconds:
+
+    cpu       user + system CPU time of all its threads, as a percentage
+              of one core
+    wakeups   voluntary context switches per second (threads going to sleep
+              after a timer or event woke them up)
+
+Leave Speed, Strength and Style disabled (and no audio input selected to
+leave out the audio server) to measure the cost of the UI itself. To
+compare two versions, run with --save on one and --compare on the other;
+the medians over --repeat runs are reported. No other instance of the app
+may be running.
+
+Uses psutil when it is installed, /proc otherwise (Linux).
+'''
+
+# Python
+import json
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+# psutil
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+
+def sample(pid):
+    # (CPU seconds, voluntary context switches) of the process so far.
+    if psutil:
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        return times.user + times.system, process.num_ctx_switches().voluntary
+    with open('/proc/{}/stat'.format(pid)) as f:
+        # Fields after the command name, which may contain spaces.
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / float(os.sysconf('SC_CLK_TCK'))
+    switches = 0
+    # Summed over the threads; the process line only counts the main one.
+    for tid in os.listdir('/proc/{}/task'.format(pid)):
+        with open('/proc/{}/task/{}/status'.format(pid, tid)) as f:
+            for line in f:
+                if line.startswith('voluntary_ctxt_switches:'):
+                    switches += int(line.split()[1])
+    return cpu, switches
+
+
+def measure(settle, seconds):
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'beatdown.py')])
+    try:
+        time.sleep(settle)
+        if process.poll() is not None:
+            return None
+        started, (cpu, switches) = time.time(), sample(process.pid)
+        time.sleep(seconds)
+        elapsed = time.time() - started
+        end_cpu, end_switches = sample(process.pid)
+        return {
+            'cpu': 100.0 * (end_cpu - cpu) / elapsed,
+            'wakeups': (end_switches - switches) / elapsed,
+        }
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(5.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--seconds', type='float', default=20.0, help='seconds to sample the idle app')
+    parser.add_option('--settle', type='float', default=10.0, help='seconds to let the app start first')
+    parser.add_option('--repeat', type='int', default=3, help='runs to take the median of')
+    parser.add_option('--save', default='', help='write the medians to this JSON file')
+    parser.add_option('--compare', default='', help='compare the medians with this JSON file')
+    options, args = parser.parse_args()
+    if not psutil and not os.path.isdir('/proc/self/task'):
+        parser.error('needs psutil (or /proc)')
+
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    runs = [r for r in (measure(options.settle, options.seconds) for n in range(options.repeat)) if r]
+    if not runs:
+        print('the app exited before it was sampled (failed or already running)')
+        return
+    results = {}
+    for name, unit in [('cpu', '% of one core'), ('wakeups', '/s')]:
+        results[name] = median([r[name] for r in runs])
+        line = '{:8s} {:8.2f} {}'.format(name, results[name], unit)
+        if name in baseline:
+            line += ' (was {:.2f})'.format(baseline[name])
+        print(line)
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
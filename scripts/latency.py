@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+'''
+Measure audio in to MIDI out latency of the strength path.
+
+A click track is rendered through the offline server, paced to realtime so
+that every block is handed to the process callback when its last sample
+would have been captured. The velocity callback and MIDI hand-off mirror
+the app (display slot, output queue, dispatcher thread flushing every
+5 ms), so thread scheduling and interpreter contention are real.
+
+For every click the time since it hit the input is recorded at each stage:
+
+    block     process callback of the block holding the click
+    peak_amp  _peak_amp_callback that first crossed --threshold
+    velocity  velocity callback (OnAudioStrengthVelocity in the app)
+    send      hand-off to the output queue (SendMidiEvent in the app)
+    dispatch  the dispatcher thread sending the message
+
+and p50/p95/p99 are reported per stage. --save writes the percentiles to a
+JSON file and --compare prints the change against such a file, to catch
+regressions in the engine or app path.
+'''
+
+# Python
+import json
+import math
+import optparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# NumPy
+import numpy as np  # noqa
+
+# BeatDown
+from bdwx.engine import GoertzelAnalyzer, MidiOutputQueue, OfflineEngine, StrengthAnalyzer, ValueSlot  # noqa
+
+STAGES = ['block', 'peak_amp', 'velocity', 'send', 'dispatch']
+
+
+def write_clicks(path, sampling_rate, seconds, interval, frequency, amplitude):
+    # Decaying low sine bursts (a kick rather than a broadband click, so the
+    # default 120 Hz LPF sees them); returns the onset times.
+    samples = np.zeros(int(seconds * sampling_rate))
+    t = np.arange(int(0.2 * sampling_rate)) / float(sampling_rate)
+    click = amplitude * np.exp(-t / 0.04) * np.sin(2 * math.pi * frequency * t)
+    onsets = []
+    onset = interval
+    while onset + 0.2 < seconds:
+        start = int(round(onset * sampling_rate))
+        samples[start:start + len(click)] += click
+        onsets.append(float(start) / sampling_rate)
+        onset += interval
+    f = wave.open(path, 'wb')
+    f.setnchannels(1)
+    f.setsampwidth(2)
+    f.setframerate(sampling_rate)
+    f.writeframes((samples * 32767).astype('<i2').tobytes())
+    f.close()
+    return onsets
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(round(fraction * (len(values) - 1)))] if values else None
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--backend', default='filters', help='strength detector: filters or goertzel')
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='server buffer size')
+    parser.add_option('--sampling-rate', dest='sampling_rate', type='int', default=44100, help='sampling rate')
+    parser.add_option('--seconds', type='float', default=30.0, help='length of the click track')
+    parser.add_option('--interval', type='float', default=0.5, help='seconds between clicks')
+    parser.add_option('--frequency', type='float', default=60.0, help='click frequency in Hz')
+    parser.add_option('--lpf', type='int', default=120, help='analyzer low-pass frequency in Hz')
+    parser.add_option('--attack', type='float', default=0.01, help='follower rise time in seconds')
+    parser.add_option('--release', type='float', default=0.05, help='follower fall time in seconds')
+    parser.add_option('--threshold', type='int', default=64, help='velocity that counts as detecting a click')
+    parser.add_option('--save', default='', help='write the percentiles to this JSON file')
+    parser.add_option('--compare', default='', help='compare the percentiles with this JSON file')
+    options, args = parser.parse_args()
+
+    engine = OfflineEngine(buffer_size=options.buffer_size)
+    period = float(options.buffer_size) / options.sampling_rate
+    slot = ValueSlot()
+    queue = MidiOutputQueue()
+    blocks, velocities, sends, dispatches = {}, [], [], []
+    clock = {'start': None, 'peak': None}
+
+    def on_block(block):
+        # Hand the block over once its last sample would have been captured.
+        now = time.perf_counter()
+        if clock['start'] is None:
+            clock['start'] = now - period
+        delay = clock['start'] + (block + 1) * period - now
+        if delay > 0:
+            time.sleep(delay)
+        blocks[block] = time.perf_counter()
+
+    def on_velocity(velocity):
+        now = time.perf_counter()
+        velocities.append((now, clock['peak'], velocity))
+        slot.put(velocity)
+        sends.append(time.perf_counter())
+        queue.put(0xb0, 1, velocity)
+
+    def on_send(status, data1, data2, timestamp=0, device=-1):
+        dispatches.append(time.perf_counter())
+
+    if options.backend == 'goertzel':
+        analyzer = GoertzelAnalyzer(on_velocity, engine.getTime, engine.input_bus, options.buffer_size,
+                                    options.sampling_rate, multiband=False)
+    else:
+        analyzer = StrengthAnalyzer(on_velocity, engine.getTime, engine.input_bus)
+    peak_amp_callback = analyzer._peak_amp_callback
+
+    def on_peak_amp(*args):
+        clock['peak'] = time.perf_counter()
+        peak_amp_callback(*args)
+
+    analyzer._peak_amp_callback = on_peak_amp
+    analyzer.lpf = options.lpf
+    analyzer.attack, analyzer.release = options.attack, options.release
+    analyzer.min_spl, analyzer.max_spl = -60, 0
+    analyzer.hysteresis, analyzer.max_rate = 0, 0
+    engine.strength_analyzer = analyzer
+    engine.block_callback = on_block
+
+    stop_event = threading.Event()
+
+    def dispatcher():
+        # Same loop as MidiDispatcher.run.
+        while not stop_event.wait(0.005):
+            queue.flush(on_send, None)
+        queue.flush(on_send, None)
+
+    thread = threading.Thread(target=dispatcher)
+    thread.daemon = True
+    thread.start()
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        onsets = write_clicks(path, options.sampling_rate, options.seconds, options.interval,
+                              options.frequency, 0.8)
+        print('{} clicks, {} backend, {} samples per block ({:.1f} ms), rendering in realtime...'.format(
+            len(onsets), options.backend, options.buffer_size, period * 1000.0))
+        engine.run(path)
+    finally:
+        stop_event.set()
+        thread.join()
+        os.remove(path)
+
+    latencies = dict((stage, []) for stage in STAGES)
+    missed = 0
+    for n, onset in enumerate(onsets):
+        arrived = clock['start'] + onset
+        until = clock['start'] + (onsets[n + 1] if n + 1 < len(onsets) else options.seconds)
+        hits = [(now, peak) for now, peak, velocity in velocities
+                if arrived <= now < until and velocity >= options.threshold]
+        if not hits:
+            missed += 1
+            continue
+        velocity_time, peak_time = hits[0]
+        send_time = min(t for t in sends if t >= velocity_time)
+        dispatch_times = [t for t in dispatches if t >= send_time]
+        latencies['block'].append(blocks[int(onset / period)] - arrived)
+        latencies['peak_amp'].append(peak_time - arrived)
+        latencies['velocity'].append(velocity_time - arrived)
+        latencies['send'].append(send_time - arrived)
+        if dispatch_times:
+            latencies['dispatch'].append(dispatch_times[0] - arrived)
+
+    results = {}
+    for stage in STAGES:
+        values = [v * 1000.0 for v in latencies[stage]]
+        results[stage] = dict((name, percentile(values, fraction))
+                              for name, fraction in [('p50', 0.50), ('p95', 0.95), ('p99', 0.99)])
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    print('{} of {} clicks detected'.format(len(onsets) - missed, len(onsets)))
+    for stage in STAGES:
+        columns = []
+        for name in ('p50', 'p95', 'p99'):
+            value = results[stage][name]
+            column = '{} {:7.2f} ms'.format(name, value) if value is not None else '{}       - ms'.format(name)
+            previous = baseline.get(stage, {}).get(name)
+            if value is not None and previous is not None:
+                column += ' ({:+.2f})'.format(value - previous)
+            columns.append(column)
+        print('{:9s} {}'.format(stage, '  '.join(columns)))
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+'''
+Run the strength analyzer (and optionally the beat clock) over sound files
+faster than realtime, sweeping parameter sets and reporting the resulting
+event streams.
+
+Example:
+
+    ./offline.py --lpf 80,120,200 --attack 0.05,0.1 setlist/*.wav
+'''
+
+# Python
+import csv
+import itertools
+import optparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# BeatDown
+from bdwx.engine import OfflineEngine  # noqa
+
+SWEEP_OPTIONS = [
+    ('lpf', int),
+    ('attack', float),
+    ('release', float),
+    ('min_spl', int),
+    ('max_spl', int),
+    ('min_velocity', int),
+    ('max_velocity', int),
+    ('hysteresis', int),
+    ('max_rate', int),
+]
+
+
+def parse_list(type_, value):
+    return [type_(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] FILE [FILE ...]')
+    parser.add_option('--lpf', default='120', help='low-pass frequencies in Hz (comma separated)')
+    parser.add_option('--attack', default='0.1', help='follower rise times in seconds (comma separated)')
+    parser.add_option('--release', default='0.1', help='follower fall times in seconds (comma separated)')
+    parser.add_option('--min-spl', dest='min_spl', default='-120', help='minimum SPL values in dB (comma separated)')
+    parser.add_option('--max-spl', dest='max_spl', default='0', help='maximum SPL values in dB (comma separated)')
+    parser.add_option('--min-velocity', dest='min_velocity', default='0', help='minimum velocities (comma separated)')
+    parser.add_option('--max-velocity', dest='max_velocity', default='127', help='maximum velocities (comma separated)')
+    parser.add_option('--hysteresis', default='1', help='change filter hysteresis in steps (comma separated)')
+    parser.add_option('--max-rate', dest='max_rate', default='30', help='maximum messages per second, 0 for no limit (comma separated)')
+    parser.add_option('--bpm', type='int', default=0, help='also generate MIDI clock at this BPM')
+    parser.add_option('--detect', action='store_true', default=False, help='drive the MIDI clock from the tempo detector')
+    parser.add_option('--lock', action='store_true', default=False, help='phase-lock the MIDI clock to detected beats')
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='server buffer size')
+    parser.add_option('--events', default='', help='write every event to this CSV file')
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('no sound files given')
+
+    names = [name for name, type_ in SWEEP_OPTIONS]
+    values = [parse_list(type_, getattr(options, name)) for name, type_ in SWEEP_OPTIONS]
+
+    engine = OfflineEngine(buffer_size=options.buffer_size)
+    engine.speed_enabled = bool(options.bpm or options.detect or options.lock)
+    engine.tempo_enabled = options.detect
+    engine.lock_enabled = options.lock
+    if options.bpm:
+        engine.beat_generator.bpm = options.bpm
+
+    events_file = events_writer = None
+    if options.events:
+        events_file = open(options.events, 'w', newline='')
+        events_writer = csv.writer(events_file)
+        events_writer.writerow(['file', 'run'] + names + ['time', 'event', 'value'])
+
+    try:
+        total_duration = 0.0
+        total_elapsed = 0.0
+        for run, params in enumerate(itertools.product(*values)):
+            settings = dict(zip(names, params))
+            for name, value in settings.items():
+                setattr(engine.strength_analyzer, name, value)
+            for path in args:
+                suppressed = engine.strength_analyzer.suppressed_count
+                events = engine.run(path)
+                total_duration += engine.duration
+                total_elapsed += engine.elapsed
+                velocities = [e[2] for e in events if e[1] == 'velocity']
+                clocks = [e for e in events if e[1] == 'clock' and e[2] == b'\xf8']
+                tempos = [e[2] for e in events if e[1] == 'tempo']
+                errors = [abs(e[2]) for e in events if e[1] == 'onset' and e[2] is not None]
+                print('{} run={} {} velocity(n={}, mean={:.1f}, suppressed={}) clocks={} bpm={} phase={} {:.2f}s in {:.2f}s ({:.1f}x realtime)'.format(
+                    os.path.basename(path), run,
+                    ' '.join('{}={}'.format(n, settings[n]) for n in names),
+                    len(velocities), float(sum(velocities)) / (len(velocities) or 1),
+                    engine.strength_analyzer.suppressed_count - suppressed,
+                    len(clocks), tempos[-1] if tempos else '-',
+                    '{:.1f}ms'.format(sum(errors) / len(errors)) if errors else '-',
+                    engine.duration, engine.elapsed, engine.speed_factor,
+                ))
+                if events_writer:
+                    for ts, kind, value in events:
+                        if isinstance(value, bytes):
+                            value = value.hex()
+                        events_writer.writerow([path, run] + list(params) + ['{:.6f}'.format(ts), kind, value])
+
+        if total_elapsed:
+            print('total: {:.2f}s of audio in {:.2f}s ({:.1f}x realtime)'.format(
+                total_duration, total_elapsed, total_duration / total_elapsed))
+    finally:
+        if events_file:
+            events_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+'''
+Run the tempo estimator over a synthetic click track (or a 16-bit WAV file)
+block by block and report the detected BPM along with the per-block cost as
+a fraction of the block period.
+'''
+
+# Python
+import optparse
+import os
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# NumPy
+import numpy as np  # noqa
+
+# BeatDown
+from bdwx.engine import TempoEstimator  # noqa
+
+
+def click_track(bpm, duration, sampling_rate):
+    samples = np.random.randn(int(duration * sampling_rate)) * 0.01
+    kick = np.sin(2 * np.pi * 60 * np.arange(2000) / sampling_rate) * np.exp(-np.arange(2000) / 400.0)
+    for n, start in enumerate(np.arange(0, duration - 0.1, 60.0 / bpm)):
+        index = int(start * sampling_rate)
+        samples[index:index + len(kick)] += kick * (1.0 if n % 2 == 0 else 0.6)
+    return samples
+
+
+def read_wav(path):
+    wav = wave.open(path, 'rb')
+    if wav.getsampwidth() != 2:
+        raise ValueError('only 16-bit WAV files are supported')
+    data = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2') / 32768.0
+    samples = data.reshape(-1, wav.getnchannels()).mean(axis=1)
+    return samples, wav.getframerate()
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [FILE.wav]')
+    parser.add_option('--bpm', type='float', default=128.0, help='tempo of the synthetic click track')
+    parser.add_option('--duration', type='float', default=30.0, help='length of the synthetic click track')
+    parser.add_option('--buffer-size', dest='buffer_size', type='int', default=256, help='samples per block')
+    options, args = parser.parse_args()
+
+    if args:
+        samples, sampling_rate = read_wav(args[0])
+    else:
+        sampling_rate = 44100
+        samples = click_track(options.bpm, options.duration, sampling_rate)
+
+    estimates = []
+    estimator = TempoEstimator(lambda bpm, confidence: estimates.append((bpm, confidence)), sampling_rate)
+    costs = []
+    for start in range(0, len(samples), options.buffer_size):
+        block = samples[start:start + options.buffer_size]
+        started = time.perf_counter()
+        estimator.process(block)
+        costs.append(time.perf_counter() - started)
+
+    period = float(options.buffer_size) / sampling_rate
+    costs = np.array(costs)
+    for name, value in (('p50', np.percentile(costs, 50)), ('p99', np.percentile(costs, 99)), ('max', costs.max())):
+        print('{}: {:7.1f} us ({:5.2f}% of {:.1f} ms block)'.format(name, value * 1e6, 100 * value / period, period * 1e3))
+    if estimates:
+        print('detected: {:.1f} BPM (confidence {:.2f}, {} estimates)'.format(estimates[-1][0], estimates[-1][1], len(estimates)))
+    else:
+        print('detected: none')
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,10 @@ import glob
 import os
 import sys
 
+# Version from the package without importing it (and its dependencies).
+version = {}
+exec(open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bdwx', 'version.py')).read(), version)
+
 # Verify that setup is running on the Windows platform.
 if sys.platform == 'win32':
 
@@ -133,7 +137,7 @@ else:
 
 setup(
     name='BeatDown',
-    version='0.1.0',
+    version=version['__version__'],
     description='Tool for audio analysis to generate MIDI messages.',
     long_description='',
     author='Nine More Minutes, Inc.',